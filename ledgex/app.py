@@ -1,3 +1,15 @@
-from dash import Dash
+import os
 
-app = Dash(__name__)
+import diskcache
+from dash import Dash, DiskcacheManager
+
+from sharedstore import cache_home, private_dir
+
+# Slow callbacks (loading data) run as background jobs in their own
+# processes, tracked in a local disk cache, so they don't hold a server
+# worker and can report progress and be cancelled.  The cache holds
+# pickles, so it must be private (see private_dir).
+job_cache_dir = os.environ.get("LEDGEX_JOB_CACHE", os.path.join(cache_home, "jobs"))
+background_callback_manager = DiskcacheManager(diskcache.Cache(private_dir(job_cache_dir)))
+
+app = Dash(__name__, background_callback_manager=background_callback_manager)
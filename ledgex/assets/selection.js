@@ -0,0 +1,106 @@
+/* Client-side half of the Periodic tab's transaction table.  When the
+   server has sent a small dataset's rows (pe_client_rows), a chart
+   selection or a sunburst click filters them here, into a table that
+   pages, sorts and filters natively, with no request to the server.
+   Otherwise, the table is paged on the server, and each change is
+   passed on to it through pe_table_request. */
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.ledgex = Object.assign({}, window.dash_clientside.ledgex, {
+    pe_table: function (click, selection, page_current, page_size, sort_by, filter_query, rows) {
+        var no_update = window.dash_clientside.no_update;
+        var triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+            return t.prop_id.split(".")[0];
+        });
+        var paging = triggered.indexOf("pe_trans_table") >= 0;
+        if (!rows) {
+            var request = {
+                click: click,
+                selection: selection,
+                page_current: page_current,
+                page_size: page_size,
+                sort_by: sort_by,
+                filter_query: filter_query,
+                paging: paging,
+            };
+            return [no_update, no_update, no_update, "custom", "custom", "custom", request];
+        }
+        if (paging || !selection) {
+            return [no_update, no_update, no_update, no_update, no_update, no_update, no_update];
+        }
+
+        var code = {};
+        rows.ids.forEach(function (id, i) {
+            code[id] = i;
+        });
+        var to_day = function (date) {
+            return Math.floor(Date.parse(String(date).slice(0, 10) + "T00:00:00Z") / 86400000);
+        };
+        // the same rectangles of (code range, day range) as apply_burst_click's Selection
+        var rectangles = [];
+        var add = function (account, start, end) {
+            if (account in code) {
+                rectangles.push([code[account], rows.end[code[account]], to_day(start), to_day(end)]);
+            }
+        };
+        var accounts = selection.accounts || [];
+        (selection.intervals || []).forEach(function (r) {
+            add(r[0], r[1], r[2]);
+        });
+        if (click) {
+            var wedge = click.points[0].id;
+            for (var i = 0; i < rows.suffixes.length; i++) {
+                if (wedge.indexOf(rows.suffixes[i]) >= 0) {
+                    wedge = wedge.replace(rows.suffixes[i], "");
+                    break;
+                }
+            }
+            accounts = [wedge];
+        }
+        if (rectangles.length === 0) {
+            accounts.forEach(function (account) {
+                add(account, selection.start, selection.end);
+            });
+        }
+        if (click) {
+            var lo = accounts[0] in code ? code[accounts[0]] : 0;
+            var hi = accounts[0] in code ? rows.end[lo] : 0;
+            rectangles = rectangles
+                .map(function (r) {
+                    return [Math.max(r[0], lo), Math.min(r[1], hi), r[2], r[3]];
+                })
+                .filter(function (r) {
+                    return r[0] < r[1];
+                });
+        }
+
+        var data = [];
+        for (var row = 0; row < rows.code.length; row++) {
+            var c = rows.code[row];
+            var d = rows.day[row];
+            var selected = accounts.length === 0;
+            for (var j = 0; !selected && j < rectangles.length; j++) {
+                var r = rectangles[j];
+                selected = c >= r[0] && c < r[1] && d >= r[2] && d <= r[3];
+            }
+            if (selected) {
+                var record = {date: rows.date[row], description: rows.description[row], amount: rows.amount[row]};
+                record[rows.account_col] = c >= 0 ? rows.ids[c] : "";
+                data.push(record);
+            }
+        }
+
+        var text;
+        if (accounts.length > 0) {
+            text = data.length + " selected for " + accounts.join(", ");
+            var sub = accounts.reduce(function (total, account) {
+                return total + (account in code ? rows.end[code[account]] - code[account] - 1 : 0);
+            }, 0);
+            if (sub > 0) {
+                text += " and " + sub + " sub-accounts";
+            }
+        } else {
+            text = "All accounts selected. Click a pie slice to filter from " + (selection.count || 0) + " records";
+        }
+        return [data, 0, text, "native", "native", "native", no_update];
+    },
+});
@@ -0,0 +1,25 @@
+/* Client-side half of zoom-driven time resolution.  Reduces a chart's
+   relayoutData to the visible x range (null when zoomed all the way
+   out) and the chart's width in pixels, and skips relayout events that
+   don't change the x axis, so the server only redraws on zoom and pan. */
+window.dash_clientside = Object.assign({}, window.dash_clientside);
+window.dash_clientside.ledgex = Object.assign({}, window.dash_clientside.ledgex, {
+    zoom_store: function (relayout) {
+        var no_update = window.dash_clientside.no_update;
+        if (!relayout) {
+            return no_update;
+        }
+        var range = null;
+        if (relayout["xaxis.range[0]"] !== undefined) {
+            range = [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]];
+        } else if (relayout["xaxis.range"]) {
+            range = relayout["xaxis.range"];
+        } else if (!relayout["xaxis.autorange"]) {
+            return no_update;
+        }
+        var triggered = window.dash_clientside.callback_context.triggered;
+        var graph_id = triggered.length ? triggered[0].prop_id.replace(/\.relayoutData$/, "") : null;
+        var graph = graph_id ? document.getElementById(graph_id) : null;
+        return {range: range, width: graph ? graph.offsetWidth : window.innerWidth};
+    },
+});
@@ -271,6 +271,13 @@ class ATree(Tree):
         """
         trans = trans.reset_index(drop=True).set_index(CONST["account_col"])
         subtotals = trans.groupby(CONST["account_col"]).sum()["amount"]
+        return self.append_sums(subtotals, prorate_fraction)
+
+    def append_sums(self, subtotals: pd.Series, prorate_fraction: int = 1):
+        """Return a new account tree with the subtotal for each node (direct
+        subtotal only, no children) taken from a Series of totals indexed
+        by account, e.g. from RangeSum.leaf_totals
+        """
         atree = self.subtree(self.root)
         atree = ATree.cast(atree)
         for node in atree.all_nodes():
@@ -6,6 +6,7 @@ from typing import Dict
 from atree import ATree
 from utils import fonts
 from params import CONST
+from presentation import format_amounts
 
 
 class Burst:
@@ -20,39 +21,68 @@ class Burst:
             desc_text = ""
         return f'{trans_count:,d} records in {", ".join(sel_accounts)} {desc_text}'
 
+    @staticmethod
+    def strip_suffixes(wedge_id: str) -> str:
+        """ Return the account of a sunburst wedge, without any suffix added by roll_up or visible_frame """
+        for suffix in [CONST["leaf_suffix"], CONST["subtotal_suffix"], CONST["more_suffix"]]:
+            if suffix in wedge_id:
+                return wedge_id.replace(suffix, "")
+        return wedge_id
+
+    @staticmethod
+    def roll_up(tree: ATree) -> ATree:
+        """Return the tree, with leaf totals, rolled up and trimmed as the
+        sunburst needs it.  This is the slow part of making a sunburst,
+        so callers may cache the result and call from_rolled_tree with
+        it for each focus."""
+        tree = tree.roll_up_subtotals(prevent_negatives=True)
+        return tree.trim_excess_root()
+
+    @staticmethod
+    def visible_frame(tree: ATree, focus: str = None, depth: int = CONST["burst_depth"]) -> pd.DataFrame:
+        """Return the sunburst rows (id, name, parent, value) for the
+        focus account, its ancestors, and depth levels of descendents.
+        Each deepest account that has more descendents gets one
+        placeholder child, with its whole value, instead of them, so the
+        size of the figure depends on what can be seen, not on the size
+        of the tree."""
+        if focus not in tree:
+            focus = tree.root
+        shown = [tree[x] for x in tree.rsearch(focus)][::-1]
+        level = [tree[focus]]
+        for _ in range(depth):
+            level = [child for node in level for child in tree.children(node.identifier)]
+            shown.extend(level)
+        rows = [(x.identifier, x.tag, x.bpointer, x.data["total"]) for x in shown]
+        rows.extend(
+            (x.identifier + CONST["more_suffix"], "…", x.identifier, x.data["total"])
+            for x in level
+            if len(tree.children(x.identifier)) > 0
+        )
+        return pd.DataFrame(rows, columns=["id", "name", "parent", "value"])
+
     @classmethod
-    def from_trans(
+    def from_rolled_tree(
         cls,
         tree: ATree,
-        trans: pd.DataFrame,
         time_span: str,
         unit: str = CONST["unit"],
-        factor: float = 1,
         colormap: Dict = {},
         span_label: str = "",
+        focus: str = None,
     ):
         """
-        Using an account tree and DataFrame of transactions,
-        generate a figure for a sunburst, where each node is an account
-        in the tree, and the value of each node is the subtotal of all
-        transactions for that node and any subtree, filtered by date.
+        Generate a sunburst figure from a tree made by roll_up, centered
+        on focus (by default, the root), showing only the levels of
+        visible_frame.
         """
-        tree = tree.append_sums_from_trans(trans, factor)
-        tree = tree.roll_up_subtotals(prevent_negatives=True)
-        tree = tree.trim_excess_root()
         abbrev = CONST["time_span_lookup"][time_span]["abbrev"]
 
         #######################################################################
         # Make the figure
         #######################################################################
 
-        sun_frame = pd.DataFrame(
-            [
-                (x.identifier, x.tag, x.bpointer, x.data["total"])
-                for x in tree.all_nodes()
-            ],
-            columns=["id", "name", "parent", "value"],
-        )
+        sun_frame = cls.visible_frame(tree, focus)
         sun_frame["color"] = sun_frame["id"].map(colormap)
         sun_frame["unit"] = unit
         sun_frame["abbrev"] = abbrev
@@ -60,10 +90,11 @@ class Burst:
         sun_frame["label_pre"] = (
             sun_frame["id"]
             + "<br>"
-            + sun_frame["unit"]
-            + sun_frame["value"].astype(str)
+            + format_amounts(sun_frame["value"], unit).astype(str)
             + sun_frame["abbrev"]
         )
+        placeholder = sun_frame["id"].str.endswith(CONST["more_suffix"])
+        sun_frame.loc[placeholder, "label_pre"] = "…"
         figure = px.sunburst(
             sun_frame,
             ids="id",
@@ -81,6 +112,7 @@ class Burst:
             customdata=sun_frame["span_label"],
             insidetextorientation="horizontal",
             maxdepth=3,
+            level=focus if focus in tree else None,
             texttemplate="%{text}",
             hovertemplate="%{text}<extra>%{customdata}</extra>",
         )
@@ -0,0 +1,90 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+from eras import EraIndex
+from rangesum import RangeSum
+
+
+def era_days(era_index: EraIndex, era: int) -> Tuple[int, int]:
+    """Return the first and last day numbers of an era.  Each era but
+    the last ends the day before the next one starts."""
+    start, end = era_index.starts[era], era_index.ends[era]
+    if era < len(era_index) - 1:
+        end = end - 1
+    return int(start), int(end)
+
+
+class Comparison:
+    """Rolled-up subtree totals of every account for two date ranges, A
+    and B, aligned by account, with the change from A to B.
+
+    Both ranges are looked up in one pass over the RangeSum index: every
+    account code is searched for both ranges at once, and the two rows
+    of per-account totals are rolled up into subtree totals with one
+    running sum each.  Since both trees are the same account tree, they
+    are aligned by account code, with no joining.
+    """
+
+    def __init__(self, rangesum: RangeSum, range_a: Tuple, range_b: Tuple):
+        self.cube: Cube = rangesum.cube
+        n_codes = len(self.cube.ids)
+        codes = np.arange(n_codes, dtype=np.int64)
+        starts, ends = [], []
+        for start, end in (range_a, range_b):
+            start, end = RangeSum.to_day(start), RangeSum.to_day(end)
+            starts.append(np.full(n_codes, -RangeSum.DAY_SHIFT if start is None else start, dtype=np.int64))
+            ends.append(np.full(n_codes, RangeSum.DAY_SHIFT - 1 if end is None else end, dtype=np.int64))
+        own = rangesum.range_totals(np.tile(codes, 2), np.concatenate(starts), np.concatenate(ends))
+        own = own.reshape(2, n_codes)
+        running = np.concatenate([np.zeros((2, 1)), np.cumsum(own, axis=1)], axis=1)
+        total = running[:, self.cube.end] - running[:, codes]
+        # all the money that moved in each account, in either range, which
+        # sizes the account in the delta sunburst
+        self.own_activity: np.ndarray = np.abs(own).sum(axis=0)
+        activity = np.concatenate([[0], np.cumsum(self.own_activity)])
+        self.a: np.ndarray = total[0]
+        self.b: np.ndarray = total[1]
+        self.activity: np.ndarray = activity[self.cube.end] - activity[codes]
+
+    def frame(self, roots: Iterable[str] = None) -> pd.DataFrame:
+        """Return one row per account (only those within roots, if given)
+        with any money in either range: its parent (blank for the
+        top accounts shown), A and B totals including descendents, the
+        absolute and percentage change, and the money moved in either
+        range in the account itself and in it and its descendents,
+        sorted by the size of the change, largest first.  The
+        percentage is NaN where A is zero."""
+        tree = self.cube.account_tree
+        inside = np.ones(len(self.cube.ids), dtype=bool)
+        if roots:
+            inside[:] = False
+            for root in roots:
+                if root in self.cube.code:
+                    lo, hi = self.cube.account_range(root)
+                    inside[lo:hi] = True
+        codes = np.flatnonzero(inside & (self.activity != 0))
+        a, b = self.a[codes], self.b[codes]
+        delta = b - a
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(a != 0, 100 * delta / np.abs(a), np.nan)
+        ids = [self.cube.ids[x] for x in codes]
+        shown = set(ids)
+        parents = [tree.parent(x).identifier if tree.parent(x) else "" for x in ids]
+        parents = [x if x in shown else "" for x in parents]
+        result = pd.DataFrame(
+            {
+                "account": ids,
+                "parent": parents,
+                "a": a,
+                "b": b,
+                "delta": delta,
+                "percent": percent,
+                "own_activity": self.own_activity[codes],
+                "activity": self.activity[codes],
+            }
+        )
+        order = np.argsort(-np.abs(delta), kind="stable")
+        return result.iloc[order].reset_index(drop=True)
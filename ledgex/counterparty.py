@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from flows import Flows
+
+
+class CounterpartyIndex:
+    """For each account, the accounts on the other side of its
+    transactions, i.e., where its money came from and went to.
+
+    Built from the (source, target) pairs of Flows: every pair is an
+    entry for its target, from the source (a positive amount), and an
+    entry for its source, to the target (a negative amount).  Entries
+    are stored in compressed sparse rows: sorted by account code, so the
+    entries of account code c are ptr[c]:ptr[c + 1], and since a subtree
+    is a contiguous range of codes, so are the entries of any subtree.
+    """
+
+    def __init__(self, flows: Flows):
+        self.flows = flows
+        self.cube = flows.cube
+        account = np.concatenate([flows.target, flows.source])
+        order = np.argsort(account, kind="stable")
+        self.counter: np.ndarray = np.concatenate([flows.source, flows.target])[order]
+        self.amount: np.ndarray = np.concatenate([flows.value, -flows.value])[order]
+        self.day: np.ndarray = np.concatenate([flows.day, flows.day])[order]
+        self.ptr: np.ndarray = np.concatenate(
+            [[0], np.cumsum(np.bincount(account, minlength=len(self.cube.ids)))]
+        )
+
+    def _entries(self, account_id: str, start=None, end=None, depth: int = None):
+        """Return the counter-account codes, amounts and days of the
+        entries of an account and its descendents, leaving out transfers
+        within the subtree.  Counter-accounts deeper than depth are
+        rolled up to their ancestor at depth."""
+        lo, hi = self.cube.account_range(account_id)
+        rows = slice(self.ptr[lo], self.ptr[hi])
+        counter, amount, day = self.counter[rows], self.amount[rows], self.day[rows]
+        keep = (counter < lo) | (counter >= hi)
+        if start is not None:
+            keep &= day >= np.datetime64(pd.Timestamp(start).date(), "D").astype(np.int64)
+        if end is not None:
+            keep &= day <= np.datetime64(pd.Timestamp(end).date(), "D").astype(np.int64)
+        counter, amount, day = counter[keep], amount[keep], day[keep]
+        if depth is not None:
+            counter = self.flows.ancestors(depth)[counter]
+        return counter, amount, day
+
+    def totals(self, account_id: str, start=None, end=None, depth: int = None) -> pd.Series:
+        """Return the net amount received by the account and its
+        descendents from each counter-account (negative if paid to it),
+        indexed by counter-account, largest first"""
+        counter, amount, _ = self._entries(account_id, start, end, depth)
+        by_code = np.bincount(counter, weights=amount, minlength=len(self.cube.ids))
+        codes = np.flatnonzero(np.abs(by_code) > 0.5)
+        codes = codes[np.argsort(-np.abs(by_code[codes]), kind="stable")]
+        return pd.Series(by_code[codes], index=[self.cube.ids[x] for x in codes], dtype=np.float64)
+
+    def by_period(
+        self, account_id: str, time_resolution: str, start=None, end=None, depth: int = None
+    ) -> pd.DataFrame:
+        """Return the amounts of totals for each period of the cube's
+        periods(time_resolution), as a frame with one row per
+        counter-account and one column per period label"""
+        counter, amount, day = self._entries(account_id, start, end, depth)
+        cells = self.cube.cells(time_resolution)
+        period = self.cube.period_ordinals(day, time_resolution) - cells["offset"]
+        inside = (period >= 0) & (period < cells["n_periods"])
+        n_periods = max(cells["n_periods"], 1)
+        key, inverse = np.unique(counter[inside] * n_periods + period[inside], return_inverse=True)
+        value = np.bincount(inverse, weights=amount[inside], minlength=len(key))
+        codes, columns = key // n_periods, key % n_periods
+        rows, row_of = np.unique(codes, return_inverse=True)
+        table = np.zeros((len(rows), cells["n_periods"]))
+        table[row_of, columns] = value
+        labels = self.cube.periods(time_resolution)["label"]
+        return pd.DataFrame(table, index=[self.cube.ids[x] for x in rows], columns=list(labels))
@@ -0,0 +1,337 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from treelib import Tree
+
+from atree import ATree
+from eras import EraIndex
+from errors import LError
+from parallel import sum_by_key
+from params import CONST
+
+
+class Cube:
+    """Precomputed totals of transactions by account and period, for
+    every time resolution.
+
+    Accounts are numbered in preorder of the account tree, so every
+    account and all of its descendents occupy one contiguous range of
+    codes, [code, end).  Totals are stored sparsely, as cells of (account
+    code, period, amount) sorted by code, so the total of any subtree for
+    any period is a slice of the cell arrays rather than a filter of the
+    transactions.
+
+    The day-level cells are built once, when the cube is created, in a
+    process pool for large ledgers (see parallel.sum_by_key).  The
+    cells for each coarser resolution, including eras if an EraIndex is
+    provided, are built from the day cells the first time that
+    resolution is used, and kept.
+    """
+
+    NO_DAY = np.iinfo(np.int64).max
+    # (account code, day) pairs are sorted as one key, with day numbers
+    # offset into the low 32 bits
+    DAY_SHIFT = 2 ** 31
+    CODE_SCALE = 2 ** 32
+
+    def __init__(
+        self, trans: pd.DataFrame, account_tree: ATree, era_index: EraIndex = None, saved: Tuple[dict, dict] = None
+    ):
+        """saved, if given, is the (arrays, meta) of to_arrays() for the
+        same transactions and account tree, used instead of reading the
+        rows again"""
+        self.trans = trans
+        self.account_tree = account_tree
+        self.era_index = era_index if era_index is not None else EraIndex(None)
+        if len(account_tree) > 0:
+            self.ids: list = list(account_tree.expand_tree(mode=Tree.DEPTH, sorting=False))
+        else:
+            self.ids = []
+        self.code: Dict[str, int] = {account: i for i, account in enumerate(self.ids)}
+        size = np.ones(len(self.ids), dtype=np.int64)
+        for account in reversed(self.ids[1:]):
+            parent = account_tree.parent(account).identifier
+            size[self.code[parent]] += size[self.code[account]]
+        self.end: np.ndarray = np.arange(len(self.ids), dtype=np.int64) + size
+        self._row_order: np.ndarray = None
+        self._row_key: np.ndarray = None
+        self._cells: Dict[str, dict] = {}
+        self._periods: Dict[str, pd.DataFrame] = {}
+        if saved is not None:
+            arrays, meta = saved
+            self.row_code, self.row_day = arrays["row_code"], arrays["row_day"]
+            self.first_day, self.last_day = meta["first_day"], meta["last_day"]
+            self._cells["day"] = {
+                **{x: arrays[f"day_{x}"] for x in ["code", "period", "amount", "count", "first", "last"]},
+                "offset": meta["day_offset"],
+                "n_periods": meta["day_n_periods"],
+            }
+            return
+
+        row_code = trans[CONST["account_col"]].map(self.code)
+        self.row_code: np.ndarray = row_code.fillna(-1).to_numpy(dtype=np.int64)
+        self.row_day: np.ndarray = (
+            trans["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        )
+        valid = self.row_code >= 0
+        if valid.any():
+            self.first_day = int(self.row_day[valid].min())
+            self.last_day = int(self.row_day[valid].max())
+        else:
+            self.first_day = self.last_day = 0
+        self._cells["day"] = self._day_cells(
+            self.row_code[valid],
+            self.row_day[valid],
+            trans["amount"].to_numpy(dtype=np.float64)[valid],
+        )
+
+    def to_arrays(self) -> Tuple[dict, dict]:
+        """Return the arrays the cube reads from the transactions, and
+        their scalar meta, for saving (see sharedstore.SharedStore) and
+        passing back to the constructor as saved"""
+        day_cells = self._cells["day"]
+        arrays = {"row_code": self.row_code, "row_day": self.row_day}
+        arrays.update({f"day_{x}": day_cells[x] for x in ["code", "period", "amount", "count", "first", "last"]})
+        meta = {
+            "first_day": self.first_day,
+            "last_day": self.last_day,
+            "day_offset": int(day_cells["offset"]),
+            "day_n_periods": int(day_cells["n_periods"]),
+        }
+        return arrays, meta
+
+    @classmethod
+    def day_key(cls, codes: np.ndarray, days) -> np.ndarray:
+        """ Return the sort key of (account code, day number) pairs """
+        return codes * cls.CODE_SCALE + (days + cls.DAY_SHIFT)
+
+    def _day_cells(self, codes: np.ndarray, days: np.ndarray, amounts: np.ndarray) -> dict:
+        """ Sum the transactions into one cell per account per day """
+        n_days = self.last_day - self.first_day + 1
+        key = codes * n_days + (days - self.first_day)
+        cell_key, amount, count = sum_by_key(key, amounts)
+        cell_day = cell_key % n_days + self.first_day
+        return dict(
+            code=cell_key // n_days,
+            period=cell_day - self.first_day,
+            amount=amount,
+            count=count,
+            first=cell_day,
+            last=cell_day,
+            offset=self.first_day,
+            n_periods=n_days,
+        )
+
+    def period_ordinals(self, days: np.ndarray, time_resolution: str) -> np.ndarray:
+        """Convert an array of day numbers (days since 1970-01-01) to period
+        ordinals.  For eras, the ordinal is the era number, or -1 outside
+        of all eras."""
+        if time_resolution == "day":
+            return days
+        if time_resolution == "era":
+            return self.era_index.era_of(days)
+        dates = pd.DatetimeIndex(days.astype("datetime64[D]"))
+        if time_resolution == "decade":
+            return dates.year.to_numpy(dtype=np.int64) // 10
+        try:
+            freq = CONST["time_res_lookup"][time_resolution]["resample_keyword"]
+        except KeyError:
+            raise LError(f"Invalid keyword for time_resolution: {time_resolution}")
+        return dates.to_period(freq).asi8
+
+    def cells(self, time_resolution: str) -> dict:
+        """Return the cells for time_resolution, building them from the day
+        cells if this is the first time they have been asked for."""
+        if time_resolution in self._cells:
+            return self._cells[time_resolution]
+        day_cells = self._cells["day"]
+        span = np.arange(self.first_day, self.last_day + 1, dtype=np.int64)
+        ordinals = self.period_ordinals(span, time_resolution)
+        if time_resolution == "era":
+            offset = 0
+            n_periods = len(self.era_index)
+        else:
+            offset = int(ordinals[0]) if len(ordinals) > 0 else 0
+            n_periods = int(ordinals[-1]) - offset + 1 if len(ordinals) > 0 else 0
+        cell_period = ordinals[day_cells["period"]] - offset
+        inside = cell_period >= 0
+        key = day_cells["code"][inside] * n_periods + cell_period[inside]
+        cell_key, inverse = np.unique(key, return_inverse=True)
+        first = np.full(len(cell_key), self.NO_DAY, dtype=np.int64)
+        last = np.full(len(cell_key), -self.NO_DAY, dtype=np.int64)
+        np.minimum.at(first, inverse, day_cells["first"][inside])
+        np.maximum.at(last, inverse, day_cells["last"][inside])
+        amount = day_cells["amount"][inside]
+        count = day_cells["count"][inside]
+        cells = dict(
+            code=cell_key // max(n_periods, 1),
+            period=cell_key % max(n_periods, 1),
+            amount=np.bincount(inverse, weights=amount, minlength=len(cell_key)),
+            count=np.bincount(inverse, weights=count, minlength=len(cell_key)).astype(np.int64),
+            first=first,
+            last=last,
+            offset=offset,
+            n_periods=n_periods,
+        )
+        self._cells[time_resolution] = cells
+        return cells
+
+    def periods(self, time_resolution: str) -> pd.DataFrame:
+        """Return a frame with one row per period in the cube's date span,
+        with the period label used on chart axes and the start and end
+        dates of the period.  Eras also have their duration in months."""
+        if time_resolution in self._periods:
+            return self._periods[time_resolution].copy()
+        cells = self.cells(time_resolution)
+        ordinals = np.arange(cells["offset"], cells["offset"] + cells["n_periods"])
+        if time_resolution == "era":
+            eras = self.era_index.frame()
+            self._periods[time_resolution] = eras
+            return eras.copy()
+        elif time_resolution == "decade":
+            start = pd.to_datetime(pd.DataFrame(dict(year=ordinals * 10, month=1, day=1)))
+            end = pd.to_datetime(pd.DataFrame(dict(year=ordinals * 10 + 9, month=12, day=31)))
+            label = pd.Index((ordinals * 10).astype(str))
+        else:
+            tr = CONST["time_res_lookup"][time_resolution]
+            period_index = pd.period_range(
+                start=pd.Period(ordinal=cells["offset"], freq=tr["resample_keyword"]),
+                periods=cells["n_periods"],
+            )
+            start = pd.Series(period_index.start_time)
+            end = pd.Series(period_index.end_time.normalize())
+            label = period_index.strftime(tr["format"])
+        self._periods[time_resolution] = pd.DataFrame(
+            {"label": label, "start": start.to_numpy(), "end": end.to_numpy()}
+        )
+        return self._periods[time_resolution].copy()
+
+    def account_range(self, account_id: str, deep: bool = True) -> Tuple[int, int]:
+        """ Return the range of codes covered by an account, and by its descendents if deep """
+        try:
+            code = self.code[account_id]
+        except KeyError:
+            raise LError(f"Account {account_id} is not in the account tree.")
+        if deep:
+            return (code, int(self.end[code]))
+        return (code, code + 1)
+
+    def period_window(self, time_resolution: str, start=None, end=None) -> slice:
+        """Return the positions, in periods(), of the periods that overlap
+        the dates from start to end.  Either may be None for no limit."""
+        periods = self.periods(time_resolution)
+        lo = 0 if start is None else np.searchsorted(periods["end"], pd.Timestamp(start), side="left")
+        hi = len(periods) if end is None else np.searchsorted(periods["start"], pd.Timestamp(end), side="right")
+        return slice(int(lo), int(max(hi, lo)))
+
+    def _summarize(
+        self, cells: dict, group: np.ndarray, sel: slice, n_groups: int, window: slice = None
+    ) -> dict:
+        """Sum a slice of cells into n_groups × n_periods arrays, where group
+        gives the group number of each cell in the slice.  If window is
+        given, only the periods in the window are summed, and the total
+        of each group before the window is returned as opening."""
+        period = cells["period"][sel]
+        amount = cells["amount"][sel]
+        first_cells = cells["first"][sel]
+        last_cells = cells["last"][sel]
+        if window is None:
+            window = slice(0, cells["n_periods"])
+        before = period < window.start
+        opening = np.bincount(group[before], weights=amount[before], minlength=n_groups)
+        inside = ~before & (period < window.stop)
+        n_periods = window.stop - window.start
+        key = group[inside] * n_periods + period[inside] - window.start
+        size = n_groups * n_periods
+        value = np.bincount(key, weights=amount[inside], minlength=size)
+        first = np.full(size, self.NO_DAY, dtype=np.int64)
+        last = np.full(size, -self.NO_DAY, dtype=np.int64)
+        np.minimum.at(first, key, first_cells[inside])
+        np.maximum.at(last, key, last_cells[inside])
+        count = np.bincount(key, minlength=size)
+        shape = (n_groups, n_periods)
+        return dict(
+            value=value.reshape(shape),
+            first=first.reshape(shape),
+            last=last.reshape(shape),
+            active=(count > 0).reshape(shape),
+            opening=opening,
+            window=window,
+        )
+
+    def _series_frame(self, time_resolution: str, summary: dict, i: int) -> pd.DataFrame:
+        """ Return row i of a summary as a frame of periods """
+        result = self.periods(time_resolution).iloc[summary["window"]].reset_index(drop=True)
+        for column in ["value", "first", "last", "active"]:
+            result[column] = summary[column][i]
+        return result
+
+    def series(
+        self, account_id: str, time_resolution: str, deep: bool = True, start=None, end=None
+    ) -> pd.DataFrame:
+        """Return the total of an account (and its descendents, if deep) for
+        every period in the cube's date span, or only the periods that
+        overlap start to end, along with the first and last transaction
+        day in each period."""
+        cells = self.cells(time_resolution)
+        lo, hi = self.account_range(account_id, deep)
+        i0, i1 = np.searchsorted(cells["code"], [lo, hi])
+        group = np.zeros(i1 - i0, dtype=np.int64)
+        window = self.period_window(time_resolution, start, end)
+        summary = self._summarize(cells, group, slice(i0, i1), 1, window)
+        return self._series_frame(time_resolution, summary, 0)
+
+    def children_summary(
+        self, account_id: str, time_resolution: str, start=None, end=None
+    ) -> Tuple[List[str], dict]:
+        """Return the children of an account, in get_children_ids order,
+        and their totals (including descendents) as (children × periods)
+        arrays, in one pass over the account's cells.  Each cell is
+        assigned to the child whose code range contains it.  If start or
+        end are given, only the periods overlapping them are included,
+        and the summary's opening has each child's total before them."""
+        children = self.account_tree.get_children_ids(account_id)
+        if len(children) == 0:
+            return children, {}
+        cells = self.cells(time_resolution)
+        lo, hi = self.account_range(account_id)
+        # the account's own cells come first; they belong to no child
+        i0, i1 = np.searchsorted(cells["code"], [lo + 1, hi])
+        codes = np.array([self.code[child] for child in children], dtype=np.int64)
+        by_code = np.argsort(codes)
+        group = by_code[np.searchsorted(codes[by_code], cells["code"][i0:i1], side="right") - 1]
+        window = self.period_window(time_resolution, start, end)
+        return children, self._summarize(cells, group, slice(i0, i1), len(children), window)
+
+    def children_series(
+        self, account_id: str, time_resolution: str, start=None, end=None
+    ) -> Dict[str, pd.DataFrame]:
+        """ Return series() for every child of an account, from children_summary """
+        children, summary = self.children_summary(account_id, time_resolution, start, end)
+        return {
+            child: self._series_frame(time_resolution, summary, i)
+            for i, child in enumerate(children)
+        }
+
+    def rows(self, account_id: str, deep: bool = True) -> pd.DataFrame:
+        """ Return the transactions of an account, and of its descendents if deep """
+        lo, hi = self.account_range(account_id, deep)
+        return self.trans[(self.row_code >= lo) & (self.row_code < hi)]
+
+    def row_positions(self, codes: np.ndarray, start_days: np.ndarray, end_days: np.ndarray) -> np.ndarray:
+        """Return the positions in trans, in order, of the transactions of
+        each account code between the matching start and end day numbers,
+        inclusive.  The rows are sorted by (code, day) the first time this
+        is used, so each lookup is a binary search rather than a filter."""
+        if self._row_order is None:
+            key = self.day_key(self.row_code, self.row_day)
+            self._row_order = np.argsort(key, kind="stable")
+            self._row_key = key[self._row_order]
+        i0 = np.searchsorted(self._row_key, self.day_key(codes, start_days), side="left")
+        i1 = np.searchsorted(self._row_key, self.day_key(codes, end_days), side="right")
+        lengths = np.maximum(i1 - i0, 0)
+        # concatenate the ranges [i0, i1) without a Python loop
+        run_start = np.cumsum(lengths) - lengths
+        sorted_positions = np.repeat(i0 - run_start, lengths) + np.arange(lengths.sum())
+        return np.unique(self._row_order[sorted_positions])
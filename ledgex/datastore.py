@@ -1,11 +1,49 @@
+import hashlib
 import json
+from collections import OrderedDict
+from typing import Callable, Tuple
+import numpy as np
 import pandas as pd
 from numpy import datetime64
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from app import app
 from params import CONST
 from atree import ATree
+from counterparty import CounterpartyIndex
+from cube import Cube
+from eras import EraIndex
+from flows import Flows
+from presentation import Presentation
+from rangesum import RangeSum
+from sharedstore import SharedStore
+from partitions import empty_trans
+from sqlstore import open_ledger
+from textindex import TextIndex
+
+# Derived data (cubes, indexes) for recently used datasets, shared by
+# all callbacks in this process.  Keyed on (dataset key, name).
+_memo: OrderedDict = OrderedDict()
+# The same datasets and derived arrays, memory-mapped from files shared
+# by all server processes.
+_shared: SharedStore = SharedStore()
+
+
+def _frame_arrays(frame: pd.DataFrame) -> Tuple[dict, dict]:
+    """ Split a frame into arrays for SharedStore.save, and the meta to rebuild it """
+    arrays = {f"column {i}": frame[column].to_numpy() for i, column in enumerate(frame.columns)}
+    arrays["index"] = frame.index.to_numpy()
+    return arrays, {"columns": list(frame.columns), "index_name": frame.index.name}
+
+
+def _arrays_frame(arrays: dict, meta: dict) -> pd.DataFrame:
+    """ Rebuild a frame from _frame_arrays, as views of the arrays where possible """
+    frame = pd.DataFrame(
+        {column: arrays[f"column {i}"] for i, column in enumerate(meta["columns"])},
+        index=pd.Index(arrays["index"], name=meta["index_name"]),
+        copy=False,
+    )
+    return frame
 
 
 @dataclass
@@ -20,6 +58,16 @@ class Datastore:
     account_filename: str = ""
     earliest_trans: datetime64 = None
     latest_trans: datetime64 = None
+    key: str = ""
+    # dictionary-encoded text columns, when loaded from the shared store
+    encoded: dict = field(default_factory=dict, repr=False)
+    # name of an out-of-core ledger in partitions_dir (see open_ledger),
+    # whose transactions stay on disk, and the accounts it is filtered
+    # to, if any
+    partitions: str = ""
+    filter_accounts: list = field(default_factory=list)
+
+    MEMO_SIZE = 32
 
     def to_json(self):
         """ Convert data to JSON via dict structure """
@@ -30,8 +78,110 @@ class Datastore:
         as the length of the whole datastore.  This works with
         preventupdate_if_empty so that a datastore with transactions
         but nothing else still passes the test."""
+        if self.partitions:
+            return len(self.ledger())
         return len(self.trans)
 
+    def memo(self, name: str, build: Callable):
+        """Return the derived data called name for this dataset, calling
+        build() to make it only if it isn't already cached.  Derived
+        data must be treated as read-only by callers."""
+        memo_key = (self.key, name)
+        if self.key and memo_key in _memo:
+            _memo.move_to_end(memo_key)
+            return _memo[memo_key]
+        result = build()
+        if self.key:
+            _memo[memo_key] = result
+            while len(_memo) > self.MEMO_SIZE:
+                _memo.popitem(last=False)
+        return result
+
+    def shared(self, name: str, build: Callable, to_arrays: Callable):
+        """Return build(saved), where saved is the arrays of the derived
+        data called name from the shared store, or None if they haven't
+        been saved yet, in which case they are saved from
+        to_arrays(result)."""
+        saved = _shared.load(self.key, name) if self.key else None
+        result = build(saved)
+        if saved is None and self.key:
+            arrays, meta = to_arrays(result)
+            _shared.save(self.key, name, arrays, meta)
+        return result
+
+    def ledger(self):
+        """ This dataset's out-of-core ledger (partitions or SQLite), if it has one """
+        return self.memo("ledger", lambda: open_ledger(self.partitions))
+
+    def cube(self) -> Cube:
+        """Aggregate cube of this dataset's transactions.  The cube of an
+        out-of-core ledger is built by the ledger and has no rows."""
+
+        def build(saved):
+            if self.partitions:
+                return self.ledger().cube(self.account_tree, self.era_index(), self.filter_accounts or None, saved)
+            return Cube(self.trans, self.account_tree, self.era_index(), saved)
+
+        return self.memo("cube", lambda: self.shared("cube", build, Cube.to_arrays))
+
+    def era_index(self) -> EraIndex:
+        """ This dataset's eras, compiled for lookups """
+        return self.memo("era_index", lambda: EraIndex(self.eras))
+
+    def rangesum(self) -> RangeSum:
+        """ Subtree × date range index of this dataset's transactions """
+        return self.memo("rangesum", lambda: RangeSum(self.cube()))
+
+    def rolled_up_tree(self) -> ATree:
+        """ This dataset's account tree with the all-time subtotal of every account """
+        return self.memo(
+            "rolled_up_tree",
+            lambda: self.account_tree.append_sums(self.rangesum().leaf_totals()).roll_up_subtotals(),
+        )
+
+    def column_values(self, column: str) -> Tuple[np.ndarray, pd.Index]:
+        """This dataset's transactions' values of a column, dictionary-encoded
+        as a code for each transaction (-1 if missing) and the sorted
+        distinct values."""
+        if column in self.encoded:
+            return self.encoded[column]
+        return self.memo(
+            f"column_values {column}", lambda: pd.factorize(self.cube().trans[column], sort=True)
+        )
+
+    def sort_rank(self, column: str) -> np.ndarray:
+        """ The rank of each of this dataset's transactions by a column, for sorting table pages """
+        return self.column_values(column)[0]
+
+    def text_index(self) -> TextIndex:
+        """ Word and trigram index of this dataset's transaction descriptions """
+        return self.memo(
+            "text_index",
+            lambda: self.shared(
+                "text_index",
+                lambda saved: TextIndex(*self.column_values("description"), saved and saved[0]),
+                lambda index: (index.to_arrays(), {}),
+            ),
+        )
+
+    def flows(self) -> Flows:
+        """ Flows between accounts, from the splits of this dataset's transactions """
+        return self.memo(
+            "flows",
+            lambda: Flows(
+                self.cube(),
+                self.cube().trans.get(CONST["txn_col"], pd.Series(None, index=self.cube().trans.index)),
+            ),
+        )
+
+    def counterparties(self) -> CounterpartyIndex:
+        """ Counter-accounts of each account of this dataset, from its flows """
+        return self.memo("counterparties", lambda: CounterpartyIndex(self.flows()))
+
+    def presentation(self, unit: str = CONST["unit"]) -> Presentation:
+        """ Display strings of this dataset's transactions, in the given unit """
+        return self.memo(f"presentation {unit}", lambda: Presentation(self.trans, unit))
+
     @classmethod
     def get_parts(cls, json_data, filter: list = []):
         """ Simplicity function
@@ -52,9 +202,15 @@ class Datastore:
         """
         if (not json_data) or (len(json_data) == 0):
             return None
+        key = hashlib.sha1((json_data + repr(list(filter))).encode("utf-8")).hexdigest()
+        shared = cls.from_shared(key)
+        if shared is not None:
+            return shared
         data = json.loads(json_data)
         if not data or len(data) == 0:
             return None
+        if data.get("partitions"):
+            return cls.from_partitions(data, filter, key)
         trans = pd.read_json(
             data["trans"],
             dtype={
@@ -63,6 +219,7 @@ class Datastore:
                 "amount": "int64",
                 CONST["account_col"]: "object",
                 CONST["fan_col"]: "object",
+                CONST["txn_col"]: "object",
             },
         )
         atree = ATree.from_json(data['atree'])
@@ -98,7 +255,7 @@ class Datastore:
         earliest_trans: datetime64 = trans["date"].min()
         latest_trans: datetime64 = trans["date"].max()
 
-        return Datastore(
+        result = Datastore(
             trans=trans,
             eras=eras,
             account_tree=atree,
@@ -107,4 +264,77 @@ class Datastore:
             account_filename=account_filename,
             earliest_trans=earliest_trans,
             latest_trans=latest_trans,
+            key=key,
+        )
+        result.to_shared(data["atree"])
+        return result
+
+    @classmethod
+    def from_partitions(cls, data: dict, filter: list, key: str):
+        """Return the dataset of an out-of-core ledger, named in data,
+        which has only its account tree; its transactions stay on disk
+        and only its cube is in memory.  Its trans has every column but
+        no rows, so anything built from trans is empty rather than
+        broken."""
+        atree = ATree.from_json(data["atree"])
+        filter_accounts: list = []
+        for account in filter:
+            filter_accounts = filter_accounts + [account] + atree.get_descendent_ids(account)
+        result = Datastore(
+            trans=empty_trans(),
+            eras=pd.DataFrame(),
+            account_tree=atree,
+            trans_filename=data["partitions"],
+            eras_filename="placeholder",
+            account_filename="placeholder",
+            key=key,
+            partitions=data["partitions"],
+            filter_accounts=filter_accounts,
+        )
+        ledger = result.ledger()
+        result.earliest_trans = pd.Timestamp(ledger.first_day, unit="D")
+        result.latest_trans = pd.Timestamp(ledger.last_day, unit="D")
+        return result
+
+    def to_shared(self, atree_json: str):
+        """Save the dataset to the shared store, for from_shared in other
+        workers.  The account tree is saved as the JSON it was read from,
+        so every worker numbers the accounts of saved cubes the same way."""
+        trans_arrays, trans_meta = _frame_arrays(self.trans)
+        eras_arrays, eras_meta = _frame_arrays(self.eras)
+        arrays = {**{f"trans {k}": v for k, v in trans_arrays.items()}, **{f"eras {k}": v for k, v in eras_arrays.items()}}
+        meta = {
+            "trans": trans_meta,
+            "eras": eras_meta,
+            "atree": atree_json,
+            "trans_filename": self.trans_filename,
+        }
+        _shared.save(self.key, "dataset", arrays, meta)
+
+    @classmethod
+    def from_shared(cls, key: str):
+        """Return the dataset with this key from the shared store, with its
+        columns memory-mapped, or None if no worker has saved it yet"""
+        saved = _shared.load(key, "dataset")
+        if saved is None:
+            return None
+        arrays, meta = saved
+        trans = _arrays_frame({k[len("trans "):]: v for k, v in arrays.items() if k.startswith("trans ")}, meta["trans"])
+        eras = _arrays_frame({k[len("eras "):]: v for k, v in arrays.items() if k.startswith("eras ")}, meta["eras"])
+        encoded = {}
+        for i, column in enumerate(meta["trans"]["columns"]):
+            if f"trans column {i}.codes" in arrays:
+                codes, values = arrays[f"trans column {i}.codes"], arrays[f"trans column {i}.values"]
+                encoded[column] = (codes, pd.Index(values, dtype=object))
+        return Datastore(
+            trans=trans,
+            eras=eras,
+            account_tree=ATree.from_json(meta["atree"]),
+            trans_filename=meta["trans_filename"],
+            eras_filename="placeholder",
+            account_filename="placeholder",
+            earliest_trans=trans["date"].min(),
+            latest_trans=trans["date"].max(),
+            key=key,
+            encoded=encoded,
         )
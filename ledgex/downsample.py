@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Return the positions of at most max_points points of the line (x, y)
+    chosen by Largest-Triangle-Three-Buckets, in order.  The first and last
+    points are always kept; of each bucket of points in between, the one
+    forming the largest triangle with the point kept from the previous
+    bucket and the mean of the next bucket is kept.  x must be numeric and
+    increasing; all points are kept if there are not more than max_points.
+
+    y may also be a matrix with one line per row, sharing x, in which case
+    the result has one row of positions per line, and all of the lines
+    are downsampled together, one bucket at a time."""
+    y = np.asarray(y, dtype=np.float64)
+    lines = np.atleast_2d(y)
+    n = lines.shape[1]
+    if max_points is None or n <= max_points or max_points < 3:
+        kept = np.tile(np.arange(n), (len(lines), 1))
+        return kept if y.ndim > 1 else kept[0]
+    x = np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # the mean of every bucket, used as the third corner of the triangle
+    sizes = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[n - 1])
+    mean_y = np.hstack(
+        [np.add.reduceat(lines[:, 1:n - 1], edges[:-1] - 1, axis=1) / sizes, lines[:, n - 1:]]
+    )
+    rows = np.arange(len(lines))
+    kept = np.empty((len(lines), max_points), dtype=np.int64)
+    kept[:, 0] = 0
+    kept[:, -1] = n - 1
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        a = kept[:, i]
+        xa = x[a][:, None]
+        ya = lines[rows, a][:, None]
+        area = np.abs(
+            (xa - mean_x[i + 1]) * (lines[:, lo:hi] - ya)
+            - (xa - x[lo:hi]) * (mean_y[:, i + 1:i + 2] - ya)
+        )
+        kept[:, i + 1] = lo + np.argmax(area, axis=1)
+    return kept if y.ndim > 1 else kept[0]
+
+
+def bucket_series(bin_amounts: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Combine the consecutive periods of a series from the aggregate cube
+    (see Cube.series) into at most max_points buckets of equal numbers of
+    periods.  Each bucket's value is the sum of its periods, so totals are
+    preserved, and the smallest and largest period values are kept as low
+    and high.  A bucket's label is 'first label/last label', which
+    periods_to_date_ranges converts back to the bucket's dates."""
+    n = len(bin_amounts)
+    if max_points is None or n <= max_points or max_points < 1:
+        return bin_amounts
+    size = -(-n // max_points)
+    groups = bin_amounts.groupby(np.arange(n) // size, sort=True)
+    result = groups.agg(
+        label=("label", "first"),
+        last_label=("label", "last"),
+        start=("start", "min"),
+        end=("end", "max"),
+        value=("value", "sum"),
+        low=("value", "min"),
+        high=("value", "max"),
+        first=("first", "min"),
+        last=("last", "max"),
+        active=("active", "any"),
+    )
+    several = result["label"] != result["last_label"]
+    result.loc[several, "label"] = result["label"] + "/" + result["last_label"]
+    return result.drop(columns="last_label").reset_index(drop=True)
+
+
+def decimate_points(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Return the positions of at most max_points points of a scatter
+    plot, in order, chosen so the plot keeps its shape:
+
+    1. outliers: up to a quarter of the budget, the points farthest
+       outside the interquartile fences of y;
+    2. extremes: the lowest and highest y in each of a quarter of the
+       budget's buckets of equal x width;
+    3. the rest of the budget spread evenly through the remaining points
+       in x order.
+
+    All points are kept if there are not more than max_points."""
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+
+    q1, q3 = np.percentile(y, [25, 75])
+    fence = 3 * (q3 - q1)
+    distance = np.maximum(q1 - fence - y, y - q3 - fence)
+    outliers = np.flatnonzero(distance > 0)
+    if len(outliers) > max_points // 4:
+        outliers = outliers[np.argsort(distance[outliers])[-(max_points // 4):]]
+    keep[outliers] = True
+
+    n_buckets = max(max_points // 8, 1)
+    span = x.max() - x.min()
+    bucket = np.minimum(((x - x.min()) / (span if span > 0 else 1) * n_buckets).astype(np.int64), n_buckets - 1)
+    by_bucket = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[by_bucket], np.arange(n_buckets), side="left")
+    ends = np.searchsorted(bucket[by_bucket], np.arange(n_buckets), side="right")
+    occupied = ends > starts
+    keep[by_bucket[starts[occupied]]] = True
+    keep[by_bucket[ends[occupied] - 1]] = True
+
+    rest = np.flatnonzero(~keep)
+    budget = max_points - int(keep.sum())
+    if budget > 0 and len(rest) > 0:
+        rest = rest[np.argsort(x[rest], kind="stable")]
+        keep[rest[np.linspace(0, len(rest) - 1, min(budget, len(rest))).astype(np.int64)]] = True
+    return np.flatnonzero(keep)
@@ -0,0 +1,74 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from errors import LError
+
+
+class EraIndex:
+    """Eras compiled to sorted arrays of day numbers, for binning
+    transactions and looking up eras with binary search.
+
+    Eras are read from the eras frame as consecutive start dates: each
+    era runs from its own date_start up to the next era's date_start, and
+    the last row only marks the end of the last era.  Transactions on a
+    boundary belong to the era that starts there; the end of the last era
+    is included in it.
+    """
+
+    DAYS_PER_MONTH = 365.2425 / 12
+
+    def __init__(self, eras: pd.DataFrame):
+        if eras is None or len(eras) == 0 or "date_start" not in eras.columns:
+            boundaries = pd.Series([], dtype="datetime64[ns]")
+        else:
+            boundaries = eras["date_start"].dropna().sort_values()
+        self.boundaries: np.ndarray = (
+            boundaries.to_numpy(dtype="datetime64[D]").astype(np.int64)
+        )
+        self.labels: list = [str(x) for x in boundaries.index[:-1]]
+        self.starts: np.ndarray = self.boundaries[:-1]
+        self.ends: np.ndarray = self.boundaries[1:]
+        self.months: np.ndarray = (self.ends - self.starts) / self.DAYS_PER_MONTH
+
+    def __len__(self):
+        return len(self.labels)
+
+    def era_of(self, days: np.ndarray) -> np.ndarray:
+        """Return the era number of each day number in days, or -1 for days
+        outside of all eras."""
+        days = np.asarray(days, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(len(days), -1, dtype=np.int64)
+        era = np.searchsorted(self.boundaries, days, side="right") - 1
+        # the last boundary closes the last era
+        era[days == self.boundaries[-1]] = len(self) - 1
+        era[(era < 0) | (era >= len(self))] = -1
+        return era
+
+    def era_of_date(self, date) -> int:
+        """ Return the era number containing a date-like value """
+        day = np.datetime64(pd.Timestamp(date), "D").astype(np.int64)
+        era = int(self.era_of(np.array([day]))[0])
+        if era < 0:
+            raise LError(f"{date} is not in any era.")
+        return era
+
+    def date_range(self, era: int) -> Tuple[np.datetime64, np.datetime64]:
+        """ Return the start and end dates of an era """
+        return (
+            self.starts[era].astype("datetime64[D]"),
+            self.ends[era].astype("datetime64[D]"),
+        )
+
+    def frame(self) -> pd.DataFrame:
+        """ Return the eras as a frame of label, start, end, and duration in months """
+        return pd.DataFrame(
+            {
+                "label": self.labels,
+                "start": self.starts.astype("datetime64[D]").astype("datetime64[ns]"),
+                "end": self.ends.astype("datetime64[D]").astype("datetime64[ns]"),
+                "months": self.months,
+            }
+        )
@@ -0,0 +1,175 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from datastore import Datastore
+from params import CONST
+
+# a Dash DataTable filter_query, e.g. {amount} > 100 && {description} contains "rent"
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<column>\{[^}]*\})
+        |(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)
+        |(?P<and>&&|\band\b)
+        |(?P<word>[^\s{}"'`]+)
+    )""",
+    re.VERBOSE,
+)
+_COMPARE = {
+    "=": "eq",
+    "eq": "eq",
+    "!=": "ne",
+    "ne": "ne",
+    ">": "gt",
+    "gt": "gt",
+    ">=": "ge",
+    "ge": "ge",
+    "<": "lt",
+    "lt": "lt",
+    "<=": "le",
+    "le": "le",
+}
+_TEXT = ["contains", "datestartswith"]
+
+
+@dataclass(frozen=True)
+class Clause:
+    """ One relational clause of a filter query, e.g. {amount} > 100 """
+
+    column: str
+    op: str  # one of the values of _COMPARE, "contains", "datestartswith" or "blank"
+    value: str = ""
+    case: bool = True  # whether text comparisons are case-sensitive
+    negate: bool = False
+
+
+def _parse_op(word: str) -> Tuple[str, bool]:
+    """ Return the operator of a word like 'icontains' or 's=', and whether it is case-sensitive """
+    case = True
+    if word[:1] in ("i", "s") and (word[1:] in _COMPARE or word[1:] in _TEXT):
+        case, word = word[0] == "s", word[1:]
+    if word in _COMPARE:
+        return _COMPARE[word], case
+    if word in _TEXT:
+        return word, case
+    raise ValueError(word)
+
+
+@lru_cache(maxsize=CONST["filter_cache_size"])
+def compile_query(filter_query: str) -> Tuple[Clause, ...]:
+    """Parse a Dash DataTable filter_query into clauses, all of which must
+    match.  Clauses that can't be parsed are dropped, so they match
+    everything.  Parsed queries are cached by query string."""
+    tokens = [
+        (match.lastgroup, match[match.lastgroup])
+        for match in _TOKEN.finditer(filter_query or "")
+        if match.lastgroup
+    ]
+    clauses = []
+    # split at the ands, and parse each clause on its own
+    parts: list = [[]]
+    for kind, text in tokens:
+        if kind == "and":
+            parts.append([])
+        else:
+            parts[-1].append((kind, text))
+    for part in parts:
+        if len(part) < 2 or part[0][0] != "column":
+            continue
+        column = part[0][1][1:-1]
+        words = [text for _, text in part[1:]]
+        if words[:2] == ["is", "blank"] or words[:3] == ["is", "not", "blank"]:
+            clauses.append(Clause(column, "blank", negate=words[1] == "not"))
+            continue
+        try:
+            op, case = _parse_op(words[0])
+        except ValueError:
+            continue
+        if len(part) < 3:
+            continue
+        kind, value = part[2]
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        clauses.append(Clause(column, op, value, case))
+    return tuple(clauses)
+
+
+def _date_mask(days: np.ndarray, clause: Clause) -> np.ndarray:
+    """ Evaluate a clause on day numbers """
+    if clause.op == "datestartswith":
+        # a prefix like 2020 or 2020-01 is a period; compare to its first and last days
+        period = pd.Period(clause.value)
+        lo, hi = (
+            np.datetime64(x.date(), "D").astype(np.int64)
+            for x in (period.start_time, period.end_time)
+        )
+        return (days >= lo) & (days <= hi)
+    day = np.datetime64(pd.Timestamp(clause.value).date(), "D").astype(np.int64)
+    return getattr(pd.Series(days), clause.op)(day).to_numpy()
+
+
+def _value_mask(values: pd.Series, clause: Clause) -> np.ndarray:
+    """ Evaluate a clause on a column's values """
+    if clause.op == "blank":
+        texts = values.astype(str).str.strip()
+        return (values.isna() | (texts == "")).to_numpy() != clause.negate
+    if clause.op in _TEXT:
+        texts = values.astype(str)
+        if clause.op == "datestartswith":
+            return texts.str.startswith(clause.value).to_numpy()
+        return texts.str.contains(clause.value, case=clause.case, regex=False).to_numpy()
+    if values.dtype.kind in "iuf":
+        value = pd.to_numeric(clause.value, errors="coerce")
+    else:
+        value = clause.value
+        if not clause.case:
+            values, value = values.astype(str).str.lower(), value.lower()
+    return getattr(values, clause.op)(value).to_numpy()
+
+
+def query_mask(dstore: Datastore, positions: np.ndarray, filter_query: str) -> np.ndarray:
+    """Return a boolean mask of which of the transactions at positions (in
+    the dataset's cube) match a Dash DataTable filter_query.
+
+    Dates are compared as the cube's day numbers.  Other text columns,
+    like account and description, are dictionary-encoded once per
+    dataset (see Datastore.column_values), so each clause is evaluated
+    once per distinct value and then looked up by code; descriptions
+    are searched with the dataset's TextIndex.  Each clause
+    only looks at the rows that matched the clauses before it."""
+    positions = np.asarray(positions, dtype=np.int64)
+    mask = np.ones(len(positions), dtype=bool)
+    trans = dstore.cube().trans
+    for clause in compile_query(filter_query):
+        if clause.column not in trans.columns:
+            continue
+        candidates = np.flatnonzero(mask)
+        rows = positions[candidates]
+        try:
+            if clause.column == "date" and clause.op != "blank" and clause.op != "contains":
+                hit = _date_mask(dstore.cube().row_day[rows], clause)
+            elif trans[clause.column].dtype.kind in "iuf":
+                hit = _value_mask(trans[clause.column].iloc[rows], clause)
+            elif clause.column == "description" and clause.op == "contains":
+                codes, uniques = dstore.column_values(clause.column)
+                found = dstore.text_index().containing(clause.value)
+                if clause.case:
+                    found = found[uniques[found].str.contains(clause.value, regex=False)]
+                unique_hit = np.zeros(len(uniques) + 1, dtype=bool)
+                unique_hit[found] = True
+                hit = unique_hit[codes[rows]]
+            else:
+                codes, uniques = dstore.column_values(clause.column)
+                # code -1 is a missing value, which only matches blank
+                unique_hit = _value_mask(pd.Series(list(uniques) + [None], dtype=object), clause)
+                unique_hit[-1] = clause.op == "blank" and not clause.negate
+                hit = unique_hit[codes[rows]]
+        except (ValueError, TypeError):
+            # values that can't be compared, e.g. a date clause with text that isn't a date
+            continue
+        mask[candidates] = hit
+    return mask
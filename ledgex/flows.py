@@ -0,0 +1,120 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+from params import CONST
+
+
+class Flows:
+    """Money flowing between accounts, from the splits of each
+    transaction, as a sparse account × account matrix.
+
+    In each transaction, the accounts with negative splits are sources
+    and the accounts with positive splits are targets, and each
+    source's outflow is divided among the targets in proportion to
+    their inflows.  The amounts are first un-flipped for the root
+    accounts whose signs loading flips (see CONST["root_accounts"]), so
+    every transaction balances.
+
+    The (source, target) pairs are built once, with integer account
+    codes from the cube, as parallel arrays sorted by day, so a date
+    range is a slice.  matrix() then sums the pairs in the range into
+    one cell per pair of accounts, after rolling both ends up to a
+    depth of the account tree.
+    """
+
+    def __init__(self, cube: Cube, transaction_ids: pd.Series):
+        self.cube = cube
+        n_codes = len(cube.ids)
+        self.depth = np.array([cube.account_tree.depth(x) for x in cube.ids], dtype=np.int64)
+
+        codes = cube.row_code
+        amounts = cube.trans["amount"].to_numpy(dtype=np.float64).copy()
+        for root in CONST["root_accounts"]:
+            if root["flip_negative"] and root["id"] in cube.code:
+                lo, hi = cube.account_range(root["id"])
+                # loading flips only the descendents of the root
+                flipped = (codes > lo) & (codes < hi)
+                amounts[flipped] = -amounts[flipped]
+        txn = pd.factorize(transaction_ids)[0]
+        valid = (codes >= 0) & (txn >= 0) & (amounts != 0)
+        txn, codes, amounts, days = txn[valid], codes[valid], amounts[valid], cube.row_day[valid]
+        # net each account within each transaction, so no account is both source and target
+        key, inverse = np.unique(txn * n_codes + codes, return_inverse=True)
+        net = np.bincount(inverse, weights=amounts)
+        first = np.zeros(len(key), dtype=np.int64)
+        first[inverse[::-1]] = np.arange(len(inverse))[::-1]
+        txn, codes, days = key // max(n_codes, 1), key % max(n_codes, 1), days[first]
+
+        source = net < 0
+        (s_txn, s_code, s_out), (t_txn, t_code, t_in) = (
+            (txn[side], codes[side], np.abs(net[side])) for side in (source, ~source & (net > 0))
+        )
+        n_txn = int(txn.max()) + 1 if len(txn) else 0
+        t_count = np.bincount(t_txn, minlength=n_txn)
+        t_start = np.cumsum(t_count) - t_count
+        t_total = np.bincount(t_txn, weights=t_in, minlength=n_txn)
+        # one pair for each source and each target of the same transaction
+        per_source = t_count[s_txn]
+        pair_source = np.repeat(np.arange(len(s_txn)), per_source)
+        offset = np.arange(per_source.sum()) - np.repeat(np.cumsum(per_source) - per_source, per_source)
+        pair_target = t_start[s_txn[pair_source]] + offset
+        value = s_out[pair_source] * t_in[pair_target] / t_total[t_txn[pair_target]]
+        order = np.argsort(days[source][pair_source], kind="stable")
+        self.day: np.ndarray = days[source][pair_source][order]
+        self.source: np.ndarray = s_code[pair_source][order]
+        self.target: np.ndarray = t_code[pair_target][order]
+        self.value: np.ndarray = value[order]
+
+    def __len__(self):
+        return len(self.value)
+
+    def ancestors(self, depth: int) -> np.ndarray:
+        """Return, for each account code, the code of its ancestor at depth
+        (or itself, if it is no deeper)"""
+        result = np.arange(len(self.cube.ids), dtype=np.int64)
+        at_depth = np.flatnonzero(self.depth == depth)
+        if len(at_depth) == 0:
+            return result
+        ancestor = at_depth[np.maximum(np.searchsorted(at_depth, result, side="right") - 1, 0)]
+        inside = (self.depth > depth) & (ancestor <= result) & (self.cube.end[ancestor] > result)
+        result[inside] = ancestor[inside]
+        return result
+
+    def matrix(
+        self, depth: int = None, start=None, end=None, roots: Iterable[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the flows between accounts as sorted, non-zero cells of
+        (source code, target code, amount).
+
+        Only flows from start to end (inclusive; either may be None) are
+        counted.  If depth is given, deeper accounts are rolled up to
+        their ancestor at that depth, and flows within one of those
+        ancestors are dropped.  If roots are given, only flows with both
+        ends within their subtrees are kept."""
+        lo = 0 if start is None else np.searchsorted(self.day, _day(start), "left")
+        hi = len(self) if end is None else np.searchsorted(self.day, _day(end), "right")
+        source, target, value = self.source[lo:hi], self.target[lo:hi], self.value[lo:hi]
+        if roots:
+            ranges = [self.cube.account_range(x) for x in roots if x in self.cube.code]
+            inside = np.zeros(len(self.cube.ids) + 1, dtype=bool)
+            for a, b in ranges:
+                inside[a:b] = True
+            keep = inside[source] & inside[target]
+            source, target, value = source[keep], target[keep], value[keep]
+        if depth is not None:
+            ancestor = self.ancestors(depth)
+            source, target = ancestor[source], ancestor[target]
+            keep = source != target
+            source, target, value = source[keep], target[keep], value[keep]
+        n_codes = max(len(self.cube.ids), 1)
+        key, inverse = np.unique(source * n_codes + target, return_inverse=True)
+        total = np.bincount(inverse, weights=value, minlength=len(key))
+        nonzero = np.abs(total) > 0.5
+        return key[nonzero] // n_codes, key[nonzero] % n_codes, total[nonzero]
+
+
+def _day(date) -> int:
+    return int(np.datetime64(pd.Timestamp(date).date(), "D").astype(np.int64))
@@ -3,16 +3,17 @@ import logging
 import dash
 from dash import dcc
 from dash import html
-import pandas as pd
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 
 from app import app
 from tabs import compare, cumulative, data_source, explore, periodic, hometab, sankey
 from errors import LoadError
-from loading import convert_raw_data, load_input_file
+from loading import encode_dataset, load_input_file
 from params import CONST, Params
+from sqlstore import open_ledger
 from utils import preventupdate_if_empty
+from warmer import warm_pinned
 from urllib.parse import urlencode
 
 server = app.server
@@ -46,6 +47,7 @@ app.layout = html.Div(
                     id="infodex",
                     children=[
                         html.Div(id="files_status", children=[]),
+                        html.Div(id="load_progress", className="hidden"),
                         html.A("Permalink", id="permalink", href=""),
                         dcc.Markdown(CONST["bug_report_md"]),
                         dcc.Location(id="url_reader", refresh=False),
@@ -53,6 +55,7 @@ app.layout = html.Div(
                         html.Div(id="api_node", className="hidden"),
                         html.Div(id="api_inputs", className="hidden"),
                         html.Div(id="pe_tab_trigger", className="hidden"),
+                        dcc.Store(id="pe_client_rows", storage_type="memory"),
                         html.Div(id="ex_tab_trigger", className="hidden"),
                         html.Div(id="ui_trans_node", className="hidden"),
                         html.Div(id="ui_atree_node", className="hidden"),
@@ -160,14 +163,19 @@ def relabel_tab(tab_label_store: str):
         Output("api_inputs", "children"),
     ],
     [Input("url_reader", "search")],
+    background=True,
+    progress=Output("load_progress", "children"),
+    running=[(Output("load_progress", "className"), "", "hidden")],
 )
-def parse_url_search(search: str):
+def parse_url_search(set_progress, search: str):
     """Process the search portion of any input URL and store it to an
     intermediate location.  If one or more data source URLs are
     provided via the input URL, load them here in the index.
     This is necessary in order for incoming links that provide data source URLs
     to load everything; otherwise they wouldn't work right until after
-    the user browsed to the Data Source tab."""
+    the user browsed to the Data Source tab.
+    This runs as a background job, reporting each stage to the
+    progress area; a new search cancels the job for the previous one."""
 
     preventupdate_if_empty(search)
     search = search.lstrip("?")
@@ -179,19 +187,19 @@ def parse_url_search(search: str):
     eras_j = None
     trans_input = inputs.get("transu", None)
     if trans_input:
-        filename, t_data, text = load_input_file(url=trans_input)
+        filename, t_data, text = load_input_file(url=trans_input, progress=set_progress)
         if len(t_data) > 0:
             trans_j = t_data.to_json()
 
     atree_input = inputs.get("atreeu", None)
     if atree_input:
-        filename, a_data, text = load_input_file(url=atree_input)
+        filename, a_data, text = load_input_file(url=atree_input, progress=set_progress)
         if len(a_data) > 0:
             atree_j = a_data.to_json()
 
     eras_input = inputs.get("erasu", None)
     if eras_input:
-        filename, e_data, text = load_input_file(url=eras_input)
+        filename, e_data, text = load_input_file(url=eras_input, progress=set_progress)
         if len(e_data) > 0:
             eras_j = e_data.to_json()
 
@@ -216,8 +224,12 @@ def parse_url_search(search: str):
     Input("ui_node", "children"),
     Input("api_node", "children"),
     State("tab_node", "children"),
+    background=True,
+    progress=Output("load_progress", "children"),
+    running=[(Output("load_progress", "className"), "", "hidden")],
 )
 def load_and_transform(
+    set_progress,
     ui_trans_node: str,
     ui_atree_node: str,
     ui_eras_node: str,
@@ -233,6 +245,8 @@ def load_and_transform(
     The api_*_nodes will contain data loaded directly from the API (i.e.,
     from URL search parameters), and the ui_*_nodes will contain data
     loaded from the data_source tab, so ui should trump api.
+    This runs as a background job, reporting each stage to the
+    progress area; new inputs cancel the job for the previous ones.
     """
     ctx = dash.callback_context
     if ctx.triggered:
@@ -279,8 +293,6 @@ def load_and_transform(
     permalink = urlencode(merged_source)
     if t_source and len(t_source) > 0:
         try:
-            trans_data = pd.read_json(t_source)
-            atree_data: pd.DataFrame = pd.DataFrame()
             a_source = None
             if trigger_id == "ui_atree_node":
                 a_source = ui_atree_node
@@ -290,9 +302,6 @@ def load_and_transform(
                 a_source = ui_atree_node
             elif api_atree_node and len(api_atree_node) > 0:
                 a_source = api_atree_node
-            if a_source:
-                atree_data = pd.read_json(a_source)
-            eras_data: pd.DataFrame = pd.DataFrame()
             e_source = None
             if trigger_id == "ui_eras_node":
                 e_source = ui_eras_node
@@ -302,23 +311,28 @@ def load_and_transform(
                 e_source = ui_eras_node
             elif api_eras_node and len(api_eras_node) > 0:
                 e_source = api_eras_node
-            if e_source:
-                eras_data = pd.read_json(e_source)
-            trans, atree, eras = convert_raw_data(
-                trans_data, atree_data, eras_data, params
-            )
+            data, summary = encode_dataset(t_source, a_source, e_source, params, set_progress)
+            # Generate status info.  TODO: clean up this hack with a Jinja2 template, or at least another function
+            status = html.Div(children=[summary])
+        except LoadError as LE:
+            status = f"Error loading transaction data: {LE.message}"
+    elif merged_source.get("partsu"):
+        # an out-of-core ledger, already ingested into partitions or
+        # SQLite (see partitions.py and sqlstore.py), is opened by name;
+        # only its account tree is sent to the browser
+        try:
+            set_progress("Opening out-of-core ledger")
+            ledger = open_ledger(merged_source["partsu"])
+            atree = ledger.account_tree(params.ds_delimiter)
             data = json.dumps(
                 {
-                    "trans": trans.to_json(),
+                    "partitions": merged_source["partsu"],
+                    "ingested": ledger.meta["ingested"],
                     "atree": atree.to_json(),
-                    "eras": eras.to_json(),
                 }
             )
-            # Generate status info.  TODO: clean up this hack with a Jinja2 template, or at least another function
             status = html.Div(
-                children=[
-                    f"{len(trans)} transactions, {len(atree)} accounts, {len(eras)} reporting eras"
-                ]
+                children=[f"{len(ledger)} transactions, {len(atree)} accounts, in {merged_source['partsu']}"]
             )
         except LoadError as LE:
             status = f"Error loading transaction data: {LE.message}"
@@ -338,4 +352,6 @@ else:
     gunicorn_logger = logging.getLogger("gunicorn.error")
     app.logger.handlers = gunicorn_logger.handlers
     app.logger.setLevel(gunicorn_logger.level)
+    # Load the pinned datasets (LEDGEX_PINNED) before taking traffic
+    warm_pinned()
     external_stylesheets = ["https://ledge.uprightconsulting.com/s/dash_layout.css"]
@@ -1,7 +1,9 @@
 import base64
+import hashlib
 import io
+import json
 import urllib
-from typing import Iterable
+from typing import Callable, Dict, Iterable, Tuple
 
 import numpy as np
 import pandas as pd
@@ -12,6 +14,12 @@ from atree import ATree
 from params import CONST, Params
 from errors import LoadError
 
+# Pinned datasets, loaded before the server takes traffic (see
+# warmer.py): the result of load_input_file for each pinned URL, and
+# of encode_dataset for each pinned dataset, by encode_key.
+pinned_files: Dict[str, list] = {}
+pinned_datasets: Dict[str, Tuple[str, str]] = {}
+
 
 def load_eras(data, earliest_date, latest_date):
     """
@@ -27,21 +35,19 @@ def load_eras(data, earliest_date, latest_date):
         app.logger.warning(f"Error parsing eras file: {E}")
         return pd.DataFrame()
 
-    # If there is data before the earliest bin, add an extra bin to cover it.
     data = data.dropna(subset=["name", "date_start"])
     data = data.sort_values(by=["date_start"], ascending=True)
 
+    # If there is data before the earliest bin, add an extra bin to
+    # cover it.  If there is data after the last bin's start, add
+    # another row to provide a final date.
+    extra_rows = []
     if data.iloc[0].date_start > earliest_date:
-        data = data.append(
-            dict(name="Before", date_start=earliest_date), ignore_index=True
-        )
-        data = data.sort_values(by=["date_start"], ascending=True)
-
-    # If there is data after the last bin's start, add another row to provide a final date.
+        extra_rows.append(dict(name="Before", date_start=earliest_date))
     if data.iloc[-1].date_start < latest_date:
-        data = data.append(
-            dict(name="After", date_start=latest_date), ignore_index=True
-        )
+        extra_rows.append(dict(name="After", date_start=latest_date))
+    if extra_rows:
+        data = pd.concat([data, pd.DataFrame(extra_rows)], ignore_index=True)
         data = data.sort_values(by=["date_start"], ascending=True)
     data.set_index(["name"])
     return data
@@ -90,13 +96,25 @@ def rename_columns(data: pd.DataFrame, parameters: Params) -> pd.DataFrame:
     return data
 
 
-def load_input_file(input_file=None, url=None, filename=None) -> Iterable:
-    """ Load a tabular data file (CSV, maybe XLS) from URL or file upload."""
+def report(progress: Callable, message: str):
+    """ Pass a progress message to a background callback's progress setter, if any """
+    if progress:
+        progress(message)
+
+
+def load_input_file(input_file=None, url=None, filename=None, progress: Callable = None) -> Iterable:
+    """Load a tabular data file (CSV, maybe XLS) from URL or file upload.
+    Stages of the load are reported to progress, if provided.  Pinned
+    URLs are returned from memory, as a copy."""
+    if isinstance(url, str) and url in pinned_files:
+        new_filename, data, result_meta = pinned_files[url]
+        return [new_filename, data.copy(), result_meta]
     data: pd.DataFrame() = pd.DataFrame()
     result_meta: str = ""
     new_filename: str = ""
     # TODO: trim whitespace from column titles
     if input_file:
+        report(progress, f"Parsing {filename}")
         try:
             data = parse_base64_file(input_file, filename)
             result_meta = f"File {filename} loaded, {len(data)} records."
@@ -106,6 +124,7 @@ def load_input_file(input_file=None, url=None, filename=None) -> Iterable:
         except pd.errors.ParserError as E:
             result_meta = f"Error parsing file {filename}: {E}"
     elif isinstance(url, str):
+        report(progress, f"Fetching {url}")
         try:
             data = pd.read_csv(url, thousands=",", low_memory=False)
             result_meta = f"{url} loaded, {len(data)} records."
@@ -151,6 +170,8 @@ def load_transactions(data: pd.DataFrame):
     # Gnucash doesn't include the date, description, or notes for transaction splits.  Fill them in.
     try:
         data["date"] = data["date"].fillna(method="ffill")
+        if CONST["txn_col"] in data.columns:
+            data[CONST["txn_col"]] = data[CONST["txn_col"]].fillna(method="ffill")
         data["description"] = (
             data["description"].fillna(method="ffill", limit=1).fillna("").astype(str)
         )
@@ -173,9 +194,11 @@ def load_transactions(data: pd.DataFrame):
         "", inplace=True
     )  # Any remaining fields with invalid numerical data should be text fields
     data.where(data.notnull(), None)
-    trans = data[
-        ["date", "description", "amount", CONST["account_col"], CONST["fan_col"]]
-    ]
+    columns = ["date", "description", "amount", CONST["account_col"], CONST["fan_col"]]
+    if CONST["txn_col"] in data.columns:
+        # keeps the splits of each transaction together, for flows between accounts
+        columns.append(CONST["txn_col"])
+    trans = data[columns]
     return trans
 
 
@@ -184,20 +207,23 @@ def convert_raw_data(
     raw_tree: pd.DataFrame,
     raw_eras: pd.DataFrame,
     parameters: Params,
+    progress: Callable = None,
 ) -> Iterable:  # NOQA
     """Try and convert the provided data into usable transaction, tree,
     and era data.  Includes column renaming, and field-level business logic.
     Return dataframe of transactions, tree object of atree, and
-    dataframe of eras.
+    dataframe of eras.  Stages are reported to progress, if provided.
 
     """
     if not isinstance(raw_trans, pd.DataFrame) or len(raw_trans) == 0:
         raise LoadError("Tried to load transaction data and failed")
+    report(progress, f"Normalizing {len(raw_trans)} transactions")
     try:
         raw_trans = rename_columns(raw_trans, parameters)
         trans: pd.DataFrame = load_transactions(raw_trans)
     except Exception as E:
         raise LoadError(f"Could not import the transactions because: {type(E)}, {E}")
+    report(progress, "Building the account tree")
     atree: Tree = ATree()
     # look for account tree in separate tree file.
     if len(raw_tree) > 0:
@@ -249,3 +275,35 @@ def convert_raw_data(
         eras = pd.DataFrame()
 
     return (trans, atree, eras)
+
+
+def encode_key(trans_j: str, atree_j: str, eras_j: str, params: Params) -> str:
+    """ Key of the encode_dataset result for these inputs """
+    parts = [trans_j or "", atree_j or "", eras_j or "", params.to_json()]
+    return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def encode_dataset(
+    trans_j: str, atree_j: str, eras_j: str, params: Params, progress: Callable = None
+) -> Tuple[str, str]:
+    """Convert transactions, and optionally an account tree and eras, each
+    as the JSON of a loaded frame, into the JSON of a dataset for
+    data_store, and return it with a summary of its size.  Pinned
+    datasets are returned from memory without converting."""
+    pinned = pinned_datasets.get(encode_key(trans_j, atree_j, eras_j, params))
+    if pinned is not None:
+        return pinned
+    report(progress, "Parsing transactions")
+    trans_data = pd.read_json(trans_j)
+    atree_data = pd.read_json(atree_j) if atree_j else pd.DataFrame()
+    eras_data = pd.read_json(eras_j) if eras_j else pd.DataFrame()
+    trans, atree, eras = convert_raw_data(trans_data, atree_data, eras_data, params, progress)
+    report(progress, "Encoding the dataset")
+    data = json.dumps(
+        {
+            "trans": trans.to_json(),
+            "atree": atree.to_json(),
+            "eras": eras.to_json(),
+        }
+    )
+    return data, f"{len(trans)} transactions, {len(atree)} accounts, {len(eras)} reporting eras"
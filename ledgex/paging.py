@@ -0,0 +1,85 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from datastore import Datastore
+from params import CONST
+from filterquery import query_mask
+
+
+def table_page(
+    dstore: Datastore,
+    positions: np.ndarray,
+    page_current: int,
+    page_size: int,
+    sort_by: List[dict],
+    filter_query: str,
+    unit: str,
+) -> Tuple[List[dict], int, int]:
+    """Return one page of a transaction table, as records for a Dash
+    DataTable with custom paging, sorting and filtering, with the page
+    number, which is moved back to the last page if it is past it, and
+    the number of rows on all pages.
+
+    positions are the rows of the table, as positions in the dataset's
+    transactions (e.g., from Selection.positions), and are filtered by
+    query_mask.  Rows are in date order
+    unless sort_by says otherwise.  Sorting by one column walks the
+    dataset's cached order of that column; sorting by several lexsorts
+    the selected rows by the cached rank of each column.  Only the
+    rows of the page are converted to records, so the response is the
+    same size however many rows are selected."""
+    trans = dstore.cube().trans
+    positions = np.asarray(positions, dtype=np.int64)
+    if filter_query:
+        positions = positions[query_mask(dstore, positions, filter_query)]
+    sort_by = [x for x in (sort_by or []) if x["column_id"] in trans.columns] or [
+        {"column_id": "date", "direction": "asc"}
+    ]
+    if len(sort_by) == 1:
+        # walk the dataset's cached order of the column, keeping the selected rows
+        column, descending = sort_by[0]["column_id"], sort_by[0].get("direction") == "desc"
+        order = dstore.memo(
+            f"sort_order {column}", lambda: np.argsort(dstore.sort_rank(column), kind="stable")
+        )
+        selected = np.zeros(len(trans), dtype=bool)
+        selected[positions] = True
+        positions = order[selected[order]]
+        if descending:
+            positions = positions[::-1]
+    else:
+        # lexsort's last key is the primary key
+        ranks = [
+            (dstore.sort_rank(x["column_id"])[positions], x.get("direction") == "desc")
+            for x in reversed(sort_by)
+        ]
+        positions = positions[np.lexsort([-rank if descending else rank for rank, descending in ranks])]
+    page_current = min(page_current or 0, max(len(positions) - 1, 0) // page_size)
+    start = page_current * page_size
+    page = trans.iloc[positions[start:start + page_size]].copy()
+    page["date"] = dstore.presentation(unit).dates(page.index).to_numpy()
+    return page.to_dict("records"), page_current, len(positions)
+
+
+def client_rows(dstore: Datastore) -> dict:
+    """Return all of a dataset's transactions, in date order, as the
+    parallel lists that the browser filters the Periodic tab's table
+    with (see assets/selection.js): each row's account code and day, in
+    the cube's preorder codes and days since the epoch, and its display
+    date, amount and description, with the account ids and subtree ends
+    that map a selection to code ranges.  Only for small datasets; the
+    response grows with the number of rows."""
+    cube = dstore.cube()
+    trans = cube.trans
+    order = dstore.memo("sort_order date", lambda: np.argsort(dstore.sort_rank("date"), kind="stable"))
+    return {
+        "code": cube.row_code[order].tolist(),
+        "day": cube.row_day[order].tolist(),
+        "date": dstore.presentation().dates(trans.index[order]).tolist(),
+        "amount": trans["amount"].to_numpy()[order].tolist(),
+        "description": trans["description"].fillna("").astype(str).to_numpy()[order].tolist(),
+        "ids": list(cube.ids),
+        "end": cube.end.tolist(),
+        "account_col": CONST["account_col"],
+        "suffixes": [CONST["leaf_suffix"], CONST["subtotal_suffix"], CONST["more_suffix"]],
+    }
@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from params import CONST
+
+# One pool per process; a forked server worker makes its own.
+_executor: ProcessPoolExecutor = None
+_executor_pid: int = None
+_executor_workers: int = None
+
+
+def workers() -> int:
+    """ Number of processes for parallel aggregation: CONST["agg_workers"], or one per CPU """
+    return CONST["agg_workers"] or os.cpu_count() or 1
+
+
+def _pool(n_workers: int) -> ProcessPoolExecutor:
+    global _executor, _executor_pid, _executor_workers
+    if _executor is None or _executor_pid != os.getpid() or _executor_workers != n_workers:
+        _executor = ProcessPoolExecutor(max_workers=n_workers)
+        _executor_pid = os.getpid()
+        _executor_workers = n_workers
+    return _executor
+
+
+class SharedArrays:
+    """Copies of arrays in one block of shared memory, which worker
+    processes attach to by name instead of receiving pickled copies.
+    Use as a context manager; the block is freed on exit."""
+
+    def __init__(self, arrays: List[np.ndarray]):
+        arrays = [np.ascontiguousarray(x) for x in arrays]
+        offsets = np.cumsum([0] + [x.nbytes for x in arrays])
+        self.shm = shared_memory.SharedMemory(create=True, size=max(int(offsets[-1]), 1))
+        self.spec = [(x.dtype.str, x.shape, int(offset)) for x, offset in zip(arrays, offsets)]
+        for x, view in zip(arrays, attach(self.shm, self.spec)):
+            view[...] = x
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(shm: shared_memory.SharedMemory, spec: list) -> List[np.ndarray]:
+    """ Return views of the arrays described by spec in a block of shared memory """
+    return [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for dtype, shape, offset in spec]
+
+
+def _key_ranges(key: np.ndarray, parts: int) -> List[Tuple[int, int]]:
+    """Split the keys into at most parts disjoint [low, high) ranges, in
+    order, of nearly equal numbers of rows, from a sample of the keys"""
+    sample = np.sort(key[:: max(len(key) // 4096, 1)])
+    inner = sample[np.linspace(0, len(sample), parts + 1).astype(np.int64)[1:-1]]
+    bounds = np.unique(np.concatenate([[key.min()], inner, [key.max() + 1]]))
+    return [(int(low), int(high)) for low, high in zip(bounds[:-1], bounds[1:])]
+
+
+def _partial_sums(name: str, spec: list, low: int, high: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ In a worker: sum the rows with low <= key < high by key """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        key, weights = attach(shm, spec)
+        mask = (key >= low) & (key < high)
+        result = _sums(key[mask], weights[mask])
+        del key, weights
+        return result
+    finally:
+        shm.close()
+
+
+def _sums(key: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    unique_key, inverse = np.unique(key, return_inverse=True)
+    return (
+        unique_key,
+        np.bincount(inverse, weights=weights, minlength=len(unique_key)),
+        np.bincount(inverse, minlength=len(unique_key)),
+    )
+
+
+def sum_by_key(
+    key: np.ndarray, weights: np.ndarray, min_rows: int = None, n_workers: int = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the sorted distinct keys, and the sum of weights and the
+    number of rows for each, like np.unique followed by np.bincount.
+
+    With at least min_rows rows (CONST["parallel_min_rows"] by default)
+    and more than one worker, the keys are split into one range per
+    worker.  Each worker sums the rows of its own range, from shared
+    memory, and as the ranges are disjoint and in order, their sums are
+    only concatenated here.  Below min_rows, copying the rows to shared
+    memory and gathering the sums costs more than the workers save, so
+    the rows are summed in this process, as they always are if min_rows
+    is None."""
+    min_rows = CONST["parallel_min_rows"] if min_rows is None else min_rows
+    n_workers = n_workers or workers()
+    if min_rows is None or len(key) < min_rows or n_workers < 2 or len(key) == 0:
+        return _sums(key, weights)
+    with SharedArrays([key, np.asarray(weights, dtype=np.float64)]) as shared:
+        futures = [
+            _pool(n_workers).submit(_partial_sums, shared.name, shared.spec, low, high)
+            for low, high in _key_ranges(key, n_workers)
+        ]
+        partials = [x.result() for x in futures]
+    return tuple(np.concatenate(x) for x in zip(*partials))
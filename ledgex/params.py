@@ -8,6 +8,7 @@ CONST: dict = {
     "parent_col": "parent account",  # TODO: move the column names into Ledger class
     "account_col": "account",
     "fan_col": "full account name",
+    "txn_col": "transaction id",  # groups the splits of one transaction, e.g. in Gnucash exports
     "date_col": "date",
     "desc_col": "description",
     "amount_col": "amount",
@@ -24,10 +25,31 @@ CONST: dict = {
     "sa_label": "Sankey",  # flow
     "delim": ":",
     "max_slices": 7,
+    "pe_max_points": 500,  # bars per account in the Periodic chart before downsampling
+    "cu_max_points": 1000,  # points per line in the Cumulative charts before downsampling
+    "ex_max_points": 5000,  # dots in the Explore chart before decimation
+    "ex_webgl_threshold": 1000,  # dots in the Explore chart before switching to WebGL
+    "chart_width_px": 1000,  # assumed chart width until the browser reports it
+    "min_period_px": 6,  # narrowest bar for automatic time resolution
+    "zoom_margin": 0.5,  # fraction of the visible window also fetched on each side when zoomed
     "unit": "$",
+    "sa_depth": 2,  # account tree depth of the Sankey diagram's nodes
+    "ex_counter_depth": 2,  # account tree depth of the Explore tab's counterparty chart
+    "co_max_bars": 25,  # accounts in the Compare tab's bar chart of biggest changes
+    "page_size": 20,  # rows per page of transaction tables
+    "client_max_rows": 10_000,  # rows up to which the Periodic tab's table filters in the browser
+    "parallel_min_rows": 500_000,  # rows before aggregation is split across a process pool; below it,
+    # shared memory and gathering the sums leave 16 workers little gain (tests/bench_parallel.py)
+    "agg_workers": 0,  # processes in the aggregation pool; 0 for one per CPU
+    "ooc_chunk_rows": 1_000_000,  # rows per on-disk partition of an out-of-core ledger
+    "filter_cache_size": 256,  # parsed table filter queries to keep
+    "date_format": "%Y-%m-%d",  # dates in tables and hover labels
+    "wrap_width": 40,  # characters per line of descriptions in hover labels
     "leaf_suffix": " [Leaf]",
     "other_prefix": "Other ",
     "subtotal_suffix": " [Subtotal]",
+    "more_suffix": " [More]",  # placeholder for descendents not yet sent to the sunburst
+    "burst_depth": 3,  # levels below the sunburst's center sent to the browser
     "bug_report_md": "[Report an issue](https://github.com/saufrecht/"
     + "ledger-explorer/issues/new?assignees=saufrecht&labels=bug&template=issue.md&title=)",
     "root_accounts": [
@@ -69,7 +91,7 @@ CONST: dict = {
         },
         "week": {
             "abbrev": "W",
-            "format": "%Y-W%V",
+            "format": "%G-W%V",  # ISO year, so every week has its own label
             "label": "Week",
             "months": 0.23,
             "resample_keyword": "W",
@@ -83,6 +105,7 @@ CONST: dict = {
         },
     },
     "time_res_options": [
+        {"value": "auto", "label": "Auto"},
         {"value": "decade", "label": "Decade"},
         {"value": "year", "label": "Year"},
         {"value": "quarter", "label": "Quarter"},
@@ -131,6 +154,9 @@ class Params:
     ex_roots: Optional[Iterable[str]] = None
     pe_roots: Optional[Iterable[str]] = None
     sa_roots: Optional[Iterable[str]] = None
+    cu_max_points: Optional[int] = None
+    ex_max_points: Optional[int] = None
+    pe_max_points: Optional[int] = None
 
     @classmethod
     def cleanse_account_list_input(cls, input: Any):
@@ -145,6 +171,15 @@ class Params:
             return string_list
         return ()
 
+    @classmethod
+    def cleanse_int_input(cls, input: Any) -> Optional[int]:
+        """Handle a number that may come directly from parsed URL, as a
+        string, and return it as an int, or None if it isn't one"""
+        try:
+            return int(input)
+        except (TypeError, ValueError):
+            return None
+
     def to_json(self):
         """ Convert parameters to JSON via dict structure """
         return json.dumps(self, default=lambda x: x.__dict__)
@@ -214,6 +249,12 @@ class Params:
             self.pe_label = CONST["pe_label"]
         if not self.sa_label:
             self.sa_label = CONST["sa_label"]
+        if not self.cu_max_points:
+            self.cu_max_points = CONST["cu_max_points"]
+        if not self.ex_max_points:
+            self.ex_max_points = CONST["ex_max_points"]
+        if not self.pe_max_points:
+            self.pe_max_points = CONST["pe_max_points"]
 
     def __post_init__(self):
         self.co_roots = self.cleanse_account_list_input(self.co_roots)
@@ -221,6 +262,9 @@ class Params:
         self.ex_roots = self.cleanse_account_list_input(self.ex_roots)
         self.pe_roots = self.cleanse_account_list_input(self.pe_roots)
         self.sa_roots = self.cleanse_account_list_input(self.sa_roots)
+        self.cu_max_points = self.cleanse_int_input(self.cu_max_points)
+        self.ex_max_points = self.cleanse_int_input(self.ex_max_points)
+        self.pe_max_points = self.cleanse_int_input(self.pe_max_points)
 
     @classmethod
     def le_parse_qs(cls, search: str):
@@ -0,0 +1,362 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from atree import ATree
+from cube import Cube
+from eras import EraIndex
+from errors import LoadError
+from loading import load_transactions, rename_columns, report
+from params import CONST, Params
+from parallel import sum_by_key
+from rangesum import RangeSum
+from selection import Selection
+from sharedstore import SharedStore
+
+# Ledgers ingested for out-of-core use live here, one directory per
+# ledger, and are opened by name.
+partitions_dir = os.environ.get("LEDGEX_PARTITIONS", os.path.join(tempfile.gettempdir(), "ledgex_partitions"))
+
+COLUMNS = ["date", "description", "amount", CONST["account_col"], CONST["fan_col"]]
+
+
+def ledger_path(name: str, suffix: str = "") -> str:
+    """ Return the path of an out-of-core ledger by its name in partitions_dir """
+    if not name or os.path.basename(name) != name or name.startswith("."):
+        raise LoadError(f"Invalid out-of-core ledger name: {name}")
+    return os.path.join(partitions_dir, name + suffix)
+
+
+def read_chunks(source, params: Params, chunk_rows: int = CONST["ooc_chunk_rows"]) -> Iterable[pd.DataFrame]:
+    """Read a transaction CSV (a path, URL or file) chunk_rows rows at a
+    time, and yield each chunk normalized as by load_transactions.
+    Gnucash leaves the date and transaction of a split blank after the
+    first, so the last row of each chunk is carried into the next to
+    fill them in."""
+    carry = None
+    for chunk in pd.read_csv(source, thousands=",", low_memory=False, chunksize=chunk_rows):
+        if len(chunk) == 0:
+            continue
+        chunk = rename_columns(chunk, params)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        raw_last = chunk.iloc[[-1]].copy()
+        try:
+            trans = load_transactions(chunk)
+        except Exception as E:
+            raise LoadError(f"Could not import the transactions because: {type(E)}, {E}")
+        if carry is not None:
+            trans = trans.iloc[1:]
+        carry = raw_last
+        if len(trans) > 0:
+            carry["date"] = trans["date"].iloc[-1].isoformat()
+        if CONST["txn_col"] in trans.columns and len(trans) > 0:
+            carry[CONST["txn_col"]] = trans[CONST["txn_col"]].iloc[-1]
+        yield trans
+
+
+def empty_trans() -> pd.DataFrame:
+    """ The transactions of a cube with no rows """
+    result = pd.DataFrame({column: [] for column in COLUMNS})
+    result["date"] = result["date"].astype("datetime64[ns]")
+    return result
+
+
+def encode_text(values: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Return strings as the UTF-8 bytes of all of them, end to end, and
+    the offset in those bytes of each one's start, and of the end.  Both
+    are numeric, so SharedStore maps them, and any row can be decoded
+    without reading the rest."""
+    encoded = [str(x).encode("utf-8") for x in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+    return {"offsets": offsets, "blob": np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+
+
+def decode_text(text: Dict[str, np.ndarray], rows: np.ndarray) -> np.ndarray:
+    """ Decode only the given rows of strings stored by encode_text """
+    offsets, blob = text["offsets"], text["blob"]
+    return np.array(
+        [blob[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8") for row in rows], dtype=object
+    )
+
+
+def amount_signs(cube: Cube) -> np.ndarray:
+    """Return the sign that loading gives the amounts of each account code
+    in the cube: -1 for the descendents of the root accounts it flips
+    (see CONST["root_accounts"]).  An extra 1 at the end is the sign of
+    code -1, for accounts not in the cube."""
+    sign = np.ones(len(cube.ids) + 1)
+    for root in CONST["root_accounts"]:
+        if root["flip_negative"] and root["id"] in cube.code:
+            lo, hi = cube.account_range(root["id"])
+            sign[lo + 1:hi] = -1
+    return sign
+
+
+def cells_cube(
+    account_tree: ATree,
+    era_index: EraIndex,
+    key: np.ndarray,
+    amounts: np.ndarray,
+    counts: np.ndarray,
+    first_day: int,
+    last_day: int,
+) -> Cube:
+    """Return a cube with no rows, whose day cells are the sums of partial
+    cells, keyed as in Cube._day_cells (code × days + day - first_day).
+    Partial cells with the same key are added together."""
+    n_days = last_day - first_day + 1
+    cell_key, inverse = np.unique(key, return_inverse=True)
+    cell_day = cell_key % n_days + first_day
+    arrays = {
+        "row_code": np.zeros(0, dtype=np.int64),
+        "row_day": np.zeros(0, dtype=np.int64),
+        "day_code": cell_key // n_days,
+        "day_period": cell_day - first_day,
+        "day_amount": np.bincount(inverse, weights=amounts, minlength=len(cell_key)),
+        "day_count": np.bincount(inverse, weights=counts, minlength=len(cell_key)).astype(np.int64),
+        "day_first": cell_day,
+        "day_last": cell_day,
+    }
+    meta = {"first_day": first_day, "last_day": last_day, "day_offset": first_day, "day_n_periods": n_days}
+    return Cube(empty_trans(), account_tree, era_index, (arrays, meta))
+
+
+class PartitionedLedger:
+    """A ledger too big to hold in memory, as columnar partitions on
+    disk, one directory per year, each holding parts of at most
+    CONST["ooc_chunk_rows"] rows as memory-mapped arrays (see
+    sharedstore.SharedStore): the account (as a number in the ledger's
+    list of accounts), day number and amount of each transaction, and,
+    separately, its description, as offsets into a blob of UTF-8 bytes
+    (see encode_text).
+
+    The cube is built one part at a time: each part is summed into day
+    cells, which are much fewer than rows, and the cells of all parts
+    are summed together at the end, so memory is bounded by the size of
+    a part and of the cube, not the ledger.  Drill-down tables read only
+    the parts of the years in the selected dates.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.store = SharedStore(directory, max_datasets=sys.maxsize)
+        try:
+            with open(os.path.join(directory, "ledger.json")) as meta_file:
+                self.meta: dict = json.load(meta_file)
+        except (FileNotFoundError, ValueError):
+            raise LoadError(f"No partitioned ledger in {directory}")
+        self.accounts: List[str] = self.meta["accounts"]
+        self.first_day: int = self.meta["first_day"]
+        self.last_day: int = self.meta["last_day"]
+
+    @classmethod
+    def open(cls, name: str) -> "PartitionedLedger":
+        """ Open an ingested ledger by its name in partitions_dir """
+        return cls(ledger_path(name))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @classmethod
+    def ingest(
+        cls,
+        source,
+        directory: str,
+        params: Params,
+        chunk_rows: int = CONST["ooc_chunk_rows"],
+        progress: Callable = None,
+    ) -> "PartitionedLedger":
+        """Stream a transaction CSV (a path, URL or file) into partitions
+        in directory, chunk_rows rows at a time (see read_chunks).
+        directory must be new or empty."""
+        if os.path.isdir(directory) and os.listdir(directory):
+            raise LoadError(f"{directory} is not empty")
+        store = SharedStore(directory, max_datasets=sys.maxsize)
+        accounts: Dict[str, int] = {}
+        full_names: List[str] = []
+        parts: Dict[str, int] = {}
+        rows, first_day, last_day = 0, None, None
+        for trans in read_chunks(source, params, chunk_rows):
+            for account, full_name in trans[[CONST["account_col"], CONST["fan_col"]]].drop_duplicates(
+                CONST["account_col"]
+            ).itertuples(index=False):
+                if account not in accounts:
+                    accounts[account] = len(full_names)
+                    full_names.append(full_name)
+            codes = trans[CONST["account_col"]].map(accounts).to_numpy(dtype=np.int64)
+            days = trans["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+            years = trans["date"].dt.year.to_numpy()
+            amounts = trans["amount"].to_numpy(dtype=np.float64)
+            descriptions = trans["description"].to_numpy(dtype=object)
+            for year in np.unique(years):
+                inside = years == year
+                part = parts.get(str(year), 0)
+                arrays = {"account": codes[inside], "day": days[inside], "amount": amounts[inside]}
+                store.save(str(year), f"part {part:05d}", arrays)
+                # text is kept apart, and only the rows of a page are decoded
+                store.save(str(year), f"text {part:05d}", encode_text(descriptions[inside]))
+                parts[str(year)] = part + 1
+            if len(days) > 0:
+                first_day = int(days.min()) if first_day is None else min(first_day, int(days.min()))
+                last_day = int(days.max()) if last_day is None else max(last_day, int(days.max()))
+            rows += len(trans)
+            report(progress, f"Ingested {rows:,d} transactions")
+        if rows == 0:
+            raise LoadError("No data in file")
+        meta = {
+            "accounts": list(accounts),
+            "full_names": full_names,
+            "parts": parts,
+            "rows": rows,
+            "first_day": first_day,
+            "last_day": last_day,
+            "ingested": time.time(),
+        }
+        with open(os.path.join(directory, "ledger.json"), "w") as meta_file:
+            json.dump(meta, meta_file)
+        return cls(directory)
+
+    def account_tree(self, delimiter: str = CONST["delim"]) -> ATree:
+        """ Build the account tree from the full account names of the ledger's accounts """
+        return ATree.from_names(pd.Series(self.meta["full_names"]), delimiter).trim_excess_root()
+
+    def _parts(self, year: str = None) -> Iterable[Dict[str, np.ndarray]]:
+        """ Yield the arrays of each part of a year, or of every year in order """
+        for part_year in [year] if year else sorted(self.meta["parts"], key=int):
+            for part in range(self.meta["parts"][part_year]):
+                yield self.store.load(part_year, f"part {part:05d}")[0]
+
+    def _lookups(self, cube: Cube, accounts: Iterable[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return, for each of the ledger's account numbers, its code in the
+        cube (-1 if not in the tree, or not in accounts), and the sign of
+        its amounts, which are flipped for the descendents of the root
+        accounts that loading flips (see CONST["root_accounts"])"""
+        keep = None if accounts is None else set(accounts)
+        lookup = np.array(
+            [cube.code.get(x, -1) if keep is None or x in keep else -1 for x in self.accounts] + [-1],
+            dtype=np.int64,
+        )
+        return lookup, amount_signs(cube)
+
+    def cube(
+        self, account_tree: ATree, era_index: EraIndex = None, accounts: Iterable[str] = None, saved: tuple = None
+    ) -> Cube:
+        """Build the cube of the ledger (only of accounts, if given),
+        summing the day cells of one part at a time.  The cube has no
+        rows; use page() for drill-down."""
+        if saved is not None:
+            return Cube(empty_trans(), account_tree, era_index, saved)
+        lookup, sign = self._lookups(Cube(empty_trans(), account_tree), accounts)
+        n_days = self.last_day - self.first_day + 1
+        partials = []
+        for part in self._parts():
+            codes = lookup[part["account"]]
+            valid = codes >= 0
+            key = codes[valid] * n_days + (part["day"][valid] - self.first_day)
+            partials.append(sum_by_key(key, part["amount"][valid] * sign[codes[valid]]))
+        keys, amounts, counts = (np.concatenate(x) for x in zip(*partials))
+        return cells_cube(account_tree, era_index, keys, amounts, counts, self.first_day, self.last_day)
+
+    def page(
+        self, selection: Selection, rangesum: RangeSum, page_current: int, page_size: int
+    ) -> Tuple[pd.DataFrame, int, int]:
+        """Return one page of the transactions in a selection of the
+        ledger's cube, in date order, with the page number, moved back to
+        the last page if it is past it, and the number of selected
+        transactions, counted from rangesum.  Only the parts of the years
+        in the selection's dates are read, each once, and only until the
+        page is full; whole years before the page are skipped by their
+        count."""
+        total = selection.count(rangesum) if len(selection) > 0 else 0
+        page_current = min(page_current or 0, max(total - 1, 0) // page_size)
+        skip = page_current * page_size
+        wanted = min(page_size, max(total - skip, 0))
+        lookup, sign = self._lookups(selection.cube)
+        accounts = np.asarray(self.accounts, dtype=object)
+        found: List[pd.DataFrame] = []
+        years = sorted(self.meta["parts"], key=int)
+        first_year = pd.Timestamp(int(selection.start.min()) if total else 0, unit="D").year
+        last_year = pd.Timestamp(int(selection.end.max()) if total else 0, unit="D").year
+        for year in years:
+            if wanted == 0:
+                break
+            if int(year) < first_year or int(year) > last_year:
+                continue
+            # each year is a run of dates, so sorting within the year sorts the page
+            year_start = int(np.datetime64(f"{year}-01-01", "D").astype(np.int64))
+            year_end = int(np.datetime64(f"{int(year) + 1}-01-01", "D").astype(np.int64)) - 1
+            start = np.maximum(selection.start, year_start)
+            end = np.minimum(selection.end, year_end)
+            keep = start <= end
+            in_year = Selection(selection.cube, selection.lo[keep], selection.hi[keep], start[keep], end[keep])
+            count = in_year.count(rangesum) if len(in_year) > 0 else 0
+            if skip >= count:
+                skip -= count
+                continue
+            # the selected (code, day) keys as sorted intervals, each with the
+            # furthest end so far, so a key is selected if the last interval
+            # starting at or before it hasn't ended
+            codes, start, end, _ = in_year.expand()
+            low = Cube.day_key(codes, start)
+            by_low = np.argsort(low, kind="stable")
+            low = low[by_low]
+            high = np.maximum.accumulate(Cube.day_key(codes, end)[by_low])
+            parts = list(self._parts(year))
+            hits = []
+            for part_number, part in enumerate(parts):
+                key = Cube.day_key(lookup[part["account"]], part["day"])
+                interval = np.searchsorted(low, key, side="right") - 1
+                rows = np.flatnonzero((interval >= 0) & (key <= high[np.maximum(interval, 0)]))
+                hits.append((np.full(len(rows), part_number), rows, part["day"][rows]))
+            part_of, row_of, day_of = (np.concatenate(x) for x in zip(*hits))
+            order = np.lexsort((row_of, part_of, day_of))[skip:skip + wanted]
+            skip = 0
+            for part_number, part in enumerate(parts):
+                rows = row_of[order][part_of[order] == part_number]
+                if len(rows) == 0:
+                    continue
+                codes = lookup[part["account"][rows]]
+                text = self.store.load(year, f"text {part_number:05d}")[0]
+                found.append(
+                    pd.DataFrame(
+                        {
+                            "date": part["day"][rows].astype("datetime64[D]").astype("datetime64[ns]"),
+                            "description": decode_text(text, rows),
+                            "amount": (part["amount"][rows] * sign[codes]).astype(np.int64),
+                            CONST["account_col"]: accounts[part["account"][rows]],
+                        }
+                    )
+                )
+            wanted -= len(order)
+        if len(found) == 0:
+            return pd.DataFrame(columns=COLUMNS[:4]), page_current, total
+        page = pd.concat(found, ignore_index=True)
+        return page.sort_values("date", kind="stable", ignore_index=True), page_current, total
+
+
+if __name__ == "__main__":
+    # Ingest a transaction CSV too big to load, for opening with
+    # ?partsu=<name>.  Gnucash column names are assumed, as on the
+    # Settings tab.
+    parser = argparse.ArgumentParser(description="Ingest a transaction CSV into an out-of-core ledger")
+    parser.add_argument("source", help="path or URL of the CSV")
+    parser.add_argument("name", help=f"name of the ledger, in {partitions_dir}")
+    parser.add_argument("--chunk-rows", type=int, default=CONST["ooc_chunk_rows"])
+    args = parser.parse_args()
+    if os.path.basename(args.name) != args.name or args.name.startswith("."):
+        parser.error(f"Invalid ledger name: {args.name}")
+    params = Params()
+    params.fill_defaults()
+    ledger = PartitionedLedger.ingest(
+        args.source, os.path.join(partitions_dir, args.name), params, args.chunk_rows, progress=print
+    )
+    print(f"{len(ledger):,d} transactions, {len(ledger.accounts):,d} accounts, in {ledger.directory}")
@@ -0,0 +1,78 @@
+import textwrap
+
+import numpy as np
+import pandas as pd
+
+from params import CONST
+
+
+def format_amounts(amounts, unit: str = CONST["unit"]) -> pd.Categorical:
+    """Return amounts as strings like '$1,234', dictionary-encoded: each
+    distinct rounded amount is formatted once, however many times it
+    occurs."""
+    rounded = np.round(np.asarray(amounts, dtype=np.float64)) + 0.0  # no "-0"
+    codes, uniques = pd.factorize(rounded, sort=True)
+    return pd.Categorical.from_codes(codes, [f"{unit}{x:,.0f}" for x in uniques])
+
+
+def _encode(values: pd.Series, to_text) -> pd.Categorical:
+    """ Dictionary-encode values, converting only the distinct ones to text """
+    codes, uniques = pd.factorize(values, sort=True)
+    texts = pd.Index([to_text(x) for x in uniques])
+    # distinct values may have the same text, and categories must be unique
+    categories, text_codes = np.unique(texts, return_inverse=True)
+    return pd.Categorical.from_codes(text_codes[codes], categories)
+
+
+class Presentation:
+    """Display strings for every transaction of a dataset: formatted date,
+    amount with unit, and description wrapped for hover labels.
+
+    Each column is dictionary-encoded (a Categorical), since dates,
+    amounts and descriptions repeat a lot in a ledger, and each distinct
+    value is formatted only once.  The frame shares the index of the
+    transactions, so any selection of rows can be looked up with
+    frame.loc.  Build it through Datastore.presentation, which keeps one
+    per dataset and unit.
+    """
+
+    def __init__(
+        self,
+        trans: pd.DataFrame,
+        unit: str = CONST["unit"],
+        date_format: str = CONST["date_format"],
+        wrap_width: int = CONST["wrap_width"],
+    ):
+        self.unit = unit
+        wrapper = textwrap.TextWrapper(width=wrap_width)
+        self.frame = pd.DataFrame(
+            {
+                "date": _encode(trans["date"], lambda x: pd.Timestamp(x).strftime(date_format)),
+                "amount": format_amounts(trans["amount"], unit),
+                "description": _encode(
+                    trans["description"].fillna("").astype(str),
+                    lambda x: "<br>".join(wrapper.wrap(x)),
+                ),
+            },
+            index=trans.index,
+        )
+
+    def __len__(self):
+        return len(self.frame)
+
+    def dates(self, index) -> pd.Series:
+        """ Return the formatted dates of the transactions in index, as plain strings """
+        return self.frame["date"].loc[index].astype(str)
+
+    def hovertext(self, trans: pd.DataFrame) -> pd.Series:
+        """ Return a hover label for each of the transactions, which must be rows of this dataset """
+        rows = self.frame.loc[trans.index]
+        return (
+            trans["account"].astype(str)
+            + "<br>"
+            + rows["date"].astype(str)
+            + "<br>"
+            + rows["amount"].astype(str)
+            + "<br>"
+            + rows["description"].astype(str)
+        )
@@ -0,0 +1,132 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+from params import CONST
+
+
+class RangeSum:
+    """Index for answering "total of subtree S between dates a and b"
+    without touching the transactions.
+
+    The cube's day cells, sorted by (account code, day), are stored with a
+    running total, so each account's cells form one cumulative array.  The
+    total of one account between two days is the difference of two
+    entries, found by binary search.  Because accounts are numbered in
+    preorder, a running total of those per-account range totals gives the
+    total of every subtree over the same dates with one subtraction each.
+    """
+
+    DAY_SHIFT = Cube.DAY_SHIFT
+    CODE_SCALE = Cube.CODE_SCALE
+
+    def __init__(self, cube: Cube):
+        self.cube = cube
+        cells = cube.cells("day")
+        self._set_cells(cells["code"], cells["first"], cells["amount"], cells["count"])
+
+    def _set_cells(self, code: np.ndarray, day: np.ndarray, amount: np.ndarray, count: np.ndarray):
+        self.key = Cube.day_key(code, day)
+        self.amount = amount
+        self.count = count
+        self.prefix = np.concatenate([[0.0], np.cumsum(amount)])
+        self.count_prefix = np.concatenate([[0], np.cumsum(count)])
+
+    @staticmethod
+    def to_day(date) -> Optional[int]:
+        """ Convert a date-like value to a day number, or None """
+        if date is None or (isinstance(date, str) and len(date) == 0):
+            return None
+        return int(np.datetime64(pd.Timestamp(date), "D").astype(np.int64))
+
+    def _bounds(self, codes: np.ndarray, start, end):
+        """ Return the cell positions bracketing each account's cells between start and end """
+        start_day = self.to_day(start)
+        end_day = self.to_day(end)
+        lo_day = -self.DAY_SHIFT if start_day is None else start_day
+        hi_day = self.DAY_SHIFT - 1 if end_day is None else end_day
+        return self._day_bounds(codes, lo_day, hi_day)
+
+    def _day_bounds(self, codes: np.ndarray, start_days, end_days):
+        """ Return the cell positions bracketing each account's cells between day numbers """
+        i0 = np.searchsorted(self.key, Cube.day_key(codes, start_days), side="left")
+        i1 = np.searchsorted(self.key, Cube.day_key(codes, end_days), side="right")
+        return i0, i1
+
+    def range_totals(
+        self, codes: np.ndarray, start_days: np.ndarray, end_days: np.ndarray, counts: bool = False
+    ) -> np.ndarray:
+        """Return the total (or number of transactions, if counts) of each
+        account code's own transactions between the matching start and end
+        day numbers, inclusive."""
+        i0, i1 = self._day_bounds(codes, start_days, end_days)
+        prefix = self.count_prefix if counts else self.prefix
+        return prefix[i1] - prefix[i0]
+
+    def account_totals(self, start=None, end=None, counts: bool = False) -> np.ndarray:
+        """Return the total (or number of transactions, if counts) of each
+        account's own transactions between start and end inclusive, as an
+        array indexed by account code."""
+        codes = np.arange(len(self.cube.ids), dtype=np.int64)
+        i0, i1 = self._bounds(codes, start, end)
+        prefix = self.count_prefix if counts else self.prefix
+        return prefix[i1] - prefix[i0]
+
+    def subtree_totals(self, start=None, end=None, counts: bool = False) -> np.ndarray:
+        """Return the total of every account including its descendents,
+        between start and end inclusive, as an array indexed by account code."""
+        running = np.concatenate([[0], np.cumsum(self.account_totals(start, end, counts))])
+        codes = np.arange(len(self.cube.ids), dtype=np.int64)
+        return running[self.cube.end] - running[codes]
+
+    def total(self, account_id: str, start=None, end=None, deep: bool = True, counts: bool = False):
+        """ Return the total of one account, and its descendents if deep, between start and end """
+        lo, hi = self.cube.account_range(account_id, deep)
+        i0, i1 = self._bounds(np.arange(lo, hi, dtype=np.int64), start, end)
+        prefix = self.count_prefix if counts else self.prefix
+        return (prefix[i1] - prefix[i0]).sum()
+
+    def leaf_totals(self, account_id: str = None, start=None, end=None) -> pd.Series:
+        """Return the non-zero totals of the accounts in a subtree (the whole
+        tree if account_id is None) between start and end, as a Series
+        indexed by account, suitable for ATree.append_sums."""
+        if account_id is None:
+            lo, hi = 0, len(self.cube.ids)
+        else:
+            lo, hi = self.cube.account_range(account_id)
+        i0, i1 = self._bounds(np.arange(lo, hi, dtype=np.int64), start, end)
+        totals = pd.Series(self.prefix[i1] - self.prefix[i0], index=self.cube.ids[lo:hi])
+        return totals[totals != 0]
+
+    def append(self, trans: pd.DataFrame):
+        """Add transactions to the index.  New cells are merged into the
+        existing sorted cells by binary search, and the running totals
+        recomputed, without rebuilding from the original transactions.
+        Transactions for accounts not in the tree are ignored."""
+        codes = trans[CONST["account_col"]].map(self.cube.code)
+        valid = codes.notna().to_numpy()
+        if not valid.any():
+            return
+        codes = codes.to_numpy()[valid].astype(np.int64)
+        days = trans["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)[valid]
+        amounts = trans["amount"].to_numpy(dtype=np.float64)[valid]
+        new_key, inverse = np.unique(Cube.day_key(codes, days), return_inverse=True)
+        new_amount = np.bincount(inverse, weights=amounts, minlength=len(new_key))
+        new_count = np.bincount(inverse, minlength=len(new_key))
+        position = np.searchsorted(self.key, new_key)
+        found = position < len(self.key)
+        found[found] = self.key[position[found]] == new_key[found]
+        amount = self.amount.copy()
+        count = self.count.copy()
+        np.add.at(amount, position[found], new_amount[found])
+        np.add.at(count, position[found], new_count[found])
+        new = ~found
+        key = np.insert(self.key, position[new], new_key[new])
+        self._set_cells(
+            key // self.CODE_SCALE,
+            key % self.CODE_SCALE - self.DAY_SHIFT,
+            np.insert(amount, position[new], new_amount[new]),
+            np.insert(count, position[new], new_count[new]),
+        )
@@ -0,0 +1,142 @@
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from cube import Cube
+from rangesum import RangeSum
+
+
+class Selection:
+    """A selection of transactions, as a set of rectangles of (account
+    subtree, date interval).
+
+    Each rectangle is a range of account codes [lo, hi) from the cube,
+    which is always one account and its descendents, and an inclusive
+    range of day numbers.  Rectangles for the same account are merged
+    when their dates overlap or touch, so selecting many adjacent periods
+    of a chart gives one rectangle per account per run of periods.  The
+    transactions and totals of the whole selection are then found with
+    one batch of binary searches, rather than one filter per period.
+    """
+
+    def __init__(
+        self, cube: Cube, lo: np.ndarray, hi: np.ndarray, start: np.ndarray, end: np.ndarray
+    ):
+        self.cube = cube
+        self.lo, self.hi, self.start, self.end = self._merge(
+            *(np.asarray(x, dtype=np.int64) for x in (lo, hi, start, end))
+        )
+
+    @classmethod
+    def from_pairs(cls, cube: Cube, accounts: Sequence[str], starts, ends) -> "Selection":
+        """Make a selection from parallel sequences of account ids and
+        start and end dates.  Each account includes its descendents."""
+        ranges = np.array([cube.account_range(account) for account in accounts], dtype=np.int64)
+        ranges = ranges.reshape(-1, 2)
+        return cls(cube, ranges[:, 0], ranges[:, 1], cls._to_days(starts), cls._to_days(ends))
+
+    @classmethod
+    def from_records(cls, cube: Cube, records: List[list]) -> "Selection":
+        """ Make a selection from the [account, start, end] records of to_records """
+        records = records or []
+        return cls.from_pairs(
+            cube, [r[0] for r in records], [r[1] for r in records], [r[2] for r in records]
+        )
+
+    @staticmethod
+    def _to_days(dates) -> np.ndarray:
+        return pd.to_datetime(np.asarray(dates)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+    @staticmethod
+    def _merge(lo, hi, start, end):
+        """ Sort the rectangles and merge those of the same account whose dates overlap or touch """
+        if len(lo) == 0:
+            return lo, hi, start, end
+        order = np.lexsort((start, hi, lo))
+        lo, hi, start, end = lo[order], hi[order], start[order], end[order]
+        new_account = np.concatenate([[True], (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])])
+        account = np.cumsum(new_account)
+        # running latest end date within each account
+        running_end = (
+            np.maximum.accumulate(Cube.day_key(account, end)) - account * Cube.CODE_SCALE - Cube.DAY_SHIFT
+        )
+        new_run = new_account.copy()
+        new_run[1:] |= start[1:] > running_end[:-1] + 1
+        first = np.flatnonzero(new_run)
+        return lo[first], hi[first], start[first], np.maximum.reduceat(end, first)
+
+    def __len__(self):
+        return len(self.lo)
+
+    def restrict(self, account_ids: Sequence[str]) -> "Selection":
+        """Return the part of the selection inside the subtrees of the
+        accounts.  Accounts not in the account tree are ignored."""
+        parts = [self.cube.account_range(a) for a in account_ids if a in self.cube.code]
+        if len(parts) == 0 or len(self) == 0:
+            return Selection(self.cube, [], [], [], [])
+        ranges = np.array(parts, dtype=np.int64)
+        lo = np.maximum.outer(ranges[:, 0], self.lo).ravel()
+        hi = np.minimum.outer(ranges[:, 1], self.hi).ravel()
+        start = np.tile(self.start, len(ranges))
+        end = np.tile(self.end, len(ranges))
+        keep = lo < hi
+        return Selection(self.cube, lo[keep], hi[keep], start[keep], end[keep])
+
+    def expand(self):
+        """Return parallel arrays of account code, start day, end day and
+        rectangle number, with one entry for every account code covered
+        by every rectangle."""
+        lengths = self.hi - self.lo
+        rectangle = np.repeat(np.arange(len(self)), lengths)
+        run_start = np.cumsum(lengths) - lengths
+        codes = self.lo[rectangle] + np.arange(lengths.sum()) - run_start[rectangle]
+        return codes, self.start[rectangle], self.end[rectangle], rectangle
+
+    def positions(self) -> np.ndarray:
+        """ Return the positions in the cube's trans of the selected transactions, in order """
+        codes, start, end, _ = self.expand()
+        return self.cube.row_positions(codes, start, end)
+
+    def rows(self) -> pd.DataFrame:
+        """ Return the selected transactions, in their original order """
+        return self.cube.trans.iloc[self.positions()]
+
+    def count(self, rangesum: RangeSum) -> int:
+        """ Return the number of selected transactions """
+        codes, start, end, _ = self.expand()
+        return int(rangesum.range_totals(codes, start, end, counts=True).sum())
+
+    def leaf_totals(self, rangesum: RangeSum, positize: bool = False) -> pd.Series:
+        """Return the non-zero totals of the selected accounts, as a Series
+        indexed by account, suitable for ATree.append_sums.  If positize,
+        the totals of each selected account are flipped if they net
+        negative, as in the periodic bars."""
+        codes, start, end, rectangle = self.expand()
+        totals = rangesum.range_totals(codes, start, end)
+        if positize and len(totals) > 0:
+            # every rectangle is a whole subtree, so lo identifies its account
+            _, account = np.unique(self.lo, return_inverse=True)
+            account_total = np.bincount(account[rectangle], weights=totals)
+            totals = totals * np.where(account_total < 0, -1, 1)[account[rectangle]]
+        by_code = np.bincount(codes, weights=totals, minlength=len(self.cube.ids))
+        result = pd.Series(by_code, index=self.cube.ids)
+        return result[result != 0]
+
+    def accounts(self) -> List[str]:
+        """ Return the selected accounts, without repeats, in tree order """
+        return [self.cube.ids[code] for code in np.unique(self.lo)]
+
+    def date_range(self):
+        """ Return the earliest and latest selected dates """
+        return (
+            self.start.min().astype("datetime64[D]"),
+            self.end.max().astype("datetime64[D]"),
+        )
+
+    def to_records(self) -> List[list]:
+        """ Return the rectangles as JSON-friendly [account, start, end] records """
+        return [
+            [self.cube.ids[lo], str(start.astype("datetime64[D]")), str(end.astype("datetime64[D]"))]
+            for lo, start, end in zip(self.lo, self.start, self.end)
+        ]
@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Caches are private to the user the server runs as, under its cache home.
+cache_home = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "ledgex"
+)
+
+# Loaded datasets, and their derived arrays, are written here once and
+# memory-mapped read-only by every server worker.
+cache_dir = os.environ.get("LEDGEX_DATA_CACHE", os.path.join(cache_home, "data"))
+
+
+def private_dir(path: str) -> str:
+    """Return path, a directory that only the current user can use,
+    creating it if need be.  Cached text and jobs are unpickled from
+    these directories, so one that anyone else could have written to
+    (not owned by the user, a symlink, or open to its group or others)
+    is refused with a PermissionError rather than used."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    status = os.lstat(path)
+    if (
+        not stat.S_ISDIR(status.st_mode)
+        or (hasattr(os, "getuid") and status.st_uid != os.getuid())
+        or status.st_mode & 0o077
+    ):
+        raise PermissionError(f"{path} must be a directory of this user's, with no access for anyone else")
+    return path
+
+
+class SharedStore:
+    """Named groups of arrays for each dataset, as .npy files in a local
+    cache directory, so every server worker maps one copy into memory
+    instead of keeping its own, and a worker that hasn't seen a dataset
+    yet loads it without parsing.
+
+    Each group is a directory, <dataset key>/<name>/, with one file per
+    array and a meta.json for anything else.  Numeric arrays are
+    memory-mapped read-only.  Object arrays (text) can't be mapped, so
+    they are stored dictionary-encoded, as by pd.factorize(sort=True):
+    the codes are mapped, and only the distinct values are read into
+    each worker.  They are loaded as Categoricals of the mapped codes,
+    so only the rows that are read are ever decoded.  A group is written
+    to a temporary directory and renamed into place, so workers racing
+    to write the same group never see half of one.  Only the most
+    recently used max_datasets datasets are kept.
+    """
+
+    def __init__(self, directory: str = cache_dir, max_datasets: int = 32):
+        self.directory = directory
+        self.max_datasets = max_datasets
+
+    def _path(self, key: str, name: str = "") -> str:
+        return os.path.join(self.directory, key, name)
+
+    def load(self, key: str, name: str) -> Optional[Tuple[Dict[str, np.ndarray], dict]]:
+        """Return the arrays and meta of a group, or None if it hasn't been
+        saved.  Object arrays are returned as Categoricals, with NaN for
+        missing values; their codes (-1 for missing) and sorted distinct
+        values are also returned, as '<array>.codes' and '<array>.values'."""
+        private_dir(self.directory)
+        path = self._path(key, name)
+        try:
+            with open(os.path.join(path, "meta.json")) as meta_file:
+                meta = json.load(meta_file)
+            arrays = {}
+            for array in meta.pop("_arrays"):
+                if array["encoded"]:
+                    codes = np.load(os.path.join(path, array["name"] + ".codes.npy"), mmap_mode="r")
+                    values = np.load(os.path.join(path, array["name"] + ".values.npy"), allow_pickle=True)
+                    arrays[array["name"] + ".codes"] = codes
+                    arrays[array["name"] + ".values"] = values
+                    # the codes are saved as the dtype pandas uses, so they aren't copied
+                    arrays[array["name"]] = pd.Categorical.from_codes(codes, pd.Index(values, dtype=object))
+                else:
+                    arrays[array["name"]] = np.load(os.path.join(path, array["name"] + ".npy"), mmap_mode="r")
+            os.utime(self._path(key))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return arrays, meta
+
+    def save(self, key: str, name: str, arrays: Dict[str, np.ndarray], meta: dict = None):
+        """Write a group of arrays, and json-able meta, unless another worker
+        already has"""
+        private_dir(self.directory)
+        if os.path.exists(self._path(key, name)):
+            return
+        os.makedirs(self._path(key), exist_ok=True)
+        temp = tempfile.mkdtemp(prefix=f".{name}.", dir=self._path(key))
+        listing = []
+        for array_name, array in arrays.items():
+            array = np.asarray(array)
+            encoded = array.dtype == object
+            if encoded:
+                codes, values = pd.factorize(array, sort=True)
+                codes = codes.astype(pd.Categorical.from_codes(codes[:0], values).codes.dtype)
+                np.save(os.path.join(temp, array_name + ".codes.npy"), codes)
+                values = np.asarray(values, dtype=object)
+                np.save(os.path.join(temp, array_name + ".values.npy"), values, allow_pickle=True)
+            else:
+                np.save(os.path.join(temp, array_name + ".npy"), array)
+            listing.append({"name": array_name, "encoded": bool(encoded)})
+        with open(os.path.join(temp, "meta.json"), "w") as meta_file:
+            json.dump({**(meta or {}), "_arrays": listing}, meta_file)
+        try:
+            os.rename(temp, self._path(key, name))
+        except OSError:
+            # another worker got there first
+            shutil.rmtree(temp, ignore_errors=True)
+        self._evict()
+
+    def _evict(self):
+        """ Remove the least recently used datasets beyond max_datasets """
+        keys = [x for x in os.scandir(self.directory) if x.is_dir()]
+        if len(keys) <= self.max_datasets:
+            return
+        keys.sort(key=lambda x: x.stat().st_mtime)
+        for entry in keys[: len(keys) - self.max_datasets]:
+            # workers that have the files mapped keep them until they let go
+            shutil.rmtree(entry.path, ignore_errors=True)
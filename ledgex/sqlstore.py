@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from atree import ATree
+from cube import Cube
+from eras import EraIndex
+from errors import LoadError
+from loading import report
+from params import CONST, Params
+from partitions import PartitionedLedger, amount_signs, cells_cube, empty_trans, ledger_path, read_chunks
+from rangesum import RangeSum
+from selection import Selection
+
+SUFFIX = ".sqlite"
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE accounts (code INTEGER PRIMARY KEY, end INTEGER NOT NULL, id TEXT NOT NULL);
+CREATE TABLE trans (account_preorder INTEGER NOT NULL, day INTEGER NOT NULL, amount NUMERIC, description TEXT);
+"""
+
+# Both cover the cube's aggregate and the counts of selections, so
+# those never read the table; pages read it only for their rows.
+# ANALYZE gives the planner the statistics to pick between them.
+INDEXES = """
+CREATE INDEX trans_account_day ON trans (account_preorder, day, amount);
+CREATE INDEX trans_day ON trans (day, account_preorder);
+ANALYZE;
+"""
+
+
+def open_ledger(name: str):
+    """Open an out-of-core ledger by its name in partitions_dir: a SQLite
+    file, <name>.sqlite, if there is one, or else partitions"""
+    if os.path.exists(ledger_path(name, SUFFIX)):
+        return SqlLedger.open(name)
+    return PartitionedLedger.open(name)
+
+
+class SqlLedger:
+    """A ledger in a local SQLite file, as an alternative backend to
+    PartitionedLedger with the same interface, for datasets too big or
+    too long-lived to parse into memory.
+
+    Transactions are stored with the preorder code of their account,
+    with indexes on (account_preorder, day) and (day), and the account
+    tree is stored as an interval table: the subtree of each account is
+    the codes [code, end).  A subtree × date range is then a range scan
+    of an index.  The cube's day cells come from one GROUP BY over the
+    covering index, and table pages and their counts are indexed queries
+    over the selection's intervals.  Amounts are stored as loading
+    presents them, with flipped signs (see CONST["root_accounts"]).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path):
+            raise LoadError(f"No SQLite ledger in {path}")
+        # read-only, and shared by the threads of a server worker
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.meta: dict = {key: json.loads(value) for key, value in self.connection.execute("SELECT key, value FROM meta")}
+        self.first_day: int = self.meta["first_day"]
+        self.last_day: int = self.meta["last_day"]
+        self.intervals: Dict[str, Tuple[int, int]] = {
+            account: (code, end) for code, end, account in self.connection.execute("SELECT code, end, id FROM accounts")
+        }
+
+    @classmethod
+    def open(cls, name: str) -> "SqlLedger":
+        """ Open an ingested ledger by its name in partitions_dir """
+        return cls(ledger_path(name, SUFFIX))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @classmethod
+    def ingest(
+        cls,
+        source,
+        path: str,
+        params: Params,
+        chunk_rows: int = CONST["ooc_chunk_rows"],
+        progress: Callable = None,
+    ) -> "SqlLedger":
+        """Stream a transaction CSV (a path, URL or file) into a new SQLite
+        file, chunk_rows rows at a time (see partitions.read_chunks).
+        Rows are staged with the number of their account until the whole
+        account tree is known, then copied in their original order with
+        their account's preorder code, and indexed.  The file is built
+        under a temporary name, so a failed ingest leaves nothing at path."""
+        if os.path.exists(path):
+            raise LoadError(f"{path} already exists")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp = f"{path}.{os.getpid()}.partial"
+        connection = sqlite3.connect(temp)
+        try:
+            connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+            connection.execute(
+                "CREATE TEMP TABLE staging (account INTEGER, day INTEGER, amount NUMERIC, description TEXT)"
+            )
+            accounts: Dict[str, int] = {}
+            full_names: List[str] = []
+            rows, first_day, last_day = 0, None, None
+            for trans in read_chunks(source, params, chunk_rows):
+                for account, full_name in trans[[CONST["account_col"], CONST["fan_col"]]].drop_duplicates(
+                    CONST["account_col"]
+                ).itertuples(index=False):
+                    if account not in accounts:
+                        accounts[account] = len(full_names)
+                        full_names.append(full_name)
+                days = trans["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+                connection.executemany(
+                    "INSERT INTO staging VALUES (?, ?, ?, ?)",
+                    zip(
+                        trans[CONST["account_col"]].map(accounts).tolist(),
+                        days.tolist(),
+                        trans["amount"].tolist(),
+                        trans["description"].tolist(),
+                    ),
+                )
+                if len(days) > 0:
+                    first_day = int(days.min()) if first_day is None else min(first_day, int(days.min()))
+                    last_day = int(days.max()) if last_day is None else max(last_day, int(days.max()))
+                rows += len(trans)
+                report(progress, f"Ingested {rows:,d} transactions")
+            if rows == 0:
+                raise LoadError("No data in file")
+
+            report(progress, "Indexing the account tree")
+            cube = Cube(empty_trans(), ATree.from_names(pd.Series(full_names), params.ds_delimiter).trim_excess_root())
+            sign = amount_signs(cube)
+            connection.executemany(
+                "INSERT INTO accounts VALUES (?, ?, ?)",
+                ((code, int(cube.end[code]), account) for code, account in enumerate(cube.ids)),
+            )
+            connection.execute("CREATE TEMP TABLE numbers (number INTEGER PRIMARY KEY, code INTEGER, sign INTEGER)")
+            codes = [cube.code.get(account, -1) for account in accounts]
+            connection.executemany(
+                "INSERT INTO numbers VALUES (?, ?, ?)",
+                ((number, code, int(sign[code])) for number, code in enumerate(codes)),
+            )
+            connection.execute(
+                "INSERT INTO trans SELECT n.code, s.day, s.amount * n.sign, s.description"
+                " FROM staging s JOIN numbers n ON n.number = s.account ORDER BY s.rowid"
+            )
+            connection.execute("DROP TABLE staging")
+            report(progress, f"Indexing {rows:,d} transactions")
+            connection.executescript(INDEXES)
+            meta = {
+                "full_names": full_names,
+                "delimiter": params.ds_delimiter,
+                "rows": rows,
+                "first_day": first_day,
+                "last_day": last_day,
+                "ingested": time.time(),
+            }
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in meta.items()))
+            connection.commit()
+            connection.close()
+            os.rename(temp, path)
+        except BaseException:
+            connection.close()
+            os.remove(temp)
+            raise
+        return cls(path)
+
+    def account_tree(self, delimiter: str = CONST["delim"]) -> ATree:
+        """ Build the account tree from the full account names of the ledger's accounts """
+        return ATree.from_names(pd.Series(self.meta["full_names"]), delimiter).trim_excess_root()
+
+    def _lookup(self, cube: Cube, accounts: Iterable[str] = None) -> np.ndarray:
+        """Return the code in the cube of each stored account code (-1 if not
+        in the cube, or not in accounts), with an extra -1 at the end for
+        stored code -1"""
+        keep = None if accounts is None else set(accounts)
+        lookup = np.full(len(self.intervals) + 1, -1, dtype=np.int64)
+        for account, (code, _) in self.intervals.items():
+            if keep is None or account in keep:
+                lookup[code] = cube.code.get(account, -1)
+        return lookup
+
+    def cube(
+        self, account_tree: ATree, era_index: EraIndex = None, accounts: Iterable[str] = None, saved: tuple = None
+    ) -> Cube:
+        """Build the cube of the ledger (only of accounts, if given) from
+        one GROUP BY (account, day) over the covering index.  The cube has
+        no rows; use page() for drill-down."""
+        if saved is not None:
+            return Cube(empty_trans(), account_tree, era_index, saved)
+        lookup = self._lookup(Cube(empty_trans(), account_tree), accounts)
+        n_days = self.last_day - self.first_day + 1
+        cursor = self.connection.execute(
+            "SELECT account_preorder, day, SUM(amount), COUNT(*) FROM trans"
+            " WHERE account_preorder >= 0 GROUP BY account_preorder, day"
+        )
+        partials = []
+        while True:
+            batch = cursor.fetchmany(1 << 16)
+            if not batch:
+                break
+            stored, day, amount, count = (np.array(x) for x in zip(*batch))
+            codes = lookup[stored]
+            valid = codes >= 0
+            key = codes[valid] * n_days + (day[valid] - self.first_day)
+            partials.append((key, amount[valid].astype(np.float64), count[valid]))
+        if len(partials) == 0:
+            partials = [(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64))]
+        keys, amounts, counts = (np.concatenate(x) for x in zip(*partials))
+        return cells_cube(account_tree, era_index, keys, amounts, counts, self.first_day, self.last_day)
+
+    def _selected(self, selection: Selection) -> str:
+        """Return a query of the transactions' rowids in the selection's
+        intervals, joining trans against a VALUES table of them.  The
+        bounds are integers written into the SQL, so any number of
+        rectangles fits under SQLite's limit on bound parameters."""
+        values = []
+        for lo, start, end in zip(selection.lo, selection.start, selection.end):
+            # every rectangle is a whole subtree, so lo identifies its account
+            interval = self.intervals.get(selection.cube.ids[lo])
+            if interval is not None:
+                values.append(f"({int(interval[0])}, {int(interval[1])}, {int(start)}, {int(end)})")
+        rectangles = f"VALUES {', '.join(values)}" if values else "SELECT 0, 0, 0, 0 WHERE 0"
+        # rectangles may overlap, so the rowids are made distinct
+        return (
+            f"WITH selected (lo, hi, first_day, last_day) AS ({rectangles})"
+            " SELECT DISTINCT t.rowid FROM selected s JOIN trans t"
+            " ON t.account_preorder >= s.lo AND t.account_preorder < s.hi AND t.day BETWEEN s.first_day AND s.last_day"
+        )
+
+    def page(
+        self, selection: Selection, rangesum: RangeSum, page_current: int, page_size: int
+    ) -> Tuple[pd.DataFrame, int, int]:
+        """Return one page of the transactions in a selection of the
+        ledger's cube, in date order, with the page number, moved back to
+        the last page if it is past it, and the number of selected
+        transactions.  Both are indexed queries; the count is answered
+        from the index alone, so rangesum, which PartitionedLedger.page
+        counts with, isn't needed."""
+        selected = self._selected(selection)
+        total = self.connection.execute(f"SELECT COUNT(*) FROM ({selected})").fetchone()[0]
+        page_current = min(page_current or 0, max(total - 1, 0) // page_size)
+        rows = self.connection.execute(
+            "SELECT t.day, t.description, t.amount, a.id FROM trans t JOIN accounts a ON a.code = t.account_preorder"
+            f" WHERE t.rowid IN ({selected}) ORDER BY t.day, t.rowid LIMIT ? OFFSET ?",
+            [page_size, page_current * page_size],
+        ).fetchall()
+        page = pd.DataFrame(rows, columns=["date", "description", "amount", CONST["account_col"]])
+        page["date"] = page["date"].to_numpy(dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+        return page, page_current, total
+
+
+if __name__ == "__main__":
+    # Ingest a transaction CSV into a SQLite ledger, for opening with
+    # ?partsu=<name>, like partitions.py.
+    parser = argparse.ArgumentParser(description="Ingest a transaction CSV into a SQLite ledger")
+    parser.add_argument("source", help="path or URL of the CSV")
+    parser.add_argument("name", help="name of the ledger, in the partitions directory")
+    parser.add_argument("--chunk-rows", type=int, default=CONST["ooc_chunk_rows"])
+    args = parser.parse_args()
+    params = Params()
+    params.fill_defaults()
+    ledger = SqlLedger.ingest(args.source, ledger_path(args.name, SUFFIX), params, args.chunk_rows, progress=print)
+    print(f"{len(ledger):,d} transactions, {len(ledger.intervals):,d} accounts, in {ledger.path}")
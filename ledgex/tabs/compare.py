@@ -1,25 +1,161 @@
-import logging
-
+import dash
 from dash import dcc, html
 import pandas as pd
-import plotly.graph_objects as go
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 from app import app
-from atree import ATree
+from comparison import Comparison, era_days
 from params import CONST, Params
-from utils import make_cum_area, preventupdate_if_empty
+from utils import make_delta_bars, make_delta_sunburst, preventupdate_if_empty, visible_deltas
 from datastore import Datastore
 
+
+def range_picker(side: str) -> html.Div:
+    """ Controls for one of the two compared date ranges """
+    return html.Div(
+        className="control_group",
+        children=[
+            html.Span(children=f"{side.upper()} "),
+            dcc.DatePickerRange(id=f"co_range_{side}", display_format="YYYY-MM-DD"),
+            dcc.Dropdown(id=f"co_era_{side}", placeholder="or pick an era", searchable=False),
+        ],
+    )
+
+
 layout: html = html.Div(
     className="layout_box",
     children=[
+        html.Div(id="co_dummy", className="hidden", children="getstarted"),
         html.Div(
-            className="time_series_box",
-            children=[
-                html.H2("Stub for comparing two different things side by side"),
-                html.Div(id="comparison", className="flex_down"),
-            ],
+            className="control_bar",
+            children=[range_picker("a"), range_picker("b")],
         ),
+        html.Div(id="co_text", children=""),
+        html.Div(id="comparison", className="flex_down"),
+    ],
+)
+
+
+@app.callback(
+    [
+        Output("co_range_a", "start_date"),
+        Output("co_range_a", "end_date"),
+        Output("co_range_b", "start_date"),
+        Output("co_range_b", "end_date"),
+        Output("co_era_a", "options"),
+        Output("co_era_b", "options"),
+    ],
+    Input("co_dummy", "children"),
+    State("data_store", "children"),
+)
+def co_load(dummy, data_store):
+    """Start by comparing the last year of data to the year before it,
+    and offer the dataset's eras as ranges"""
+    preventupdate_if_empty(data_store)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    end_b = pd.Timestamp(data_store.latest_trans).normalize()
+    start_b = end_b - pd.DateOffset(years=1) + pd.DateOffset(days=1)
+    end_a = start_b - pd.DateOffset(days=1)
+    start_a = start_b - pd.DateOffset(years=1)
+    era_index = data_store.era_index()
+    options = [{"label": label, "value": i} for i, label in enumerate(era_index.labels)]
+    return [x.date().isoformat() for x in (start_a, end_a, start_b, end_b)] + [options, options]
+
+
+@app.callback(
+    [
+        Output("co_range_a", "start_date", allow_duplicate=True),
+        Output("co_range_a", "end_date", allow_duplicate=True),
+        Output("co_range_b", "start_date", allow_duplicate=True),
+        Output("co_range_b", "end_date", allow_duplicate=True),
+    ],
+    Input("co_era_a", "value"),
+    Input("co_era_b", "value"),
+    State("data_store", "children"),
+    prevent_initial_call=True,
+)
+def co_pick_era(era_a, era_b, data_store):
+    """ Set a date range to the era picked for it """
+    preventupdate_if_empty(data_store)
+    side = dash.callback_context.triggered_id
+    era = era_a if side == "co_era_a" else era_b
+    if era is None:
+        raise PreventUpdate
+    era_index = Datastore.from_json(data_store).era_index()
+    start, end = (pd.Timestamp(x, unit="D").date().isoformat() for x in era_days(era_index, era))
+    if side == "co_era_a":
+        return [start, end, dash.no_update, dash.no_update]
+    return [dash.no_update, dash.no_update, start, end]
+
+
+def range_labels(start_a, end_a, start_b, end_b) -> tuple:
+    """ Name the two compared ranges by their dates """
+    return (f"{start_a or '…'} to {end_a or '…'}", f"{start_b or '…'} to {end_b or '…'}")
+
+
+@app.callback(
+    [Output("comparison", "children"), Output("co_text", "children")],
+    [
+        Input("co_range_a", "start_date"),
+        Input("co_range_a", "end_date"),
+        Input("co_range_b", "start_date"),
+        Input("co_range_b", "end_date"),
+    ],
+    State("data_store", "children"),
+    State("param_store", "children"),
+)
+def co_make_charts(start_a, end_a, start_b, end_b, data_store, param_store):
+    """Compare the total of every account, including its descendents,
+    between the two date ranges, as a bar chart of the biggest changes
+    and a sunburst colored by change."""
+    preventupdate_if_empty(data_store)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    params: Params() = Params.from_json(param_store)
+    comparison = Comparison(data_store.rangesum(), (start_a, end_a), (start_b, end_b))
+    deltas = comparison.frame(params.co_roots)
+    if len(deltas) == 0:
+        return [[], "No transactions in either range."]
+    labels = range_labels(start_a, end_a, start_b, end_b)
+    charts = [
+        dcc.Graph(figure=make_delta_bars(deltas, labels, unit=params.unit)),
+        dcc.Graph(id="co_sunburst", figure=make_delta_sunburst(deltas, labels, unit=params.unit)),
+    ]
+    text = f"A is {labels[0]}, B is {labels[1]}"
+    if params.co_roots:
+        text = text + f", within {', '.join(params.co_roots)}"
+    return [charts, text]
+
+
+@app.callback(
+    Output("co_sunburst", "figure"),
+    Input("co_sunburst", "clickData"),
+    [
+        State("co_sunburst", "figure"),
+        State("co_range_a", "start_date"),
+        State("co_range_a", "end_date"),
+        State("co_range_b", "start_date"),
+        State("co_range_b", "end_date"),
+        State("data_store", "children"),
+        State("param_store", "children"),
     ],
+    prevent_initial_call=True,
 )
+def co_focus_sunburst(click_data, figure, start_a, end_a, start_b, end_b, data_store, param_store):
+    """Center the delta sunburst on a clicked account, sending the levels
+    below it that weren't sent yet; clicking the center goes up a level"""
+    preventupdate_if_empty(data_store)
+    preventupdate_if_empty(click_data)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    params: Params() = Params.from_json(param_store)
+    comparison = Comparison(data_store.rangesum(), (start_a, end_a), (start_b, end_b))
+    deltas = comparison.frame(params.co_roots)
+    parents = dict(zip(deltas["account"], deltas["parent"]))
+    shown = figure["data"][0] if figure else {}
+    focus = click_data["points"][0]["id"].replace(CONST["more_suffix"], "")
+    if focus in parents and focus == shown.get("level"):
+        focus = parents[focus] or None
+    if set(visible_deltas(deltas, focus)["account"]) <= set(shown.get("ids", [])):
+        # everything to be shown is already in the browser
+        raise PreventUpdate
+    labels = range_labels(start_a, end_a, start_b, end_b)
+    return make_delta_sunburst(deltas, labels, unit=params.unit, focus=focus)
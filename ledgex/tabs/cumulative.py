@@ -1,12 +1,13 @@
+import dash
 from dash import dcc, html
-import pandas as pd
 import plotly.graph_objects as go
-from dash.dependencies import Input, Output, State
+from dash.dependencies import MATCH, ClientsideFunction, Input, Output, State
 from dash.exceptions import PreventUpdate
 from app import app
 from atree import ATree
+from cube import Cube
 from params import CONST, Params
-from utils import layouts, make_cum_area, preventupdate_if_empty
+from utils import fit_resolution, layouts, make_cum_areas, preventupdate_if_empty, zoom_window
 from datastore import Datastore
 
 layout: html = html.Div(
@@ -43,6 +44,42 @@ def load_cu_params(param_store: str):
     return [params.init_time_res]
 
 
+def cu_make_figure(
+    data_store: Datastore, account: str, time_resolution: str, params: Params, zoom: dict = None
+) -> go.Figure:
+    """Generate the cumulative chart for one account.  At Auto
+    resolution, the resolution is the finest that fits the visible dates
+    in the chart's width, and only the visible periods and a margin are
+    drawn, starting from the balance before them."""
+    cube: Cube = data_store.cube()
+    unit: str = params.unit
+    data_title = params.ds_data_title
+    fig: go.Figure = go.Figure(layout=layouts['base'])
+    fig.update_layout(
+        title={"text": f"{data_title} {account}: Cumulative {unit}"},
+        xaxis={"showgrid": True, "nticks": 20},
+        yaxis={"showgrid": True},
+        legend={
+            "xanchor": "left",
+            "x": 0,
+            "yanchor": "bottom",
+            "y": 0,
+            "bgcolor": "rgba(0, 0, 0, 0)",
+        },
+        barmode="relative",
+    )
+    window = {}
+    if time_resolution == "auto":
+        visible_start, visible_end, window["start"], window["end"] = zoom_window(
+            zoom, data_store.earliest_trans, data_store.latest_trans
+        )
+        time_resolution = fit_resolution(visible_start, visible_end, (zoom or {}).get("width"))
+        if (zoom or {}).get("range"):
+            fig.update_xaxes(range=[visible_start, visible_end])
+    fig.add_traces(make_cum_areas(cube, account, time_resolution, params.cu_max_points, **window))
+    return fig
+
+
 @app.callback(
     [Output("time_serieses", "children")],
     Input("cu_time_series_resolution", "value"),
@@ -55,14 +92,11 @@ def cu_make_time_serieses(time_resolution, data_store, param_store):
     if not time_resolution:
         time_resolution = params.init_time_res
     data_store: Datastore() = Datastore.from_json(data_store, params.cu_roots)
-    trans: pd.DataFrame = data_store.trans
     account_tree: ATree = data_store.account_tree
     if len(params.cu_roots) > 0:
         account_list = params.cu_roots
     else:
         account_list = [account_tree.root]
-    unit: str = params.unit
-    data_title = params.ds_data_title
     result: list = []
     # make one chart for each item in the Cumulative account filter
 
@@ -70,30 +104,35 @@ def cu_make_time_serieses(time_resolution, data_store, param_store):
         app.logger.warning(f"Account list should be a list but isn't: {account_list}")
         raise PreventUpdate
     for account in account_list:
-        fig: go.Figure = go.Figure(layout=layouts['base'])
-        fig.update_layout(
-            title={"text": f"{data_title} {account}: Cumulative {unit}"},
-            xaxis={"showgrid": True, "nticks": 20},
-            yaxis={"showgrid": True},
-            legend={
-                "xanchor": "left",
-                "x": 0,
-                "yanchor": "bottom",
-                "y": 0,
-                "bgcolor": "rgba(0, 0, 0, 0)",
-            },
-            barmode="relative",
-        )
-        subaccounts: iter = account_tree.get_children_ids(account)
-        for j, subaccount in enumerate(subaccounts):
-            sub_desc = account_tree.get_descendent_ids(subaccount)
-            sub_desc.append(subaccount)
-            tba = trans[trans["account"].isin(sub_desc)]
-            if len(tba) > 0:
-                fig.add_trace(make_cum_area(tba, subaccount, j, time_resolution))
-        output = dcc.Graph(id=f"{account}{j}", figure=fig)
-        if len(result) > 0:
-            result.append(output)
-        else:
-            result = [output]
+        fig = cu_make_figure(data_store, account, time_resolution, params)
+        result.append(dcc.Store(id={"type": "cu_zoom_store", "index": account}, storage_type="memory"))
+        result.append(dcc.Graph(id={"type": "cu_chart", "index": account}, figure=fig))
     return [result]
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="ledgex", function_name="zoom_store"),
+    Output({"type": "cu_zoom_store", "index": MATCH}, "data"),
+    Input({"type": "cu_chart", "index": MATCH}, "relayoutData"),
+)
+
+
+@app.callback(
+    Output({"type": "cu_chart", "index": MATCH}, "figure"),
+    Input({"type": "cu_zoom_store", "index": MATCH}, "data"),
+    State("cu_time_series_resolution", "value"),
+    State("data_store", "children"),
+    State("param_store", "children"),
+)
+def cu_zoom_time_series(zoom, time_resolution, data_store, param_store):
+    """ Redraw one cumulative chart for its zoomed dates, at Auto resolution """
+    preventupdate_if_empty(data_store)
+    params: Params = Params.from_json(param_store)
+    if not time_resolution:
+        time_resolution = params.init_time_res
+    if time_resolution != "auto":
+        # at a fixed resolution, zooming is left to the browser
+        raise PreventUpdate
+    account = dash.callback_context.outputs_list["id"]["index"]
+    data_store: Datastore() = Datastore.from_json(data_store, params.cu_roots)
+    return cu_make_figure(data_store, account, time_resolution, params, zoom)
@@ -292,6 +292,7 @@ layout = (
             ),
             html.Div(
                 children=[
+                    html.Div(id="trans_progress", className="hidden"),
                     html.Div(id="trans_loaded_meta"),
                     html.Div(id="trans_status"),
                 ]
@@ -327,6 +328,7 @@ layout = (
             html.Div(
                 className="ds_column",
                 children=[
+                    html.Div(id="atree_progress", className="hidden"),
                     html.Div(id="atree_loaded_meta"),
                     html.Div(id="atree_status", children=["No accounts"]),
                     html.Pre(id="atree_display", className="code"),
@@ -365,6 +367,7 @@ layout = (
             html.Div(
                 className="ds_column",
                 children=[
+                    html.Div(id="eras_progress", className="hidden"),
                     html.Div(id="eras_loaded_meta"),
                     html.Div(id="eras_status", children=["No reporting periods"]),
                 ],
@@ -512,20 +515,25 @@ def save_ui_input_to_node(
         Input("trans_url", "n_submit"),
     ],
     State("trans_url", "value"),
+    background=True,
+    progress=Output("trans_progress", "children"),
+    running=[(Output("trans_progress", "className"), "", "hidden")],
+    cancel=[Input("trans_url", "value")],
 )
-def upload_trans(filename: str, content, submit: int, url: str) -> Iterable:
+def upload_trans(set_progress, filename: str, content, submit: int, url: str) -> Iterable:
     """Whenever a new transaction source is provided (uploaded file, or new URL),
     upload it and provide visual feedback.
     Can't use time comparison to see which one is more recent (because dcc.Upload
     doesn't have an upload timestamp), so punt that for now; need to reload the page
     to control whether url or file takes precedence.
+    Runs as a background job; editing the URL cancels it.
     # TODO: what's happening here that isn't happening in the similar function in index.py?
 """
 
     if (not filename or len(filename) == 0) and (not url or len(url) == 0):
         raise PreventUpdate
 
-    new_filename, data, text = load_input_file(content, url, filename)
+    new_filename, data, text = load_input_file(content, url, filename, set_progress)
     if len(data) > 0:
         text = text + f"Columns: {data.columns}"
         return [new_filename, data.to_json(), text, " Select a different file", url]
@@ -547,14 +555,19 @@ def upload_trans(filename: str, content, submit: int, url: str) -> Iterable:
         Input("atree_url", "n_submit"),
     ],
     State("atree_url", "value"),
+    background=True,
+    progress=Output("atree_progress", "children"),
+    running=[(Output("atree_progress", "className"), "", "hidden")],
+    cancel=[Input("atree_url", "value")],
 )
-def upload_atree(filename: str, content, submit: int, url: str) -> Iterable:
+def upload_atree(set_progress, filename: str, content, submit: int, url: str) -> Iterable:
     """Whenever a new atree source is provided (uploaded file, or new URL),
-    upload it and provide visual feedback."""
+    upload it and provide visual feedback.  Runs as a background job;
+    editing the URL cancels it."""
     if (not filename or len(filename) == 0) and (not url or len(url) == 0):
         raise PreventUpdate
 
-    new_filename, data, text = load_input_file(content, url, filename)
+    new_filename, data, text = load_input_file(content, url, filename, set_progress)
     if len(data) > 0:
         return [new_filename, data.to_json(), text, " Select a different file", url]
     else:
@@ -575,17 +588,22 @@ def upload_atree(filename: str, content, submit: int, url: str) -> Iterable:
         Input("eras_url", "n_submit"),
     ],
     State("eras_url", "value"),
+    background=True,
+    progress=Output("eras_progress", "children"),
+    running=[(Output("eras_progress", "className"), "", "hidden")],
+    cancel=[Input("eras_url", "value")],
 )
-def upload_eras(filename: str, content, submit: int, url: str) -> Iterable:
+def upload_eras(set_progress, filename: str, content, submit: int, url: str) -> Iterable:
     """Whenever a new transaction source is provided (uploaded file, or new URL),
     upload it and provide visual feedback.
     Can't use time comparison to see which one is more recent (because dcc.Upload
     doesn't have an upload timestamp), so punt that for now; need to reload the page
-    to control whether url or file takes precedence."""
+    to control whether url or file takes precedence.  Runs as a
+    background job; editing the URL cancels it."""
     if (not filename or len(filename) == 0) and (not url or len(url) == 0):
         raise PreventUpdate
 
-    new_filename, data, text = load_input_file(content, url, filename)
+    new_filename, data, text = load_input_file(content, url, filename, set_progress)
     if len(data) > 0:
         return [new_filename, data.to_json(), text, " Select a different file", url]
     else:
@@ -1,183 +1,294 @@
-from dash import dcc, html
+import dash
+from dash import Patch, dcc, html
 import pandas as pd
-import textwrap
 
 from plotly.colors import colorbrewer as cb
 import plotly.graph_objects as go
-import plotly.express as px
 from dash.dependencies import Input, Output, State, ALL
-from params import Params
+from params import CONST, Params
 from dash.exceptions import PreventUpdate
 from app import app
 from atree import ATree
 from utils import (
+    ex_trans_table,
     layouts,
+    make_counterparty_fig,
+    make_dot_fig,
     traces,
     preventupdate_if_empty,
 )
 
 from datastore import Datastore
+from paging import table_page
+from selection import Selection
 
 layout: html = html.Div(
     className="layout_box",
     children=[
         html.Div(id="ex_dummy", className="hidden", children="getstarted"),
         html.Div(id="ex_wrapper", children=[]),
+        html.Div(id="ex_dot_text", children=""),
+        dcc.Store(id="ex_account_store"),
+        dcc.Graph(id="ex_counter_chart"),
+        html.Div(
+            id="ex_search_box",
+            children=[
+                dcc.Input(
+                    id="ex_search",
+                    type="search",
+                    placeholder="Search descriptions, e.g. rent or groc*",
+                    debounce=True,
+                ),
+                html.Div(id="ex_trans_table_text", children=""),
+                ex_trans_table,
+            ],
+        ),
     ],
 )
 
 
+def drill_levels(tree: ATree, lineage: list) -> list:
+    """Return, for each account in the lineage that has children, a
+    frame of its children's bars (account, child_id, child_tag, color,
+    amount), sorted by amount.  The child on the lineage keeps its
+    palette color and its siblings are grayed out; a selected color
+    isn't reused at deeper levels."""
+    palette = cb.Set3
+    levels: list = []
+    for i, node in enumerate(lineage):
+        children = tree.children(node)
+        if len(children) == 0:
+            continue
+        palette_mod = 12 - i  # compensate for shrinking palette
+        child_ids = [x.identifier for x in children]
+        colors = [palette[j % palette_mod] for j in range(len(children))]
+        if i + 1 < len(lineage) and lineage[i + 1] in child_ids:
+            selection_color = colors[child_ids.index(lineage[i + 1])]
+            colors = [
+                color if child_id == lineage[i + 1] else "rgba(100, 100, 100, .5)"
+                for child_id, color in zip(child_ids, colors)
+            ]
+            # Don't reuse selected colors in later bars.
+            palette = [color for color in cb.Set3 if color != selection_color]
+        drill_data = pd.DataFrame(
+            {
+                "account": node,
+                "child_id": child_ids,
+                "child_tag": [x.tag for x in children],
+                "color": colors,
+                "amount": [x.data["total"] for x in children],
+            }
+        )
+        levels.append(drill_data.sort_values("amount"))
+    return levels
+
+
+def make_drill_chart(drill_data: pd.DataFrame, level: int, selected: bool, unit: str) -> dcc.Graph:
+    """ Return the stacked bar chart of one level of the drill-down """
+    node = drill_data["account"].iloc[0]
+    try:
+        node_bar: go.Bar = go.Bar(
+            y=drill_data["account"],
+            x=drill_data["amount"],
+            marker_color=drill_data["color"],
+            textposition="inside",
+            text=drill_data["child_tag"],
+            texttemplate="%{text}<br>" + unit + "%{value:,.0f}",
+            hovertemplate="%{text}<br>" + unit + "%{value:,.0f}<extra></extra>",
+            customdata=drill_data["child_id"],
+            orientation="h",
+        )
+        fig: go.Figure = go.Figure(data=node_bar)
+        fig.update_layout(layouts["drill"])
+        fig.update_traces(traces["drill"])
+        if selected and level > 0:
+            fig.update_layout(title_text=node, title_x=0, title_y=0.98)
+        return dcc.Graph(figure=fig, id={"type": "ex_chart", "index": level})
+    except Exception as E:
+        return html.Div(f"Error making {node}: {E}")
+
+
 @app.callback(
-    [Output("ex_wrapper", "children")],
+    [Output("ex_wrapper", "children"), Output("ex_account_store", "data")],
     [
         Input("ex_dummy", "children"),
         Input({"type": "ex_chart", "index": ALL}, "selectedData"),
-        Input({"type": "ex_chart", "index": ALL}, "figure"),
     ],
-    
+    State({"type": "ex_chart", "index": ALL}, "figure"),
     State("data_store", "children"),
     State("param_store", "children"),
-    
 )
 def ex_apply_selection(dummy, selectedData, figure, data_store, param_store):
     """Take the selected account from the main explorer chart
-    and show it in a series of drill-down charts
+    and show it in a series of drill-down charts.
+
+    Selecting a bar in one of the charts only changes that chart and
+    the ones below it, so the charts above are kept in the page, only
+    the colors and title of the selected chart are patched, and the
+    charts below it are replaced.  The rolled-up tree is cached per dataset.
     """
     preventupdate_if_empty(data_store)
     data_store: Datastore() = Datastore.from_json(data_store)
-    tree: ATree = data_store.account_tree
+    tree: ATree = data_store.rolled_up_tree()
     params: Params() = Params.from_json(param_store)
     unit: str = params.unit
 
-    if not selectedData or len(selectedData) == 0:
-        account = tree.root
-    else:
-        for i, indexed_fig in enumerate(figure):
-            try:
-                account = figure[i]["data"][0]["customdata"][
-                    selectedData[i]["points"][0]["pointNumber"]
-                ]
-                if account and len(account) > 0:
-                    break
-            except TypeError:
-                # happens when clicking on the second or later chart, because
-                # the corresponding selectedData will be empty
-                pass
+    trigger = dash.callback_context.triggered_id
+    level = 0
+    account = tree.root
+    if isinstance(trigger, dict):
+        # a bar chart selection; new charts also trigger this, with no selection
+        level = trigger["index"]
+        try:
+            account = figure[level]["data"][0]["customdata"][
+                selectedData[level]["points"][0]["pointNumber"]
+            ]
+        except (TypeError, IndexError, KeyError):
+            raise PreventUpdate
     if not account:
         raise PreventUpdate
     lineage = tree.get_lineage_ids(account) + [account]
-    charts: list = []
-    trans: pd.DataFrame = data_store.trans
-    tree: ATree = data_store.account_tree
-    tree = tree.append_sums_from_trans(trans)
-    tree = tree.roll_up_subtotals()
-    palette = cb.Set3
-    selection_color = None
-    color_data = pd.DataFrame(columns=["account", "color"])
+    levels = drill_levels(tree, lineage)
+    charts = [
+        make_drill_chart(drill_data, i, i + 1 < len(lineage), unit)
+        for i, drill_data in enumerate(levels)
+        if i >= level
+    ]
 
-    # iterate through the lineage and make a new stacked bar chart for each level.
-    for i, node in enumerate(lineage):
-        palette_mod = 12 - i  # compensate for shrinking palette
-        drill_data = pd.DataFrame(
-            columns=["account", "child_id", "child_tag", "color", "amount"]
-        )
-        children = tree.children(node)
-        level_selection = []
-        if len(children) > 0:
-            try:
-                level_selection = [
-                    x.identifier for x in children if x.identifier == lineage[i + 1]
-                ]
-            except IndexError:
-                pass
-            for j, point in enumerate(children):
-                point_id = point.identifier
-                color = palette[j % palette_mod]
-                color_data = color_data.append(
-                    dict(account=point_id, color=color), ignore_index=True
-                )
-                if len(level_selection) > 0:  # If there is a selection …
-                    if point_id == level_selection[0]:
-                        selection_color = color
-                    else:
-                        color = "rgba(100, 100, 100, .5)"
-                drill_data = drill_data.append(
-                    dict(
-                        account=node,
-                        child_id=point.identifier,
-                        child_tag=point.tag,
-                        color=color,
-                        amount=point.data["total"],
-                    ),
-                    ignore_index=True,
-                )
-        else:
-            continue
-        try:
-            drill_data = drill_data.sort_values("amount")
-            node_bar: go.Bar = go.Bar(
-                y=drill_data["account"],
-                x=drill_data["amount"],
-                marker_color=drill_data["color"],
-                textposition="inside",
-                text=drill_data["child_tag"],
-                texttemplate="%{text}<br>" + unit + "%{value:,.0f}",
-                hovertemplate="%{text}<br>" + unit + "%{value:,.0f}<extra></extra>",
-                customdata=drill_data["child_id"],
-                orientation="h",
-            )
-            fig: go.Figure = go.Figure(data=node_bar)
-            fig.update_layout(layouts["drill"])
-            fig.update_traces(traces["drill"])
-            if selection_color and len(selection_color) > 0:
-                # Don't reuse selected colors in later bars.
-                palette = list(set(cb.Set3) - set([selection_color]))
-                if i > 0:
-                    fig.update_layout(title_text=node, title_x=0, title_y=0.98)
-            charts = charts + [
-                dcc.Graph(figure=fig, id={"type": "ex_chart", "index": i})
-            ]
-        except Exception as E:
-            charts = charts + [html.Div(f"Error making {node}: {E}")]
-
-    if len(lineage) > 1:
-        selected_accounts = tree.get_descendent_ids(lineage[-1]) + [lineage[i]]
-        sel_trans = trans[trans["account"].isin(selected_accounts)]
-        color_data = color_data.set_index("account")
-        sel_trans["color"] = sel_trans.account.map(color_data.color)
-        sel_trans["color"] = sel_trans["color"].fillna("darkslategray")
+    if data_store.partitions:
+        # an out-of-core ledger's transactions stay on disk, so there are
+        # no dots to draw; ex_dot_click says so in ex_dot_text
+        dot_chart = dcc.Graph(figure=go.Figure(layout=layouts["base"]), id="ex_dot_chart")
     else:
-        sel_trans = trans
-        sel_trans["color"] = "darkslategray"
-    wrapper = textwrap.TextWrapper(width=40)
-
-    def brfill(text, TW):
-        return "<br>".join(TW.wrap(text))
-
-    sel_trans["wrap"] = sel_trans["description"].apply(brfill, TW=wrapper)
-    sel_trans["pretty_value"] = sel_trans["amount"].apply("{:,.0f}".format)
-
-    sel_trans["customdata"] = (
-        sel_trans["account"]
-        + "<br>"
-        + sel_trans["date"].astype(str)
-        + "<br>"
-        + sel_trans["pretty_value"]
-        + "<br>"
-        + sel_trans["wrap"]
-    )
-    dot_fig = px.scatter(
-        sel_trans,
-        x="date",
-        y="amount",
-        color="color",
-        color_discrete_map="identity",
-    )
-    dot_fig.update_layout(layouts["dot_fig"])
-    dot_fig.update_traces(traces["dot_fig"])
-    dot_fig.update_traces(
-        customdata=sel_trans["customdata"], hovertemplate="%{customdata}<extra></extra>"
+        colors = pd.concat(levels).set_index("child_id")["color"] if levels else pd.Series(dtype=object)
+        if len(lineage) > 1:
+            sel_trans = data_store.cube().rows(lineage[-1])
+            sel_colors = sel_trans["account"].map(colors).fillna("darkslategray")
+        else:
+            sel_trans = data_store.cube().trans
+            sel_colors = pd.Series("darkslategray", index=sel_trans.index)
+        dot_fig = make_dot_fig(
+            sel_trans,
+            sel_colors,
+            params.ex_max_points,
+            CONST["ex_webgl_threshold"],
+            data_store.presentation(unit),
+        )
+        dot_chart = dcc.Graph(figure=dot_fig, id="ex_dot_chart")
+    charts = charts + [dot_chart]
+    if not isinstance(trigger, dict):
+        return [charts, lineage[-1]]
+
+    # Keep the charts above the selected one, recolor the selected one
+    # in place, and replace the rest
+    wrapper = Patch()
+    selected_chart = wrapper[level]["props"]["figure"]
+    selected_chart["data"][0]["marker"]["color"] = levels[level]["color"].tolist()
+    if level > 0:
+        title = selected_chart["layout"]["title"]
+        title.update(dict(text=levels[level]["account"].iloc[0], x=0, y=0.98))
+    for i in reversed(range(level + 1, len(figure) + 1)):
+        del wrapper[i]
+    wrapper.extend(charts[1:])
+    return [wrapper, lineage[-1]]
+
+
+@app.callback(
+    Output("ex_dot_text", "children"),
+    Input("ex_dot_chart", "clickData"),
+    Input("ex_account_store", "data"),
+    State("data_store", "children"),
+    State("param_store", "children"),
+)
+def ex_dot_click(clickData, account, data_store, param_store):
+    """Show the exact transaction of a clicked dot, and clear it when
+    the drill-down selection changes"""
+    preventupdate_if_empty(data_store)
+    if dash.callback_context.triggered_id == "ex_account_store" or not clickData:
+        if Datastore.from_json(data_store).partitions:
+            return "The dot chart needs the transactions in memory, so it isn't shown for an out-of-core ledger."
+        return ""
+    point = clickData["points"][0]
+    if "customdata" not in point:
+        # the density map under decimated dots isn't a transaction
+        raise PreventUpdate
+    trans: pd.DataFrame = Datastore.from_json(data_store).trans
+    row = trans.loc[point["customdata"]]
+    unit: str = Params.from_json(param_store).unit
+    return f"{row['date']:%Y-%m-%d} {row['account']} {unit}{row['amount']:,.0f} {row['description']}"
+
+
+@app.callback(
+    Output("ex_trans_table", "data"),
+    Output("ex_trans_table", "page_count"),
+    Output("ex_trans_table", "page_current"),
+    Output("ex_trans_table_text", "children"),
+    Input("ex_search", "value"),
+    Input("ex_account_store", "data"),
+    Input("ex_trans_table", "page_current"),
+    Input("ex_trans_table", "page_size"),
+    Input("ex_trans_table", "sort_by"),
+    Input("ex_trans_table", "filter_query"),
+    State("data_store", "children"),
+    State("param_store", "children"),
+)
+def ex_search_table(
+    search, account, page_current, page_size, sort_by, filter_query, data_store, param_store
+):
+    """Show the transactions of the account selected in the drill-down
+    charts whose descriptions match the search box, using the dataset's
+    text index.  Terms must all match; a term ending in * matches the
+    start of a word, and any other term matches anywhere.  With no
+    search, all of the account's transactions are shown."""
+    preventupdate_if_empty(data_store)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    params: Params() = Params.from_json(param_store)
+    cube = data_store.cube()
+    if not account or account not in cube.code:
+        account = data_store.account_tree.root
+    selection = Selection.from_pairs(
+        cube, [account], [data_store.earliest_trans], [data_store.latest_trans]
     )
+    trigger = dash.callback_context.triggered[0]["prop_id"].split(".")[0]
+    if trigger != "ex_trans_table":
+        page_current = 0
+    page_size = page_size or CONST["page_size"]
+    if data_store.partitions:
+        # an out-of-core ledger's rows are read from disk, a page at a
+        # time, in date order, and its descriptions aren't indexed
+        if search and search.strip():
+            text = "Search needs the transactions in memory, so it isn't available for an out-of-core ledger."
+            return [[], 1, 0, text]
+        page, page_current, num_rows = data_store.ledger().page(
+            selection, data_store.rangesum(), page_current, page_size
+        )
+        page["date"] = page["date"].dt.strftime(CONST["date_format"])
+        records = page.to_dict("records")
+    else:
+        positions = selection.positions()
+        if search and search.strip():
+            positions = data_store.text_index().search(search, positions)
+        records, page_current, num_rows = table_page(
+            data_store, positions, page_current, page_size, sort_by, filter_query, params.unit
+        )
+    text = f"{num_rows:,d} records in {account}"
+    if search and search.strip():
+        text = text + f" match {search}"
+    return [records, max(-(-num_rows // page_size), 1), page_current, text]
 
-    charts = charts + [dcc.Graph(figure=dot_fig, id="ex_dot_chart")]
-    return [charts]
+
+@app.callback(
+    Output("ex_counter_chart", "figure"),
+    Input("ex_account_store", "data"),
+    State("data_store", "children"),
+    State("param_store", "children"),
+)
+def ex_counterparty_chart(account, data_store, param_store):
+    """ Show which accounts the selected account's money came from and went to """
+    preventupdate_if_empty(data_store)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    params: Params() = Params.from_json(param_store)
+    if not account or account not in data_store.cube().code:
+        raise PreventUpdate
+    totals = data_store.counterparties().totals(account, depth=CONST["ex_counter_depth"])
+    return make_counterparty_fig(totals, account, params.unit)
@@ -6,6 +6,12 @@ owid_co2_url = quote(
     "https://raw.githubusercontent.com/owid/owid-datasets/master/datasets/CO2%20emissions%20(Aggregate%20dataset%20(2020))/CO2%20emissions%20(Aggregate%20dataset%20(2020)).csv"
 )  # NOQA
 
+# Most first visits are to these, so warmer.py can load them at boot
+example_permalinks = [
+    "/pe/?transu=https://ledge.uprightconsulting.com/s/sample_transaction_data.csv&atreeu=https://ledge.uprightconsulting.com/s/sample_transaction_account_tree.csv&erasu=https://ledge.uprightconsulting.com/s/sample_transaction_eras.csv&init_time_res=quarter&pe_roots=Income,Expenses&cu_roots=Assets,Liabilities,Equity",
+    f"/bs/?transu={owid_co2_url}&atreeu=https://ledge.uprightconsulting.com/s/co2_test_tree_full.csv&account_label=entity&amount_label=Annual%20CO2%20emissions&date_label=year&desc_label=entity&fan_label=entity&init_time_res=year&init_time_span=annual&ds_data_title=Annual_CO₂_Emissions&ds_label=Our%20World%20In%20Data:%20CO₂&cu_label=Cumulative&pe_label=Annual&ex_roots=root&bs_roots=root&unit=Mt·CO₂",
+]  # NOQA
+
 
 layout = html.Div(
     className="layout_box presentation",
@@ -17,11 +23,11 @@ Quickly navigate through flow and balance charts as line charts, drill down into
 
 ## Try an example
 
-* **Example #1:** [Personal accounting sample data (Gnucash format)](/pe/?transu=https://ledge.uprightconsulting.com/s/sample_transaction_data.csv&atreeu=https://ledge.uprightconsulting.com/s/sample_transaction_account_tree.csv&erasu=https://ledge.uprightconsulting.com/s/sample_transaction_eras.csv&init_time_res=quarter&pe_roots=Income,Expenses&cu_roots=Assets,Liabilities,Equity)
+* **Example #1:** [Personal accounting sample data (Gnucash format)]({example_permalinks[0]})
    * Loads data from a [sample Gnucash export file](https://ledge.uprightconsulting.com/s/sample_transaction_data.csv)
    * ![Screenshot](/assets/screenshot_cash_flow_transdata.png)
 
-* **Example #2:** [Greenhouse Gas emissions by country over time](/bs/?transu={owid_co2_url}&atreeu=https://ledge.uprightconsulting.com/s/co2_test_tree_full.csv&account_label=entity&amount_label=Annual%20CO2%20emissions&date_label=year&desc_label=entity&fan_label=entity&init_time_res=year&init_time_span=annual&ds_data_title=Annual_CO₂_Emissions&ds_label=Our%20World%20In%20Data:%20CO₂&cu_label=Cumulative&pe_label=Annual&ex_roots=root&bs_roots=root&unit=Mt·CO₂)
+* **Example #2:** [Greenhouse Gas emissions by country over time]({example_permalinks[1]})
    * loads data directly from external source [Our World in Data](https://ourworldindata.org/co2-and-other-greenhouse-gas-emissions)
    * [Custom account tree](https://ledge.uprightconsulting.com/s/co2_test_tree_parent.csv)
    * ![Screenshot](/assets/screenshot_balance_sheet_co2data.png)
@@ -1,10 +1,11 @@
 import json
 
-from dash import dcc, html
+import dash
+from dash import Patch, dcc, html
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from dash.exceptions import PreventUpdate
 from app import app
 from burst import Burst
@@ -12,14 +13,19 @@ from params import CONST, Params
 from ledger import Ledger
 from errors import LError
 from utils import (
+    fit_resolution,
     layouts,
     pe_trans_table,
-    periodic_bar,
-    period_to_date_range,
+    periodic_bars,
+    periods_to_date_ranges,
     pretty_date,
     preventupdate_if_empty,
+    selected_points,
+    zoom_window,
 )
 from datastore import Datastore
+from paging import client_rows, table_page
+from selection import Selection
 
 
 layout = html.Div(
@@ -32,6 +38,8 @@ layout = html.Div(
                     className="control_bar",
                     children=[
                         dcc.Store(id="pe_selection_store", storage_type="memory"),
+                        dcc.Store(id="pe_zoom_store", storage_type="memory"),
+                        dcc.Store(id="pe_table_request", storage_type="memory"),
                         html.Div(
                             className="control_group",
                             children=[
@@ -100,6 +108,13 @@ def pe_load_params(trigger: str, data_store: str, param_store: str):
     return [params.init_time_res, tr_options, params.init_time_span, params.start_date, params.end_date]
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="ledgex", function_name="zoom_store"),
+    Output("pe_zoom_store", "data"),
+    Input("pe_master_time_series", "relayoutData"),
+)
+
+
 @app.callback(
     [Output("pe_master_time_series", "figure")],
     [
@@ -107,48 +122,85 @@ def pe_load_params(trigger: str, data_store: str, param_store: str):
         Input("pe_time_series_span", "value"),
         Input("pe_date_range", "start_date"),
         Input("pe_date_range", "end_date"),
+        Input("pe_zoom_store", "data"),
     ],
     State("data_store", "children"),
     State("param_store", "children"),
 )
 def pe_make_master_time_series(
-    time_resolution: int, time_span: str, start_date: str, end_date: str, data_store: str, param_store: str
+    time_resolution: int,
+    time_span: str,
+    start_date: str,
+    end_date: str,
+    zoom: dict,
+    data_store: str,
+    param_store: str,
 ):
-    """ Generate a Dash bar chart figure from transactional data """
+    """Generate a Dash bar chart figure from transactional data.  At Auto
+    resolution, the chart follows zooming: the resolution is the finest
+    that fits the visible dates in the chart's width, and only the
+    visible periods and a margin are drawn.  A change of the selected
+    dates alone sends only the bars' selectedpoints, as a Patch."""
     preventupdate_if_empty(data_store)
     params: Params = Params.from_json(param_store)
     if not time_resolution:
         time_resolution = params.init_time_res
     if not time_span:
         time_span = params.init_time_span
+    trigger = dash.callback_context.triggered
+    if time_resolution != "auto" and trigger and trigger[0]["prop_id"].split(".")[0] == "pe_zoom_store":
+        # at a fixed resolution, zooming is left to the browser
+        raise PreventUpdate
     trans, atree, eras, dstore = Datastore.get_parts(data_store, params.pe_roots)
-    unit = params.unit
     chart_fig: go.Figure = go.Figure(layout=layouts["periodic"])
-    # get everything, remembering that it's already been pre-filtered by pe_roots
-    root_account_id: str = atree.root
-    selected_accounts = atree.get_children_ids(root_account_id)
-    factor = Ledger.prorate_factor(time_span, ts_resolution=time_resolution)
-    for i, account in enumerate(selected_accounts):
-        try:
-            bar = periodic_bar(
-                trans,
-                atree,
-                account,
-                time_resolution,
-                time_span,
-                factor,
-                eras,
-                i,
-                deep=True,
-                positize=True,
-                unit=unit,
-                sel_start_date=start_date,
-                sel_end_date=end_date
-            )
-            if bar:
-                chart_fig.add_trace(bar)
-        except LError:
-            pass
+    window = {}
+    if time_resolution == "auto":
+        visible_start, visible_end, window["start"], window["end"] = zoom_window(
+            zoom, dstore.earliest_trans, dstore.latest_trans
+        )
+        time_resolution = fit_resolution(visible_start, visible_end, (zoom or {}).get("width"))
+        if (zoom or {}).get("range"):
+            chart_fig.update_xaxes(range=[visible_start, visible_end])
+        window["date_x"] = True
+    # the selection callback needs the resolution actually drawn
+    chart_fig.update_layout(meta={"time_resolution": time_resolution})
+
+    def draw_bars():
+        # get everything, remembering that it's already been pre-filtered by pe_roots
+        spans = []
+        bars = periodic_bars(
+            dstore.cube(),
+            atree.root,
+            time_resolution,
+            time_span,
+            Ledger.prorate_factor(time_span, ts_resolution=time_resolution),
+            positize=True,
+            unit=params.unit,
+            max_points=params.pe_max_points,
+            spans=spans,
+            **window,
+        )
+        return bars, spans
+
+    # the bars don't depend on the selected dates, so a change of those
+    # alone finds them here and only works out which are selected.  The
+    # dataset's key has no params, so every one draw_bars reads is here.
+    bars, spans = dstore.memo(
+        f"pe bars {time_resolution} {time_span} {params.unit} {params.pe_max_points} {window}", draw_bars
+    )
+    selected = [None if x is None else selected_points(*x, start_date, end_date) for x in spans]
+    if trigger and all(x["prop_id"].split(".")[0] == "pe_date_range" for x in trigger):
+        # only the selected dates changed, and with them only which bars
+        # are selected, so patch that into the figure in the browser
+        patch = Patch()
+        for i, points in enumerate(selected):
+            if points is not None:
+                patch["data"][i]["selectedpoints"] = points
+        return [patch]
+    chart_fig.add_traces(bars)
+    for trace, points in zip(chart_fig.data, selected):
+        if points is not None:
+            trace.selectedpoints = points
     return [chart_fig]
 
 
@@ -159,13 +211,15 @@ def pe_make_master_time_series(
     Output("pe_selection_store", "data"),
     Input("pe_master_time_series", "figure"),
     Input("pe_master_time_series", "selectedData"),
+    Input("pe_account_burst", "clickData"),
+    State("pe_account_burst", "figure"),
     State("pe_time_series_resolution", "value"),
     State("pe_time_series_span", "value"),
     State("data_store", "children"),
     State("param_store", "children"),
 )
 def pe_time_series_selection_to_sunburst_and_transaction_table(
-    figure, selectedData, time_resolution, time_span, data_store, param_store
+    figure, selectedData, burst_clickData, burst_figure, time_resolution, time_span, data_store, param_store
 ):
     """Selecting specific points from the time series chart updates the
     account burst and the detail labels.  Reminder to self: When you
@@ -176,6 +230,11 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
     doesn't seem to trigger reliably.  Adding selectedData as a second
     Input causes reliable triggering.
 
+    The sunburst only holds a few levels around its center.  Clicking a
+    wedge re-centers it there (or, for the center, on its parent), and
+    the deeper levels come from the cached rolled-up tree; nothing else
+    changes.
+
     """
     params: Params() = Params.from_json(param_store)
     preventupdate_if_empty(data_store)
@@ -184,7 +243,9 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
         time_resolution = params.init_time_res
     if not time_span:
         time_span = params.init_time_span
-    if len(trans) == 0:
+    if figure:
+        time_resolution = figure.get("layout", {}).get("meta", {}).get("time_resolution", time_resolution)
+    if len(dstore) == 0:
         app.logger.error(
             "Tried to make burst figure from transactions, but no transactions provided."
         )
@@ -195,12 +256,13 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
     min_period_start: np.datetime64 = None
     max_period_end: np.datetime64 = None
     selected_accounts = []
-    selected_trans = pd.DataFrame()
+    point_accounts = []
+    point_labels = []
     desc_account_count = 0
     colormap = {}
 
     # Get the names and colors of all accounts in the Input figure.
-    # If anything is clicked, set the selection dates, accounts, and transactions.
+    # If anything is clicked, collect the account and period of every point.
     if figure:
         for trace in figure.get("data"):
             account = trace.get("name")
@@ -209,59 +271,53 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
             if not points:
                 continue
             selected_accounts.append(account)
-            for point in points:
-                point_x = trace["x"][point]
-                period_start, period_end = period_to_date_range(
-                    time_resolution, point_x, eras
-                )
-                if min_period_start is None:
-                    min_period_start = period_start
-                else:
-                    min_period_start = min(min_period_start, period_start)
-                if max_period_end is None:
-                    max_period_end = period_end
-                else:
-                    max_period_end = max(max_period_end, period_end)
-                desc_accounts = atree.get_descendent_ids(account)
-                desc_account_count = desc_account_count + len(desc_accounts)
-                subtree_accounts = [account] + desc_accounts
-                new_trans = (
-                    trans.loc[trans["account"].isin(subtree_accounts)]
-                    .loc[trans["date"] >= period_start]
-                    .loc[trans["date"] <= period_end]
-                )
-                new_trans = Ledger.positize(new_trans)  # each top-level account should net positive
-                if len(selected_trans) > 0:
-                    selected_trans = selected_trans.append(new_trans)
-                else:
-                    selected_trans = new_trans
-    selected_count = len(selected_trans)
+            desc_account_count += len(atree.get_descendent_ids(account))
+            point_accounts.extend([account] * len(points))
+            # bars are identified by their period label, which may be a run of periods
+            labels = trace["ids"] if trace.get("ids") is not None else trace["x"]
+            point_labels.extend([labels[point] for point in points])
+
+    # Convert all of the periods at once, and merge them into one
+    # selection, so totals come from one batch of range index lookups
+    rangesum = dstore.rangesum()
+    selection = Selection(dstore.cube(), [], [], [], [])
+    if len(point_labels) > 0:
+        period_starts, period_ends = periods_to_date_ranges(
+            time_resolution, point_labels, dstore.era_index()
+        )
+        selection = Selection.from_pairs(dstore.cube(), point_accounts, period_starts, period_ends)
+    selected_count = selection.count(rangesum)
 
     if selected_count > 0 and len(selected_accounts) > 0:
         # If there are selected data, describe the contents of the sunburst
-        # TODO: desc_account_count is still wrong.
         description = Burst.pretty_account_label(
             selected_accounts,
             desc_account_count,
             selected_count,
         )
+        # each top-level account should net positive
+        selected_totals = selection.leaf_totals(rangesum, positize=True)
+        min_period_start, max_period_end = selection.date_range()
     else:
         # If no trans are selected, show everything.  Note that we
         # could logically get here even if valid accounts are
         # selected, in which case it would be confusing to get back
         # all trans instead of none, but this should never happen haha
         # because any clickable bar must have $$, and so, trans
-        description = f"Click a bar in the graph to filter from {len(trans):,d} records"
-        selected_trans = trans
-        min_period_start = trans["date"].min()
-        max_period_end = trans["date"].max()
+        description = f"Click a bar in the graph to filter from {len(dstore):,d} records"
+        selected_totals = rangesum.leaf_totals()
+        selected_count = len(dstore)
+        selection = Selection(dstore.cube(), [], [], [], [])
+        min_period_start = dstore.earliest_trans
+        max_period_end = dstore.latest_trans
 
     title = f"{ts_label} {unit} from {pretty_date(min_period_start)} to {pretty_date(max_period_end)}"
     pe_selection_store = {
         "start": min_period_start,
         "end": max_period_end,
-        "count": len(selected_trans),
+        "count": int(selected_count),
         "accounts": selected_accounts,
+        "intervals": selection.to_records(),
     }
 
     duration = round(
@@ -269,10 +325,26 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
         / np.timedelta64(1, "M")
     )
     factor = Ledger.prorate_factor(time_span, duration=duration)
+    clicked = dash.callback_context.triggered[0]["prop_id"].split(".")[0] == "pe_account_burst"
     try:
-        sun_fig = Burst.from_trans(
-            atree, selected_trans, time_span, unit, factor, colormap, title
+        rolled = dstore.memo(
+            f"burst {factor} {selection.to_records()}",
+            lambda: Burst.roll_up(atree.append_sums(selected_totals, factor)),
         )
+        if clicked:
+            preventupdate_if_empty(burst_clickData)
+            shown = burst_figure["data"][0] if burst_figure else {}
+            focus = burst_clickData["points"][0]["id"].replace(CONST["more_suffix"], "")
+            if focus in rolled and focus == shown.get("level", rolled.root):
+                # clicking the center goes up a level
+                parent = rolled.parent(focus)
+                focus = parent.identifier if parent else None
+            if set(Burst.visible_frame(rolled, focus)["id"]) <= set(shown.get("ids", [])):
+                # everything to be shown is already in the browser
+                raise PreventUpdate
+            sun_fig = Burst.from_rolled_tree(rolled, time_span, unit, colormap, title, focus)
+            return (sun_fig, dash.no_update, dash.no_update, dash.no_update)
+        sun_fig = Burst.from_rolled_tree(rolled, time_span, unit, colormap, title)
     except LError as E:
         text = f"Failed to generate sunburst.  Error: {E}"
         app.logger.warning(text)
@@ -282,34 +354,81 @@ def pe_time_series_selection_to_sunburst_and_transaction_table(
 
 
 @app.callback(
-        Output("pe_trans_table", "data"),
-        Output("pe_trans_table_text", "children"),
-        Input("pe_account_burst", "clickData"),
-        Input("pe_account_burst", "figure"),
-        State("pe_selection_store", "data"),
-        State("data_store", "children"),
-        State("param_store", "children"),
-        State("pe_time_series_resolution", "value"),
-        State("pe_time_series_span", "value"),
+    Output("pe_client_rows", "data"),
+    Input("data_store", "children"),
+)
+def send_client_rows(data_store: str):
+    """Send a small dataset's transactions to the browser once, when it
+    is loaded, so that selections filter the Periodic tab's table there
+    (see assets/selection.js).  Out-of-core and bigger datasets send
+    nothing, and are paged on the server."""
+    dstore = Datastore.from_json(data_store) if data_store else None
+    if dstore is None or dstore.partitions or len(dstore) > CONST["client_max_rows"]:
+        return None
+    return client_rows(dstore)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="ledgex", function_name="pe_table"),
+    Output("pe_trans_table", "data"),
+    Output("pe_trans_table", "page_current"),
+    Output("pe_trans_table_text", "children"),
+    Output("pe_trans_table", "page_action"),
+    Output("pe_trans_table", "sort_action"),
+    Output("pe_trans_table", "filter_action"),
+    Output("pe_table_request", "data"),
+    Input("pe_account_burst", "clickData"),
+    Input("pe_selection_store", "data"),
+    Input("pe_trans_table", "page_current"),
+    Input("pe_trans_table", "page_size"),
+    Input("pe_trans_table", "sort_by"),
+    Input("pe_trans_table", "filter_query"),
+    State("pe_client_rows", "data"),
+)
+
+
+@app.callback(
+    Output("pe_trans_table", "data", allow_duplicate=True),
+    Output("pe_trans_table", "page_count"),
+    Output("pe_trans_table", "page_current", allow_duplicate=True),
+    Output("pe_trans_table_text", "children", allow_duplicate=True),
+    Input("pe_table_request", "data"),
+    State("data_store", "children"),
+    State("param_store", "children"),
+    State("pe_time_series_resolution", "value"),
+    State("pe_time_series_span", "value"),
+    prevent_initial_call=True,
 )
 def apply_burst_click(
-    burst_clickData,
-    burst_figure,
-    pe_selection_store,
+    pe_table_request: dict,
     data_store: str,
     param_store: str,
     time_resolution: int,
     time_span: str,
 ):
     """Clicking on a slice in the Sunburst updates the transaction list
-    with matching transactions burst_figure Input is used only to
-    guarantee a trigger on initial page load.
+    with matching transactions.
+
+    This is the server half of the pe_table clientside callback, which
+    filters small datasets in the browser and passes everything else
+    on in pe_table_request: the sunburst click, the chart selection, and
+    the table's paging, sorting and filtering.  The table pages, sorts
+    and filters on the server, so only the current page is sent.  A new
+    selection goes back to the first page.
 
     """
+    preventupdate_if_empty(pe_table_request)
+    burst_clickData = pe_table_request.get("click")
+    pe_selection_store = pe_table_request.get("selection")
+    page_current: int = pe_table_request.get("page_current")
+    page_size: int = pe_table_request.get("page_size")
+    sort_by: list = pe_table_request.get("sort_by")
+    filter_query: str = pe_table_request.get("filter_query")
     preventupdate_if_empty(data_store)
     preventupdate_if_empty(pe_selection_store)
     trans, atree, eras, dstore = Datastore.get_parts(data_store)
-    preventupdate_if_empty(trans)
+    preventupdate_if_empty(dstore)
+    params: Params = Params.from_json(param_store)
     earliest_trans = dstore.earliest_trans
     latest_trans = dstore.latest_trans
 
@@ -327,35 +446,48 @@ def apply_burst_click(
     # account(s) were selected in the sunburst click, they override
     # the selection passed through from master_time_series
     if burst_clickData:
-        raw_click_account = burst_clickData["points"][0]["id"]
-        # strip any SUFFFIXes from the label that were added in the sunburst hack
-        if CONST["leaf_suffix"] in raw_click_account:
-            click_accounts = [raw_click_account.replace(CONST["leaf_suffix"], "")]
-        elif CONST["subtotal_suffix"] in raw_click_account:
-            click_accounts = [raw_click_account.replace(CONST["subtotal_suffix"], "")]
-        else:
-            click_accounts = [raw_click_account]
+        click_accounts = [Burst.strip_suffixes(burst_clickData["points"][0]["id"])]
+
+    # The chart selection is a set of (account, dates) intervals; a
+    # sunburst click narrows it to the clicked subtrees.
+    cube = dstore.cube()
+    selection = Selection.from_records(cube, pe_selection_store.get("intervals", []))
+    if len(selection) == 0:
+        accounts = [account for account in click_accounts if account in cube.code]
+        selection = Selection.from_pairs(
+            cube, accounts, [date_start] * len(accounts), [date_end] * len(accounts)
+        )
+    if burst_clickData:
+        selection = selection.restrict(click_accounts)
 
     if len(click_accounts) > 0:
-        sub_accounts: list = []
-        for account in click_accounts:
-            sub_accounts = atree.get_descendent_ids(account)
-        sel_accounts = click_accounts + sub_accounts
-        sel_trans = trans[
-            trans["account"].isin(sel_accounts)
-            & (trans["date"] >= date_start)
-            & (trans["date"] <= date_end)
-        ]
-        num_trans = len(sel_trans)
+        positions = selection.positions()
+        num_trans = selection.count(dstore.rangesum()) if dstore.partitions else len(positions)
         account_text = f"{num_trans} selected for {', '.join(click_accounts)}"
-        if (len_sub := len(sub_accounts)) > 0:
+        len_sub = sum(len(atree.get_descendent_ids(account)) for account in click_accounts)
+        if len_sub > 0:
             account_text = account_text + f" and {len_sub} sub-accounts"
     else:
-        sel_trans = trans
-        num_trans = len(sel_trans)
+        positions = np.arange(len(cube.trans))
+        num_trans = len(dstore)
         account_text = f"All accounts selected. Click a pie slice to filter from {max_trans_count} records"
 
-    sel_trans["date"] = pd.DatetimeIndex(sel_trans["date"]).strftime("%Y-%m-%d")
-    sel_trans = sel_trans.sort_values(["date"])
-
-    return [sel_trans.to_dict("records"), account_text]
+    if not pe_table_request.get("paging"):
+        page_current = 0
+    page_size = page_size or CONST["page_size"]
+    if dstore.partitions:
+        # an out-of-core ledger's rows are read from disk, a page at a
+        # time, in date order, without sorting or filtering
+        if len(click_accounts) == 0:
+            selection = Selection.from_pairs(cube, [atree.root], [earliest_trans], [latest_trans])
+        page, page_current, num_rows = dstore.ledger().page(selection, dstore.rangesum(), page_current, page_size)
+        page["date"] = page["date"].dt.strftime(CONST["date_format"])
+        records = page.to_dict("records")
+    else:
+        records, page_current, num_rows = table_page(
+            dstore, positions, page_current, page_size, sort_by, filter_query, params.unit
+        )
+    if filter_query:
+        account_text = account_text + f", {num_rows} matching the filter"
+    page_count = max(-(-num_rows // page_size), 1)
+    return [records, page_count, page_current, account_text]
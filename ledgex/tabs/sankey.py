@@ -1,83 +1,68 @@
 from dash import dcc, html
-import plotly.graph_objects as go
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 from app import app
+from params import CONST, Params
+from utils import make_sankey, preventupdate_if_empty
+from datastore import Datastore
 
 layout: html = html.Div(
     className="layout_box",
     children=[
-        html.Div(id="sankey_data", className="hidden"),
+        html.Div(id="sa_dummy", className="hidden", children="getstarted"),
         html.Div(
+            className="control_bar",
             children=[
-                html.Div(id="flow_diagram"),
+                html.Fieldset(
+                    className="flex_forward radio",
+                    children=[
+                        html.Span(children="Account Depth "),
+                        dcc.RadioItems(
+                            id="sa_depth",
+                            options=[{"label": str(x), "value": x} for x in range(1, 5)],
+                            value=CONST["sa_depth"],
+                        ),
+                    ],
+                ),
+                dcc.DatePickerRange(
+                    id="sa_date_range",
+                    display_format="YYYY-MM-DD",
+                ),
             ],
         ),
-    ],
-)
-nodes = dict(
-    label=[
-        "Job",
-        "Criminal Enterprise",
-        "Gross Income $95k",
-        "Bank A",
-        "Bank B",
-        "Bank C",
-        "Cash under mattress 72",
-        "Taxes 28",
-    ],
-    color=["gray", "yellow", "lightblue", "skyblue", "beige", "linen", "pink", "ivory"],
-    x=[0, 0, 0.2, 0.4, 0.6, 0.8, 0.9, 0.9],
-    y=[0, 1, 0.3, 0.3, 0, 0, 0.2, 0.9],
-)
-
-flow_data = dict(
-    source=[0, 1, 2, 2, 2, 3, 3, 4, 4, 5],
-    target=[2, 2, 3, 6, 7, 4, 6, 5, 7, 6],
-    value=[80, 15, 75, 14, 20, 54, 21, 46, 8, 46],
-    color=[
-        "gray",
-        "yellow",
-        "lightblue",
-        "lightblue",
-        "lightblue",
-        "skyblue",
-        "skyblue",
-        "beige",
-        "beige",
-        "linen",
+        html.Div(id="sa_text", children=""),
+        html.Div(id="flow_diagram"),
     ],
 )
 
 
 @app.callback(
-    [Output("flow_diagram", "children")],
-    [Input("sankey_data", "children")],
+    [Output("flow_diagram", "children"), Output("sa_text", "children")],
+    [
+        Input("sa_dummy", "children"),
+        Input("sa_depth", "value"),
+        Input("sa_date_range", "start_date"),
+        Input("sa_date_range", "end_date"),
+    ],
+    State("data_store", "children"),
+    State("param_store", "children"),
 )
-def fl_make_chart(data):
-    """ Generate Sankey flow diagram """
-
-    fig = go.Figure(
-        data=[
-            go.Sankey(
-                node=dict(
-                    pad=300,
-                    line=dict(color="black", width=0.5),
-                    label=nodes["label"],
-                    color=nodes["color"],
-                    x=nodes["x"],
-                    y=nodes["y"],
-                ),
-                link=dict(
-                    source=flow_data["source"],
-                    target=flow_data["target"],
-                    value=flow_data["value"],
-                    color=flow_data["color"],
-                ),
-            )
+def sa_make_chart(dummy, depth, start_date, end_date, data_store, param_store):
+    """Generate a Sankey flow diagram of money moving between accounts,
+    from the splits of each transaction, for the Sankey tab's root
+    accounts and dates."""
+    preventupdate_if_empty(data_store)
+    data_store: Datastore() = Datastore.from_json(data_store)
+    params: Params() = Params.from_json(param_store)
+    if data_store.partitions:
+        return [html.Div(), "Flows need the transactions in memory, so they aren't shown for an out-of-core ledger."]
+    flows = data_store.flows()
+    if len(flows) == 0:
+        return [
+            html.Div(),
+            f"No flows to show.  Flows need a '{CONST['txn_col']}' column that groups the splits of each transaction.",
         ]
-    )
-
-    fig.update_layout(
-        title_text="STUB for Sankey chart", font_size=20, height=1000, width=1000
-    )
-    return [dcc.Graph(figure=fig)]
+    fig = make_sankey(flows, depth, start_date, end_date, params.sa_roots, params.unit)
+    text = f"Flows between accounts, up to {depth} levels deep"
+    if params.sa_roots:
+        text = text + f", within {', '.join(params.sa_roots)}"
+    return [dcc.Graph(figure=fig), text]
@@ -0,0 +1,121 @@
+import re
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+_WORD = re.compile(r"\w+")
+
+
+def _postings(pairs_key: List[str], pairs_value: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return a sorted vocabulary, and for each of its keys the slice
+    ptr[i]:ptr[i + 1] of values, from parallel lists of (key, value)
+    pairs"""
+    codes, vocabulary = pd.factorize(np.array(pairs_key, dtype=object), sort=True)
+    order = np.argsort(codes, kind="stable")
+    values = np.asarray(pairs_value, dtype=np.int64)[order]
+    ptr = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(vocabulary)))])
+    return np.asarray(vocabulary, dtype=object), ptr, values
+
+
+class TextIndex:
+    """Inverted index of the words and trigrams of a text column, e.g.
+    transaction descriptions (which include the notes and memos of
+    Gnucash exports).
+
+    The index is over the column's distinct values, as dictionary-encoded
+    by Datastore.column_values: each posting list is a slice of one
+    sorted array of value numbers, and the rows of each value are a
+    slice of one array of row positions.  Matching is case-insensitive.
+
+    Each term of a query is one of:
+      * word*   values with a word starting with word;
+      * text    values containing text anywhere, found by intersecting
+                the posting lists of its trigrams and then checking the
+                few candidates.
+    Values must match every term.
+    """
+
+    ARRAYS = ["words", "word_ptr", "word_values", "grams", "gram_ptr", "gram_values", "rows", "row_ptr"]
+
+    def __init__(self, codes: np.ndarray, values: pd.Index, saved: dict = None):
+        """saved, if given, is the to_arrays() of an index of the same
+        codes and values, used instead of indexing them again"""
+        if saved is not None:
+            self.values = pd.Series(saved["values"], dtype=object)
+            for name in self.ARRAYS:
+                setattr(self, name, saved[name])
+            return
+        self.values = pd.Series(values, dtype=object).fillna("").astype(str).str.lower()
+        words: Tuple[list, list] = ([], [])
+        grams: Tuple[list, list] = ([], [])
+        for number, text in enumerate(self.values):
+            for word in set(_WORD.findall(text)):
+                words[0].append(word)
+                words[1].append(number)
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                grams[0].append(gram)
+                grams[1].append(number)
+        self.words, self.word_ptr, self.word_values = _postings(*words)
+        self.grams, self.gram_ptr, self.gram_values = _postings(*grams)
+        # rows of each value; code -1 (missing) is never found
+        codes = np.asarray(codes, dtype=np.int64)
+        found = codes >= 0
+        self.rows = np.flatnonzero(found)[np.argsort(codes[found], kind="stable")]
+        self.row_ptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(codes[found], minlength=len(self.values)))]
+        )
+
+    def to_arrays(self) -> dict:
+        """ Return the index's arrays, for saving (see sharedstore.SharedStore) """
+        return {"values": self.values.to_numpy(dtype=object), **{x: getattr(self, x) for x in self.ARRAYS}}
+
+    def _prefix(self, word: str) -> np.ndarray:
+        """ Return the values with a word starting with word """
+        lo = np.searchsorted(self.words, word, side="left")
+        hi = np.searchsorted(self.words, word + "\uffff", side="left")
+        return np.unique(self.word_values[self.word_ptr[lo]:self.word_ptr[hi]])
+
+    def containing(self, text: str) -> np.ndarray:
+        """ Return the sorted numbers of the distinct values containing text, ignoring case """
+        return self._substring(text.lower())
+
+    def _substring(self, text: str) -> np.ndarray:
+        """ Return the values containing text, which must be lower case """
+        if len(text) < 3:
+            return np.flatnonzero(self.values.str.contains(text, regex=False).to_numpy())
+        candidates = None
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            at = np.searchsorted(self.grams, gram)
+            if at == len(self.grams) or self.grams[at] != gram:
+                return np.array([], dtype=np.int64)
+            posting = self.gram_values[self.gram_ptr[at]:self.gram_ptr[at + 1]]
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+        if len(text) == 3:
+            return candidates
+        return candidates[self.values.iloc[candidates].str.contains(text, regex=False).to_numpy()]
+
+    def match_values(self, query: str) -> np.ndarray:
+        """ Return the sorted numbers of the distinct values matching every term of the query """
+        matched = None
+        for term in query.lower().split():
+            if term.endswith("*") and len(term) > 1:
+                found = self._prefix(term[:-1])
+            else:
+                found = self._substring(term)
+            matched = found if matched is None else np.intersect1d(matched, found, assume_unique=True)
+        if matched is None:
+            return np.arange(len(self.values))
+        return matched
+
+    def search(self, query: str, positions: np.ndarray = None) -> np.ndarray:
+        """Return the sorted row positions matching the query, of all rows,
+        or only of positions (e.g., from a Selection of accounts and
+        dates)."""
+        matched = self.match_values(query)
+        lengths = self.row_ptr[matched + 1] - self.row_ptr[matched]
+        starts = np.repeat(self.row_ptr[matched] - np.cumsum(lengths) + lengths, lengths)
+        rows = np.sort(self.rows[starts + np.arange(lengths.sum())])
+        if positions is None:
+            return rows
+        return np.intersect1d(rows, positions)
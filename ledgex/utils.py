@@ -1,7 +1,5 @@
-from typing import List, Tuple, Optional, Sized
-
-from datetime import datetime, timedelta
-import calendar
+from typing import Dict, List, Tuple, Sized, Union
+import copy
 
 from dash import dash_table
 import numpy as np
@@ -10,11 +8,13 @@ import plotly.express as px
 import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
 
-from app import app
-from atree import ATree
+from cube import Cube
+from downsample import bucket_series, decimate_points, lttb
+from eras import EraIndex
+from flows import Flows
 from params import CONST
+from presentation import Presentation
 from errors import LError
-from ledger import Ledger
 
 pd.options.mode.chained_assignment = (
     None  # default='warn'  This suppresses the invalid warning for the .map function
@@ -135,9 +135,12 @@ trans_table = dash_table.DataTable(
         {"if": {"column_id": "amount"}, "padding": "0px 12px 0px 0px", "width": "13%"},
     ],
     data=[],
-    sort_action="native",
-    page_action="native",
-    filter_action="native",
+    sort_action="custom",
+    sort_mode="multi",
+    page_action="custom",
+    filter_action="custom",
+    page_current=0,
+    page_count=0,
     style_as_list_view=True,
     page_size=20,
 )
@@ -190,9 +193,12 @@ bs_trans_table = dash_table.DataTable(
         {"if": {"column_id": "total"}, "padding": "0px 12px 0px 0px", "width": "11%"},
     ],
     data=[],
-    sort_action="native",
-    page_action="native",
-    filter_action="native",
+    sort_action="custom",
+    sort_mode="multi",
+    page_action="custom",
+    filter_action="custom",
+    page_current=0,
+    page_count=0,
     style_as_list_view=True,
     page_size=20,
 )
@@ -242,14 +248,22 @@ pe_trans_table = dash_table.DataTable(
         {"if": {"column_id": "amount"}, "padding": "0px 12px 0px 0px", "width": "13%"},
     ],
     data=[],
-    sort_action="native",
-    page_action="native",
-    filter_action="native",
+    sort_action="custom",
+    sort_mode="multi",
+    page_action="custom",
+    filter_action="custom",
+    page_current=0,
+    page_count=0,
     style_as_list_view=True,
     page_size=20,
 )
 
 
+# the Explore tab's search results, laid out like the Periodic tab's table
+ex_trans_table = copy.copy(pe_trans_table)
+ex_trans_table.id = "ex_trans_table"
+
+
 trans_table_format = dict(
     columns=[
         dict(id="date", name="Date", type="datetime"),
@@ -311,60 +325,91 @@ def to_decade(year_string: str) -> int:
     return int(year_string[0:3]) * 10
 
 
-def period_to_date_range(
-    time_resolution: str, period: str, eras: Optional[pd.DataFrame] = None
-) -> Tuple[np.datetime64, np.datetime64]:
-    """ Convert period label to tuple of start and end dates, based on time_resolution """
-
-    def _month_end(date: datetime) -> np.datetime64:
-        # return the date of the last day of the month of the input date
-        year = date.year
-        month = date.month
-        last_day = calendar.monthrange(year, month)[1]
-        end_date = np.datetime64(datetime(year=year, month=month, day=last_day))
-        return end_date
-
+def _label_ints(labels: np.ndarray, first: int, last: int) -> np.ndarray:
+    """ Return the integers at [first:last] of each label """
+    try:
+        return pd.Series(labels).str.slice(first, last).astype(np.int64).to_numpy()
+    except ValueError as E:
+        raise LError(f"Invalid period label: {E}")
+
+
+def periods_to_date_ranges(
+    time_resolution: str, periods, eras: Union[pd.DataFrame, EraIndex, None] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert an array of period labels, as used on chart axes, to arrays
+    of the start and end dates (inclusive) of each period, based on
+    time_resolution.  For eras, each period is any date within the era.
+    A label may also be a run of periods, 'first label/last label', as
+    made by downsampling.  All labels are converted at once, with no
+    per-label date parsing."""
+    labels = np.asarray(periods, dtype=str)
+    if time_resolution != "era" and (np.char.find(labels, "/") >= 0).any():
+        parts = np.char.partition(labels, "/")
+        first, last = parts[:, 0], np.where(parts[:, 2] == "", parts[:, 0], parts[:, 2])
+        return (
+            periods_to_date_ranges(time_resolution, first)[0],
+            periods_to_date_ranges(time_resolution, last)[1],
+        )
     if time_resolution == "era":
-        if eras and isinstance(eras, pd.DataFrame):
-            if len(eras) == 0:
-                raise LError("Trying to group by era, but no eras provided.")
-            else:
-                period_start = eras[eras["date_start"] < period].iloc[-1]["date_start"]
-                period_end = eras[eras["date_start"] > period].iloc[0]["date_start"]
-    elif time_resolution == "decade":
-        try:
-            decade_start_year = to_decade(period)
-            period_start = datetime(decade_start_year, 1, 1)
-            period_end = datetime(decade_start_year + 9, 12, 31)
-        except Exception as E:
-            raise LError(f"problem calculating decade: {E}")
-    elif time_resolution == "year":
-        period_start = datetime(int(period), 1, 1)
-        period_end = datetime(int(period), 12, 31)
+        if isinstance(eras, pd.DataFrame):
+            eras = EraIndex(eras)
+        if eras is None or len(eras) == 0:
+            raise LError("Trying to group by era, but no eras provided.")
+        days = pd.to_datetime(labels).to_numpy(dtype="datetime64[D]").astype(np.int64)
+        era = eras.era_of(days)
+        if (era < 0).any():
+            raise LError(f"{labels[era < 0][0]} is not in any era.")
+        return (
+            eras.starts[era].astype("datetime64[D]"),
+            eras.ends[era].astype("datetime64[D]"),
+        )
+    elif time_resolution in ["decade", "year"]:
+        year = _label_ints(labels, 0, 4)
+        if time_resolution == "decade":
+            year = year // 10 * 10
+            n_years = 10
+        else:
+            n_years = 1
+        start = (year - 1970).astype("datetime64[Y]")
+        end = (year - 1970 + n_years).astype("datetime64[Y]")
     elif time_resolution == "quarter":
-        try:
-            year: int = int(period[0:4])
-        except ValueError:
-            raise LError("Internal error while trying to convert year to date.")
-        try:
-            Q: int = int(period[6:7])
-        except ValueError:
-            raise LError("Internal error while trying to convert quarter to date.")
-        start_month: int = (Q * 3) - 2
-        period_start = datetime(year, start_month, 1)
-        period_end = _month_end(period_start + timedelta(days=63))
+        # YYYY-Qq
+        month = (_label_ints(labels, 0, 4) - 1970) * 12 + (_label_ints(labels, 6, 7) - 1) * 3
+        start = month.astype("datetime64[M]")
+        end = (month + 3).astype("datetime64[M]")
     elif time_resolution == "month":
-        period_start = datetime.strptime(period, "%Y-%m")
-        period_end = _month_end(period_start)
+        try:
+            start = labels.astype("datetime64[M]")
+        except ValueError as E:
+            raise LError(f"Invalid period label: {E}")
+        end = start + 1
     elif time_resolution == "week":
-        period_start = datetime.strptime(period, "%Y-W%V")
-        period_end = period_start + timedelta(days=7)
+        # Weeks are labeled with their ISO year and week number, and ISO
+        # week 1 is the week with January 4th in it
+        year = _label_ints(labels, 0, 4)
+        week = _label_ints(labels, 6, 8)
+        jan_4 = (year - 1970).astype("datetime64[Y]").astype("datetime64[D]") + 3
+        weekday = (jan_4.astype(np.int64) + 3) % 7  # Monday is 0
+        start = jan_4 - weekday + (week - 1) * 7
+        end = start + 7
     elif time_resolution == "day":
-        period_start = datetime.strptime(period, "%Y-%m-%d")
-        period_end = period_start
+        try:
+            start = labels.astype("datetime64[D]")
+        except ValueError as E:
+            raise LError(f"Invalid period label: {E}")
+        end = start + 1
     else:
-        raise LError("Internal error: {time_resolution} is invalid")
-    return (np.datetime64(period_start), np.datetime64(period_end))
+        raise LError(f"Internal error: {time_resolution} is invalid")
+    return (start.astype("datetime64[D]"), end.astype("datetime64[D]") - 1)
+
+
+def period_to_date_range(
+    time_resolution: str, period: str, eras: Union[pd.DataFrame, EraIndex, None] = None
+) -> Tuple[np.datetime64, np.datetime64]:
+    """Convert period label to tuple of start and end dates, based on
+    time_resolution.  For eras, the period is any date within the era."""
+    start, end = periods_to_date_ranges(time_resolution, [period], eras)
+    return (start[0], end[0])
 
 
 def pretty_date(date: np.datetime64) -> str:
@@ -372,6 +417,43 @@ def pretty_date(date: np.datetime64) -> str:
     return pd.to_datetime(str(date)).strftime("%Y-%m-%d")
 
 
+def fit_resolution(start, end, width_px: int = None) -> str:
+    """Return the finest time resolution at which the dates from start
+    to end fit across width_px pixels, with at least
+    CONST['min_period_px'] pixels per period."""
+    width_px = width_px or CONST["chart_width_px"]
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    max_periods = max(width_px // CONST["min_period_px"], 1)
+    for time_resolution in ["day", "week", "month", "quarter", "year"]:
+        months = CONST["time_res_lookup"][time_resolution]["months"]
+        if days / (months * EraIndex.DAYS_PER_MONTH) <= max_periods:
+            return time_resolution
+    return "decade"
+
+
+def zoom_window(zoom: dict, first_date, last_date) -> Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, pd.Timestamp]:
+    """Return the visible dates of a chart, from its zoom store (see
+    assets/zoom.js), and the dates to fetch, which add a margin of
+    CONST['zoom_margin'] of the visible window on each side, so panning
+    a little doesn't need new data.  With no zoom, everything from
+    first_date to last_date is visible."""
+    first_date, last_date = pd.Timestamp(first_date), pd.Timestamp(last_date)
+    x_range = (zoom or {}).get("range")
+    if not x_range:
+        return first_date, last_date, first_date, last_date
+    visible_start = max(pd.Timestamp(x_range[0]), first_date)
+    visible_end = min(pd.Timestamp(x_range[1]), last_date)
+    if visible_end < visible_start:
+        visible_start, visible_end = first_date, last_date
+    margin = (visible_end - visible_start) * CONST["zoom_margin"]
+    return (
+        visible_start,
+        visible_end,
+        max(visible_start - margin, first_date),
+        min(visible_end + margin, last_date),
+    )
+
+
 def preventupdate_if_empty(field: object):
     """ Shorthand to halt callbacks if data missing"""
     if isinstance(field, pd.DataFrame):
@@ -385,192 +467,475 @@ def preventupdate_if_empty(field: object):
         return
 
 
-def periodic_bar(
-    trans: pd.DataFrame,
-    account_tree: ATree,
+def marker_color(color_num: int) -> str:
+    """ Return the color_num-th discrete color """
+    try:
+        return disc_colors[color_num]
+    except IndexError:
+        # don't ever run out of colors
+        return "var(--Cyan)"
+
+
+def selected_points(first, last, sel_start_date: str = None, sel_end_date: str = None) -> List[int]:
+    """Return the positions of the bars all of whose transactions are
+    inside the selected dates, from each bar's first and last
+    transaction day"""
+    selected = np.ones(len(first), dtype=bool)
+    if sel_start_date:
+        start_day = np.datetime64(sel_start_date).astype("datetime64[D]").astype(np.int64)
+        selected &= np.asarray(first) >= start_day
+    if sel_end_date:
+        end_day = np.datetime64(sel_end_date).astype("datetime64[D]").astype(np.int64)
+        selected &= np.asarray(last) <= end_day
+    return np.flatnonzero(selected).tolist()
+
+
+def series_bar(
+    bin_amounts: pd.DataFrame,
     account_id: str,
-    time_resolution: str,
-    time_span: str,
     factor: float,
-    eras: pd.DataFrame,
-    color_num: int = 0,
-    deep: bool = False,
+    abbrev: str,
+    color: str,
     positize: bool = False,
     unit: str = CONST["unit"],
     sel_start_date: str = None,
     sel_end_date: str = None,
+    max_points: int = None,
+    date_x: bool = False,
+    spans: list = None,
 ) -> go.Bar:
-    """returns a go.Bar object with total by time_resolution period for
-    the selected account.  If deep, include total for all descendent accounts."""
-    if deep:
-        tba = trans[
-            trans[CONST["account_col"]].isin(
-                [account_id] + account_tree.get_descendent_ids(account_id)
-            )
-        ]
+    """returns a go.Bar object from a series of period totals from the
+    aggregate cube (see Cube.series).  If there are more than max_points
+    periods, consecutive periods are combined into buckets (see
+    bucket_series).  Each bar's period label is its id.  If date_x, bars
+    are placed at the middle of their periods on a date axis, rather
+    than at their labels, so charts at different resolutions share an
+    x axis.  If spans is a list, the first and last transaction days of
+    the bars are appended to it, for selected_points."""
+    if not bin_amounts["active"].any():
+        raise LError('no transactions sent to series_bar')
+    if positize and bin_amounts["value"].sum() < 0:
+        bin_amounts["value"] = bin_amounts["value"] * -1
+    bin_amounts = bucket_series(bin_amounts, max_points)
+    if date_x:
+        bin_amounts["x"] = bin_amounts["start"] + (
+            bin_amounts["end"] + pd.Timedelta(days=1) - bin_amounts["start"]
+        ) / 2
     else:
-        tba = trans[trans[CONST["account_col"]] == account_id]
-    if len(tba) == 0:
-        raise LError('no transactions sent to periodic_bar')
-    tba = Ledger.positize(tba)
-    tba = tba.set_index("date")
-    tba['selected'] = True
-    if sel_start_date:
-        tba.loc[tba.index < np.datetime64(sel_start_date), 'selected'] = False
-    if sel_end_date:
-        tba.loc[tba.index > np.datetime64(sel_end_date), 'selected'] = False
-    tr: dict = CONST["time_res_lookup"][time_resolution]
-    tr_format: str = tr.get("format", None)  # e.g., %Y-%m
+        bin_amounts["x"] = bin_amounts["label"].str.split("/").str[0]
+
+    bin_amounts = bin_amounts[bin_amounts['value'] > 0]
+    bin_amounts["y"] = bin_amounts["value"] * factor
+    bin_amounts["unit"] = unit
+    bin_amounts["abbrev"] = abbrev
+    bin_amounts[
+        "label_pre"
+    ] = f"{account_id}<br>{unit}"  # this works because these are variables, not column names
+    if spans is not None:
+        spans.append((bin_amounts["first"].to_numpy(), bin_amounts["last"].to_numpy()))
+    selected = selected_points(bin_amounts["first"], bin_amounts["last"], sel_start_date, sel_end_date)
+    hovertemplate = "%{x}<br>%{text}%{y:,.0f}%{customdata}<extra></extra>"
+    hovertext = None
+    if "low" in bin_amounts.columns:
+        # downsampled: show the run of periods and the range of period values
+        hovertext = (
+            bin_amounts["label"].str.replace("/", " to ")
+            + "<br>"
+            + ((bin_amounts["low"] * factor).round() + 0.0).apply("{:,.0f}".format)
+            + " to "
+            + ((bin_amounts["high"] * factor).round() + 0.0).apply("{:,.0f}".format)
+            + " per period"
+        )
+        hovertemplate = "%{hovertext}<br>%{text}%{y:,.0f}%{customdata}<extra></extra>"
+    return go.Bar(
+        name=account_id,
+        ids=bin_amounts.label,
+        x=bin_amounts.x,
+        y=bin_amounts.y,
+        text=bin_amounts.label_pre,
+        textposition="auto",
+        selectedpoints=selected,
+        opacity=0.9,
+        customdata=bin_amounts.abbrev,
+        hovertext=hovertext,
+        texttemplate="%{text}%{y:,.0f}%{customdata}",
+        hovertemplate=hovertemplate,
+        marker_color=color,
+    )
+
+
+def era_bar(
+    bin_amounts: pd.DataFrame,
+    account_id: str,
+    factor: float,
+    abbrev: str,
+    color: str,
+    positize: bool = False,
+    unit: str = CONST["unit"],
+) -> go.Bar:
+    """returns a go.Bar object with one bar per era, as wide as the era,
+    from a series of era totals from the aggregate cube.  Each era's
+    total is prorated by the era's duration in months."""
+    if not bin_amounts["active"].any():
+        raise LError('no transactions sent to era_bar')
+    if positize and bin_amounts["value"].sum() < 0:
+        bin_amounts["value"] = bin_amounts["value"] * -1
+    bin_amounts = bin_amounts.set_index("label")
+    bin_amounts["delta"] = bin_amounts["end"] - bin_amounts["start"]
+    bin_amounts["width"] = bin_amounts["delta"] / np.timedelta64(1, "ms")
+    bin_amounts["midpoint"] = bin_amounts["start"] + bin_amounts["delta"] / 2
+    bin_amounts["value"] = bin_amounts["value"] * factor / bin_amounts["months"]
+    bin_amounts["pretty_value"] = bin_amounts["value"].apply("{:,.0f}".format)
+    bin_amounts["suffix"] = str(unit) + str(abbrev)
+    bin_amounts["account_id"] = account_id
+    bin_amounts["customdata"] = (
+        "From " + bin_amounts["start"].astype(str) + " to " + bin_amounts["end"].astype(str)
+    )
+
+    bin_amounts["text"] = (
+        bin_amounts["account_id"]
+        + "<br>"
+        + bin_amounts["pretty_value"]
+        + " "
+        + bin_amounts["suffix"]
+        + "<br>"
+        + bin_amounts.index.astype(str)
+    )
+
+    return go.Bar(
+        name=account_id,
+        x=bin_amounts.midpoint,
+        width=bin_amounts.width,
+        y=bin_amounts.value,
+        customdata=bin_amounts.customdata,
+        text=bin_amounts.text,
+        textposition="auto",
+        opacity=0.9,
+        texttemplate="%{text}",
+        hovertemplate="%{customdata}<extra></extra>",
+        marker_color=color,
+    )
+
+
+def periodic_bars(
+    cube: Cube,
+    account_id: str,
+    time_resolution: str,
+    time_span: str,
+    factor: float,
+    positize: bool = False,
+    unit: str = CONST["unit"],
+    sel_start_date: str = None,
+    sel_end_date: str = None,
+    max_points: int = None,
+    start=None,
+    end=None,
+    date_x: bool = False,
+    spans: list = None,
+) -> List[go.Bar]:
+    """returns a list of go.Bar objects, one for each child of the
+    account, with the total of the child and its descendents by
+    time_resolution period, downsampled to max_points bars.  If start or
+    end are given, only the periods overlapping them are included.  All
+    of the children are grouped in one pass over the cube.  Children
+    with no transactions are skipped, but keep their color.  If spans is
+    a list, the first and last transaction days of each series bar, or
+    None for an era bar, are appended to it (see series_bar)."""
+    bars: List[go.Bar] = []
+    if time_resolution == "era" and len(cube.era_index) == 0:
+        return bars
     abbrev = CONST["time_span_lookup"][time_span]["abbrev"]
-    try:
-        marker_color = disc_colors[color_num]
-    except IndexError:
-        # don't ever run out of colors
-        marker_color = "var(--Cyan)"
-    if time_resolution in ["decade", "year", "quarter", "month", "week", "day"]:
-        if time_resolution == "decade":
-            tba["year"] = tba.index.year
-            tba["dec"] = tba["year"].floordiv(10).mul(10).astype("str")
-            bin_amounts = tba.groupby("dec").sum()["amount"].to_frame(name="value")
-            bin_amounts['selected'] = tba.groupby("dec").all()['selected']
-            bin_amounts["x"] = bin_amounts.index
+    children = cube.children_series(account_id, time_resolution, start, end)
+    for i, (child, bin_amounts) in enumerate(children.items()):
+        if not bin_amounts["active"].any():
+            continue
+        if time_resolution == "era":
+            bar = era_bar(bin_amounts, child, factor, abbrev, marker_color(i), positize, unit)
+            if spans is not None:
+                spans.append(None)
         else:
-            bin_amounts = (
-                tba.resample(tr["resample_keyword"])
-                .sum()["amount"]
-                .to_frame(name="value")
+            bar = series_bar(bin_amounts, child, factor, abbrev, marker_color(i), positize,
+                             unit, sel_start_date, sel_end_date, max_points, date_x, spans)
+        bars.append(bar)
+    return bars
+
+
+def make_cum_areas(
+    cube: Cube,
+    account_id: str,
+    time_resolution: str = "month",
+    max_points: int = None,
+    start=None,
+    end=None,
+) -> List[go.Scatter]:
+    """returns a list of go Scatter objects, one for each child of the
+    account, with the cumulative total of the child and its descendents
+    by time_resolution period.  All of the children are totaled in one
+    pass over the cube, and accumulated together as a (children ×
+    periods) matrix.  If start or end are given, only the periods
+    overlapping them are included, starting from each child's total
+    before them, and lines run to the end of the window.  Lines with
+    more than max_points points are downsampled together with LTTB.
+    Children with no transactions are skipped, but keep their color."""
+    children, summary = cube.children_summary(account_id, time_resolution, start, end)
+    if len(children) == 0:
+        return []
+    windowed = start is not None or end is not None
+    periods = cube.periods(time_resolution).iloc[summary["window"]]
+    if len(periods) == 0:
+        return []
+    x = periods["end"].to_numpy()
+    cumulative = summary["opening"][:, None] + summary["value"].cumsum(axis=1)
+    active = summary["active"]
+    if windowed:
+        # a balance carried into the window is active from its start
+        active = active.copy()
+        active[summary["opening"] != 0, 0] = True
+        active[active.any(axis=1), -1] = True
+    kept = lttb(x.astype("datetime64[D]").astype(np.int64), cumulative, max_points)
+    # Downsampled lines have different x, so stack them by interpolating
+    # rather than inserting zeros, starting each line from its last zero.
+    downsampled = kept.shape[1] < len(x)
+    areas: List[go.Scatter] = []
+    for i, child in enumerate(children):
+        active_periods = np.flatnonzero(active[i])
+        if len(active_periods) == 0:
+            continue
+        first, last = active_periods[0], active_periods[-1]
+        if downsampled:
+            first = max(first - 1, 0)
+        points = kept[i][(kept[i] >= first) & (kept[i] <= last)]
+        points = np.unique(np.concatenate([[first], points, [last]]))
+        color = marker_color(i)
+        areas.append(
+            go.Scatter(
+                x=x[points],
+                y=cumulative[i, points],
+                name=child,
+                mode="lines+markers",
+                marker={"symbol": "circle", "opacity": 1, "color": color},
+                hovertemplate="%{fullData.name}<br>%{y:$,.0f}<br>%{x}<extra></extra>",  # TODO: pass in unit for $
+                line={"width": 0.5, "color": color},
+                hoverlabel={"namelength": 15},
+                stackgroup="one",
+                stackgaps="interpolate" if downsampled else "infer zero",
             )
-            bin_amounts["x"] = bin_amounts.index.to_period().strftime(tr_format)
-            bin_amounts["selected"] = tba.resample(tr["resample_keyword"]).apply(all)['selected']
-
-        bin_amounts = bin_amounts[bin_amounts['value'] > 0]
-        bin_amounts["y"] = bin_amounts["value"] * factor
-        bin_amounts["unit"] = unit
-        bin_amounts["abbrev"] = abbrev
-        bin_amounts[
-            "label_pre"
-        ] = f"{account_id}<br>{unit}"  # this works because these are variables, not column names
-        selected = bin_amounts.reset_index()[bin_amounts.reset_index()['selected']].index.to_list()
-        trace = go.Bar(
-            name=account_id,
-            x=bin_amounts.x,
-            y=bin_amounts.y,
-            text=bin_amounts.label_pre,
-            textposition="auto",
-            selectedpoints=selected,
-            opacity=0.9,
-            customdata=bin_amounts.abbrev,
-            texttemplate="%{text}%{y:,.0f}%{customdata}",
-            hovertemplate="%{x}<br>%{text}%{y:,.0f}%{customdata}<extra></extra>",
-            marker_color=marker_color,
         )
-    elif time_resolution == "era":
-        if len(eras) == 0:
-            raise LError("era was selected but no eras are available.")
-        # convert the era dates to a series that can be used for grouping
-        bins = eras.date_start.sort_values()
-        bin_boundary_dates = bins.tolist()
-        bin_labels = bins.index.tolist()
-        bin_labels = bin_labels[0:-1]
-        try:
-            tba["bin"] = pd.cut(
-                x=tba.index,
-                bins=bin_boundary_dates,
-                labels=bin_labels,
-                duplicates="drop",
-            )
-        except ValueError as E:
-            app.logger.warning(
-                "An error making the bins for eras.  Probably because of design errors"
-                + f" in how eras are parsed and loaded: {E}.  Bins are {bins}"
+    return areas
+
+
+def make_dot_fig(
+    trans: pd.DataFrame,
+    colors: pd.Series,
+    max_points: int = CONST["ex_max_points"],
+    webgl_threshold: int = CONST["ex_webgl_threshold"],
+    presentation: Presentation = None,
+) -> go.Figure:
+    """returns a scatter figure of transactions by date and amount, with
+    one dot per transaction, colored by colors.  Above webgl_threshold
+    transactions, dots are drawn with WebGL.  Above max_points, the dots
+    are decimated (see decimate_points), and a density map of all of the
+    transactions is drawn underneath.  Each dot's customdata is its
+    transaction's index in trans, so a clicked dot is always one exact
+    transaction.  Hover labels come from presentation, which must cover
+    trans, or are formatted on the spot if it is None."""
+    dot_fig = go.Figure(layout=layouts["dot_fig"])
+    days = trans["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    amounts = trans["amount"].to_numpy(dtype=np.float64)
+    kept = decimate_points(days, amounts, max_points)
+    shown = trans.iloc[kept]
+    if len(kept) < len(trans):
+        counts, day_edges, amount_edges = np.histogram2d(days, amounts, bins=[100, 50])
+        day_centers = ((day_edges[:-1] + day_edges[1:]) / 2).astype("datetime64[D]")
+        dot_fig.add_trace(
+            go.Heatmap(
+                x=day_centers,
+                y=(amount_edges[:-1] + amount_edges[1:]) / 2,
+                z=np.where(counts > 0, counts, np.nan).T,
+                colorscale="Greys",
+                showscale=False,
+                opacity=0.5,
+                hoverinfo="skip",
             )
-            return None
-        bin_amounts = pd.DataFrame(
-            {
-                "date": bin_boundary_dates[0:-1],
-                "value": tba.groupby("bin")["amount"].sum(),
-            }
         )
-        bin_amounts["date_start"] = bin_boundary_dates[0:-1]
-        bin_amounts["date_end"] = bin_boundary_dates[1:]
-        bin_amounts["delta"] = bin_amounts["date_end"] - bin_amounts["date_start"]
-        bin_amounts["width"] = bin_amounts["delta"] / np.timedelta64(1, "ms")
-        bin_amounts["midpoint"] = bin_amounts["date_start"] + bin_amounts["delta"] / 2
-        bin_amounts["months"] = bin_amounts["delta"] / np.timedelta64(1, "M")
-        bin_amounts["title"] = bin_amounts.index.astype(str)
-        bin_amounts["value"] = bin_amounts["value"] * factor / bin_amounts["months"]
-        bin_amounts["pretty_value"] = bin_amounts["value"].apply("{:,.0f}".format)
-        bin_amounts["suffix"] = str(unit) + str(abbrev)
-        bin_amounts["account_id"] = account_id
-        bin_amounts["customdata"] = (
-            "From " + bin_amounts["date_start"].astype(str) + " to " + bin_amounts["date_end"].astype(str)
+    if presentation is None:
+        presentation = Presentation(shown)
+    hovertext = presentation.hovertext(shown)
+    scatter = go.Scattergl if len(trans) > webgl_threshold else go.Scatter
+    dot_fig.add_trace(
+        scatter(
+            x=shown["date"],
+            y=shown["amount"],
+            mode="markers",
+            marker_color=colors.iloc[kept],
+            customdata=shown.index,
+            hovertext=hovertext,
+            hovertemplate="%{hovertext}<extra></extra>",
+            **traces["dot_fig"],
         )
-
-        bin_amounts["text"] = (
-            bin_amounts["account_id"]
-            + "<br>"
-            + bin_amounts["pretty_value"]
-            + " "
-            + bin_amounts["suffix"]
-            + "<br>"
-            + bin_amounts.index.astype(str)
+    )
+    return dot_fig
+
+
+def make_sankey(
+    flows: Flows, depth: int = CONST["sa_depth"], start=None, end=None, roots: list = None, unit: str = CONST["unit"]
+) -> go.Figure:
+    """returns a Sankey diagram of the money flowing between accounts,
+    from Flows.matrix, with one node per account at depth or shallower,
+    colored by top-level account."""
+    source, target, value = flows.matrix(depth, start, end, roots)
+    codes, links = np.unique(np.concatenate([source, target]), return_inverse=True)
+    palette = px.colors.qualitative.Set3
+    top = flows.ancestors(1)[codes]
+    colors = [palette[x % len(palette)] for x in pd.factorize(top)[0]]
+    labels = [flows.cube.ids[x] for x in codes]
+    fig = go.Figure(
+        go.Sankey(
+            node=dict(
+                pad=15,
+                line=dict(color="black", width=0.5),
+                label=labels,
+                color=colors,
+                hovertemplate="%{label}<br>" + unit + "%{value:,.0f}<extra></extra>",
+            ),
+            link=dict(
+                source=links[:len(source)],
+                target=links[len(source):],
+                value=value,
+                color=[colors[x].replace("rgb", "rgba").replace(")", ", 0.5)") for x in links[:len(source)]],
+                hovertemplate="%{source.label} → %{target.label}<br>" + unit + "%{value:,.0f}<extra></extra>",
+            ),
         )
-
-        trace = go.Bar(
-            name=account_id,
-            x=bin_amounts.midpoint,
-            width=bin_amounts.width,
-            y=bin_amounts.value,
-            customdata=bin_amounts.customdata,
-            text=bin_amounts.text,
-            textposition="auto",
-            opacity=0.9,
-            texttemplate="%{text}",
-            hovertemplate="%{customdata}<extra></extra>",
-            marker_color=marker_color,
+    )
+    fig.update_layout(layouts["base"], height=800)
+    return fig
+
+
+def make_counterparty_fig(totals: pd.Series, account_id: str, unit: str = CONST["unit"]) -> go.Figure:
+    """returns a bar chart of where an account's money came from
+    (positive) and went to (negative), from CounterpartyIndex.totals"""
+    totals = totals.sort_values()
+    fig = go.Figure(
+        go.Bar(
+            y=totals.index,
+            x=totals.to_numpy(),
+            orientation="h",
+            marker_color=np.where(totals.to_numpy() < 0, "indianred", "seagreen"),
+            hovertemplate="%{y}<br>" + unit + "%{x:,.0f}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        layouts["base"],
+        title_text=f"Money into and out of {account_id}",
+        height=max(200, 30 * len(totals) + 80),
+    )
+    return fig
+
+
+def make_delta_bars(
+    deltas: pd.DataFrame, labels: Tuple[str, str], max_bars: int = CONST["co_max_bars"], unit: str = CONST["unit"]
+) -> go.Figure:
+    """returns a diverging bar chart of the accounts that changed most
+    from A to B, from Comparison.frame, biggest at the top"""
+    top = deltas.head(max_bars).iloc[::-1]
+    percent = top["percent"].map(lambda x: "" if np.isnan(x) else f" ({x:+,.0f}%)")
+    fig = go.Figure(
+        go.Bar(
+            y=top["account"],
+            x=top["delta"],
+            orientation="h",
+            marker_color=np.where(top["delta"].to_numpy() < 0, "indianred", "seagreen"),
+            customdata=np.stack([top["a"], top["b"], percent], axis=-1),
+            hovertemplate=(
+                f"%{{y}}<br>{labels[0]}: {unit}%{{customdata[0]:,.0f}}<br>"
+                + f"{labels[1]}: {unit}%{{customdata[1]:,.0f}}<br>"
+                + f"change: {unit}%{{x:,.0f}}%{{customdata[2]}}<extra></extra>"
+            ),
         )
+    )
+    fig.update_layout(
+        layouts["base"],
+        title_text=f"Biggest changes from {labels[0]} to {labels[1]}",
+        height=max(200, 25 * len(top) + 80),
+    )
+    return fig
+
+
+def visible_deltas(deltas: pd.DataFrame, focus: str = None, depth: int = CONST["burst_depth"]) -> pd.DataFrame:
+    """Return the rows of Comparison.frame that a delta sunburst centered
+    on focus shows: focus, its ancestors, and depth levels of
+    descendents, or without a focus, the top accounts and depth levels
+    below them.  As in Burst.visible_frame, each deepest account shown
+    that has more descendents gets one placeholder child instead of
+    them, sized by the money moved in all of them, and colored by the
+    account's change."""
+    parents = dict(zip(deltas["account"], deltas["parent"]))
+    children: Dict[str, List[str]] = {}
+    for account, parent in parents.items():
+        children.setdefault(parent, []).append(account)
+    if focus in parents:
+        shown = []
+        up = parents[focus]
+        while up:
+            shown.insert(0, up)
+            up = parents[up]
+        level = [focus]
     else:
-        raise LError(
-            f"Invalid keyword for time_resolution: {time_resolution}, or eras is specified but empty."
+        shown, level = [], children.get("", [])
+    shown.extend(level)
+    for _ in range(depth):
+        level = [child for account in level for child in children.get(account, [])]
+        shown.extend(level)
+    frame = deltas.set_index("account")
+    more = frame.loc[[x for x in level if x in children]].reset_index()
+    more["parent"] = more["account"]
+    more["account"] = more["account"] + CONST["more_suffix"]
+    more["own_activity"] = more["activity"] - more["own_activity"]
+    return pd.concat([frame.loc[shown].reset_index(), more], ignore_index=True)
+
+
+def make_delta_sunburst(
+    deltas: pd.DataFrame,
+    labels: Tuple[str, str],
+    depth: int = CONST["burst_depth"],
+    unit: str = CONST["unit"],
+    focus: str = None,
+) -> go.Figure:
+    """returns a sunburst of the accounts in Comparison.frame, sized by
+    how much money moved in them and colored by their change from A to
+    B, centered on focus.  Only the accounts of visible_deltas are sent,
+    so the size of the figure depends on what can be seen, not on the
+    size of the tree."""
+    limit = max(np.abs(deltas["delta"]).max(), 1) if len(deltas) > 0 else 1
+    shown = visible_deltas(deltas, focus, depth)
+    names = shown["account"].where(~shown["account"].str.endswith(CONST["more_suffix"]), "…")
+    fig = go.Figure(
+        go.Sunburst(
+            ids=shown["account"],
+            labels=names,
+            parents=shown["parent"],
+            values=shown["own_activity"],
+            branchvalues="remainder",
+            maxdepth=depth + 1,
+            level=focus if focus in set(deltas["account"]) else None,
+            marker=dict(
+                colors=shown["delta"],
+                colorscale="RdYlGn",
+                cmin=-limit,
+                cmax=limit,
+                cmid=0,
+                showscale=True,
+            ),
+            customdata=np.stack([shown["a"], shown["b"], shown["delta"]], axis=-1),
+            hovertemplate=(
+                f"%{{label}}<br>{labels[0]}: {unit}%{{customdata[0]:,.0f}}<br>"
+                + f"{labels[1]}: {unit}%{{customdata[1]:,.0f}}<br>"
+                + f"change: {unit}%{{customdata[2]:,.0f}}<extra></extra>"
+            ),
         )
-    return trace
-
-
-def make_cum_area(
-    trans: pd.DataFrame, account_id: str, color_num: int = 0, time_resolution: int = 0
-) -> go.Scatter:
-    """returns an go Scatter object with cumulative total by time_resolution period for
-    the selected account."""
-
-    tr = CONST["time_res_lookup"][time_resolution]
-    resample_keyword = tr["resample_keyword"]
-    trans = trans.set_index("date")
-
-    bin_amounts = trans.resample(resample_keyword).sum().cumsum()
-    bin_amounts["date"] = bin_amounts.index
-    bin_amounts["value"] = bin_amounts["amount"]
-    bin_amounts["label"] = account_id
-    try:
-        marker_color = disc_colors[color_num]
-    except IndexError:
-        # don't ever run out of colors
-        marker_color = "var(--Cyan)"
-    bin_amounts[
-        "texttemplate"
-    ] = "%{customdata}"  # workaround for passing variables through layers of plotly
-    scatter = go.Scatter(
-        x=bin_amounts["date"],
-        y=bin_amounts["value"],
-        name=account_id,
-        mode="lines+markers",
-        marker={"symbol": "circle", "opacity": 1, "color": marker_color},
-        customdata=bin_amounts["label"],
-        hovertemplate="%{customdata}<br>%{y:$,.0f}<br>%{x}<extra></extra>",  # TODO: pass in unit for $
-        line={"width": 0.5, "color": marker_color},
-        hoverlabel={"namelength": 15},
-        stackgroup="one",
     )
-    return scatter
+    fig.update_layout(layouts["base"], height=600)
+    return fig
 
 
 def make_scatter(account_id: str, trans: pd.DataFrame, color_num: int = 0):
@@ -0,0 +1,77 @@
+import os
+from typing import Callable, List
+
+from app import app
+from datastore import Datastore
+from errors import LoadError
+from loading import encode_dataset, encode_key, load_input_file, pinned_datasets, pinned_files
+from params import Params
+from tabs.hometab import example_permalinks
+
+# What to load at boot: "examples" for the About tab's examples, or the
+# path of a file of permalinks, one per line.  Unset loads nothing.
+pinned_setting = os.environ.get("LEDGEX_PINNED", "")
+
+
+def pinned_searches(setting: str = pinned_setting) -> List[str]:
+    """Return the search part of each pinned permalink.  Lines of a
+    permalink file may be whole permalinks, as copied from the Permalink
+    link, or just their search; blank lines and # comments are skipped."""
+    if not setting:
+        return []
+    if setting == "examples":
+        lines = example_permalinks
+    else:
+        with open(setting) as pinned_file:
+            lines = [line.strip() for line in pinned_file]
+    return [line.split("?", 1)[-1] for line in lines if line and not line.startswith("#")]
+
+
+def warm(search: str, progress: Callable = None):
+    """Load the dataset of a permalink's search as a visit would, and
+    keep every stage: the files it fetches and the dataset they are
+    converted into, pinned in loading.py, and the dataset and the cube
+    of each account filter the tabs use, in the shared store and this
+    process's memo.  The stages only match a visit's, and so are only
+    found again, because each one is computed here the same way."""
+    inputs = Params.le_parse_qs(search)
+    loaded = {}
+    for source in ["transu", "atreeu", "erasu"]:
+        url = inputs.get(source)
+        if not url:
+            continue
+        result = load_input_file(url=url, progress=progress)
+        if len(result[1]) == 0:
+            # don't pin a failure, so a visit tries again
+            raise LoadError(result[2])
+        pinned_files[url] = result
+        loaded[source] = result[1].to_json()
+    # as load_and_transform does, with no input from the Data Source tab
+    params = Params.from_dict(inputs)
+    params.fill_defaults()
+    key = encode_key(loaded.get("transu"), loaded.get("atreeu"), loaded.get("erasu"), params)
+    pinned_datasets[key] = encode_dataset(
+        loaded.get("transu"), loaded.get("atreeu"), loaded.get("erasu"), params, progress
+    )
+    data, _ = pinned_datasets[key]
+    # the tabs read params back from param_store, and filter with them
+    params = Params.from_json(params.to_json())
+    for filter in [[], params.pe_roots, params.cu_roots]:
+        dstore = Datastore.from_json(data, filter)
+        dstore.rangesum()
+
+
+def warm_pinned(setting: str = pinned_setting) -> int:
+    """Warm every pinned dataset, and return how many loaded.  Run at
+    boot, before the server takes traffic: in the gunicorn master with
+    --preload, so that forked workers share its memory copy-on-write,
+    or else in each worker as it starts.  A pinned dataset that fails
+    to load is logged and skipped, and is loaded by visits as usual."""
+    warmed = 0
+    for search in pinned_searches(setting):
+        try:
+            warm(search, progress=app.logger.info)
+            warmed += 1
+        except Exception as E:
+            app.logger.warning(f"Could not load pinned dataset {search[:200]}: {E}")
+    return warmed
@@ -0,0 +1,52 @@
+"""Benchmark of parallel aggregation on a synthetic ledger.
+
+Times building a cube's day cells (see parallel.sum_by_key) with 1 to N
+worker processes, for each of a few ledger sizes, so that the smallest
+ledger the pool speeds up, CONST["parallel_min_rows"], can be read off
+it.  Run from the repository root:
+
+    python tests/bench_parallel.py --rows 500000 1000000 2000000 10000000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ledgex"))
+
+from parallel import sum_by_key  # noqa: E402
+
+
+def synthetic_ledger(rows: int, accounts: int = 10_000, days: int = 20 * 365, seed: int = 0):
+    """ Return the (account code, day) keys and amounts of a random ledger """
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, accounts, rows)
+    day = np.sort(rng.integers(0, days, rows))  # ledgers are mostly in date order
+    return codes * days + day, rng.normal(0, 100, rows).round(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[500_000, 1_000_000, 2_000_000, 10_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, os.cpu_count()])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPUs")
+    for rows in args.rows:
+        key, amounts = synthetic_ledger(rows)
+        baseline = None
+        for n_workers in sorted(set(args.workers)):
+            sum_by_key(key[:1000], amounts[:1000], min_rows=0, n_workers=n_workers)  # start the pool
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                sum_by_key(key, amounts, min_rows=0, n_workers=n_workers)
+                times.append(time.perf_counter() - start)
+            best = min(times)
+            baseline = baseline or best
+            print(f"{rows:12,d} rows, {n_workers:3d} workers: {best:7.3f} s  speedup {baseline / best:5.2f}×")
+
+if __name__ == "__main__":
+    main()
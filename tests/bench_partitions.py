@@ -0,0 +1,93 @@
+"""Benchmark of an out-of-core ledger on a synthetic CSV.
+
+Writes a ledger of --rows transactions (one split per row, in date
+order) to a CSV, ingests it into partitions (see partitions.py), builds
+its cube and reads a page of one account's transactions, printing the
+time and the peak memory (RSS) of this process after each stage.  Peak
+memory should stay near the size of one chunk and of the cube, however
+many rows there are.  Run from the repository root:
+
+    python tests/bench_partitions.py --rows 50000000
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ledgex"))
+
+from params import Params  # noqa: E402
+from partitions import PartitionedLedger  # noqa: E402
+from rangesum import RangeSum  # noqa: E402
+from selection import Selection  # noqa: E402
+
+
+def write_ledger(path: str, rows: int, accounts: int = 1_000, years: int = 20, chunk_rows: int = 250_000):
+    """ Write a random ledger in Gnucash's export format, a chunk at a time """
+    rng = np.random.default_rng(0)
+    names = np.array(
+        [f"{['Assets', 'Expenses', 'Income', 'Liabilities'][i % 4]}:Group {i % 37}:Account {i}" for i in range(accounts)]
+    )
+    first_day = np.datetime64("2000-01-01", "D")
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        # rows are in date order, spread evenly over the years
+        days = np.arange(start, start + n) * (years * 365) // rows
+        account = rng.integers(0, accounts, n)
+        pd.DataFrame(
+            {
+                "Date": (first_day + days).astype(str),
+                "Description": np.char.add("payee ", rng.integers(0, 10_000, n).astype(str)),
+                "Full Account Name": names[account],
+                "Account Name": np.char.add("Account ", account.astype(str)),
+                "Amount Num.": rng.integers(-50_000, 50_000, n),
+            }
+        ).to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def peak_mb() -> float:
+    """ Peak RSS of this process so far, in MB (ru_maxrss is in KB on Linux) """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--dir", default=None, help="where to write the CSV and partitions; a temporary directory by default")
+    args = parser.parse_args()
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_partitions")
+    csv_path = os.path.join(directory, "ledger.csv")
+    try:
+        write_ledger(csv_path, args.rows)
+        print(f"{args.rows:,} rows written, {os.path.getsize(csv_path) / 2 ** 20:,.0f} MB, peak {peak_mb():,.0f} MB")
+        params = Params()
+        params.fill_defaults()
+        stages = []
+        start = time.perf_counter()
+        ledger = PartitionedLedger.ingest(csv_path, os.path.join(directory, "parts"), params, args.chunk_rows)
+        stages.append(("ingest", time.perf_counter() - start))
+        start = time.perf_counter()
+        cube = ledger.cube(ledger.account_tree())
+        cube.cells("month")
+        stages.append(("cube", time.perf_counter() - start))
+        start = time.perf_counter()
+        selection = Selection.from_pairs(cube, ["Expenses"], ["2010-01-01"], ["2011-12-31"])
+        page, _, total = ledger.page(selection, RangeSum(cube), 100, 20)
+        stages.append(("page", time.perf_counter() - start))
+        for stage, seconds in stages:
+            print(f"{stage:>8}: {seconds:8.2f} s")
+        print(f"{total:,} rows selected; peak RSS {peak_mb():,.0f} MB")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
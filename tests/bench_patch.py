@@ -0,0 +1,105 @@
+"""Response sizes of partial figure updates.
+
+Loads the sample ledger and posts callback requests to the app, as the
+browser would, printing the size of each JSON response: the Periodic
+tab's bar chart redrawn for a new resolution, against a change of the
+selected dates, which only patches the bars' selectedpoints; and the
+Explore tab's drill-down charts, where a selection in the top chart
+patches that chart's colors in place of re-sending its figure, and
+replaces only the charts below it.  Run from the repository root:
+
+    python tests/bench_patch.py
+"""
+import argparse
+import json
+import os
+import sys
+import warnings
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ledgex"))
+
+import index  # noqa: E402, F401  (registers the callbacks)
+from app import app  # noqa: E402
+from loading import convert_raw_data  # noqa: E402
+from params import Params  # noqa: E402
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+def post(client, outputs: list, inputs: list, state: list, changed: list) -> dict:
+    """Post one request for a callback with a list of outputs, and
+    return its response and size in bytes"""
+    output = "...".join(f"{x['id']}.{x['property']}" for x in outputs)
+    body = {
+        "output": f"..{output}..",
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": state,
+        "changedPropIds": changed,
+    }
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200, response.data[:500]
+    return response.json, len(response.data)
+
+
+def prop(id, property: str, value=None) -> dict:
+    return {"id": id, "property": property, "value": value}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transactions", default=os.path.join(tests_dir, "sample_transaction_data.csv"))
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+    params = Params(pe_roots=["Income", "Expenses"])
+    params.fill_defaults()
+    raw = pd.read_csv(args.transactions, thousands=",", low_memory=False)
+    trans, atree, eras = convert_raw_data(raw, pd.DataFrame(), pd.DataFrame(), params)
+    data_store = json.dumps({"trans": trans.to_json(), "atree": atree.to_json(), "eras": eras.to_json()})
+    stores = [prop("data_store", "children", data_store), prop("param_store", "children", params.to_json())]
+    client = app.server.test_client()
+    print(f"{len(trans):,} transactions")
+
+    def master(changed: str) -> int:
+        inputs = [
+            prop("pe_time_series_resolution", "value", "month"),
+            prop("pe_time_series_span", "value", "total"),
+            prop("pe_date_range", "start_date", str(trans["date"].min().date())),
+            prop("pe_date_range", "end_date", str(trans["date"].quantile(0.5).date())),
+            prop("pe_zoom_store", "data"),
+        ]
+        return post(client, [{"id": "pe_master_time_series", "property": "figure"}], inputs, stores, [changed])[1]
+
+    full, patch = master("pe_time_series_resolution.value"), master("pe_date_range.start_date")
+    print(f"Periodic bars: figure {full:>9,d} bytes, selected dates patch {patch:>9,d} bytes ({full / patch:,.0f}x)")
+
+    def explore(selected: list, figures: list, changed: str):
+        outputs = [{"id": "ex_wrapper", "property": "children"}, {"id": "ex_account_store", "property": "data"}]
+        charts = [{"id": {"type": "ex_chart", "index": i}, "property": "selectedData", "value": x}
+                  for i, x in enumerate(selected)]
+        figure_state = [{"id": {"type": "ex_chart", "index": i}, "property": "figure", "value": x}
+                        for i, x in enumerate(figures)]
+        return post(client, outputs, [prop("ex_dummy", "children", "getstarted"), charts], [figure_state] + stores,
+                    [changed])
+
+    def select(figures: list, level: int):
+        """ Select the biggest bar of a drill chart, which is last """
+        point = len(figures[level]["data"][0]["customdata"]) - 1
+        selected = [None] * len(figures)
+        selected[level] = {"points": [{"pointNumber": point}]}
+        return explore(selected, figures, json.dumps({"index": level, "type": "ex_chart"}, separators=(",", ":"))
+                       + ".selectedData")
+
+    response, top = explore([], [], "ex_dummy.children")
+    figures = [x["props"]["figure"] for x in response["response"]["ex_wrapper"]["children"][:-1]]
+    response, patch = select(figures, 0)
+    operations = response["response"]["ex_wrapper"]["children"]["operations"]
+    recolor = len(json.dumps([x for x in operations if x["operation"] in ["Assign", "Merge"]]))
+    print(f"Drill charts:  top chart selected {patch:>9,d} bytes, recoloring it {recolor:,d} bytes "
+          f"instead of its figure's {len(json.dumps(figures[0])):,d}; drawn from the top {top:,d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark of the SQLite backend against in-memory pandas.
+
+For each --rows, writes a synthetic ledger CSV (see bench_partitions.py)
+and, in a fresh process for each backend, loads it, builds its cube,
+and counts and pages one account's transactions over two years, printing
+the time of each stage and the peak memory (RSS) of the process.
+Run from the repository root:
+
+    python tests/bench_sqlstore.py --rows 1000000 10000000
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ledgex"))
+
+from bench_partitions import write_ledger  # noqa: E402
+from cube import Cube  # noqa: E402
+from loading import convert_raw_data  # noqa: E402
+from params import Params  # noqa: E402
+from rangesum import RangeSum  # noqa: E402
+from selection import Selection  # noqa: E402
+from sqlstore import SqlLedger  # noqa: E402
+
+DATES = (["2010-01-01"], ["2011-12-31"])
+PAGE = 100
+
+
+def run_pandas(csv_path: str, directory: str, params: Params) -> list:
+    stages = []
+    start = time.perf_counter()
+    raw = pd.read_csv(csv_path, thousands=",", low_memory=False)
+    trans, tree, _ = convert_raw_data(raw, pd.DataFrame(), pd.DataFrame(), params)
+    del raw
+    stages.append(("load", time.perf_counter() - start))
+    start = time.perf_counter()
+    cube = Cube(trans, tree)
+    cube.cells("month")
+    stages.append(("cube", time.perf_counter() - start))
+    start = time.perf_counter()
+    selection = Selection.from_pairs(cube, ["Expenses"], *DATES)
+    selection.count(RangeSum(cube))
+    selection.rows().sort_values("date", kind="stable").iloc[PAGE * 20:PAGE * 20 + 20]
+    stages.append(("page", time.perf_counter() - start))
+    return stages
+
+
+def run_sqlite(csv_path: str, directory: str, params: Params) -> list:
+    stages = []
+    start = time.perf_counter()
+    ledger = SqlLedger.ingest(csv_path, os.path.join(directory, "ledger.sqlite"), params)
+    stages.append(("load", time.perf_counter() - start))
+    start = time.perf_counter()
+    cube = ledger.cube(ledger.account_tree())
+    cube.cells("month")
+    stages.append(("cube", time.perf_counter() - start))
+    start = time.perf_counter()
+    ledger.page(Selection.from_pairs(cube, ["Expenses"], *DATES), None, PAGE, 20)
+    stages.append(("page", time.perf_counter() - start))
+    return stages
+
+
+def measure(backend, csv_path: str, directory: str) -> tuple:
+    """ In a fresh process: run a backend, and return its stages and peak RSS in MB """
+    params = Params()
+    params.fill_defaults()
+    stages = backend(csv_path, directory, params)
+    return stages, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--dir", default=None, help="where to write the CSV and database; a temporary directory by default")
+    args = parser.parse_args()
+    for rows in args.rows:
+        directory = tempfile.mkdtemp(prefix="bench_sqlstore", dir=args.dir)
+        try:
+            csv_path = os.path.join(directory, "ledger.csv")
+            write_ledger(csv_path, rows)
+            print(f"{rows:,} rows")
+            for name, backend in [("pandas", run_pandas), ("sqlite", run_sqlite)]:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    stages, peak = pool.submit(measure, backend, csv_path, directory).result()
+                times = "  ".join(f"{stage} {seconds:7.2f} s" for stage, seconds in stages)
+                print(f"  {name:>6}: {times}  peak RSS {peak:,.0f} MB")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
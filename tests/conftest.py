@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.cube import Cube
+
+
+@pytest.fixture
+def tree():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    tree.create_node("Expenses", identifier="Expenses", parent="root")
+    tree.create_node("Food", identifier="Food", parent="Expenses")
+    tree.create_node("Rent", identifier="Rent", parent="Expenses")
+    tree.create_node("Income", identifier="Income", parent="root")
+    return tree
+
+
+@pytest.fixture
+def trans():
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                ["2019-12-30", "2020-01-05", "2020-01-20", "2020-02-01", "2020-04-15", "2020-04-15"]
+            ),
+            "account": ["Food", "Food", "Rent", "Expenses", "Income", "Rent"],
+            "amount": [10, 20, 500, 7, 1000, 500],
+        }
+    )
+
+
+@pytest.fixture
+def cube(trans, tree):
+    return Cube(trans, tree)
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from ledgex.atree import ATree
+from ledgex.burst import Burst
+from ledgex.params import CONST
+
+
+def make_tree():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    for parent, child in [("root", "A"), ("A", "B"), ("B", "C"), ("C", "D"), ("root", "E")]:
+        tree.create_node(child, identifier=child, parent=parent)
+    totals = pd.Series({"D": 10, "C": 5, "E": 7})
+    return Burst.roll_up(tree.append_sums(totals))
+
+
+class TestVisibleFrame:
+    """ The sunburst only gets a few levels below its center """
+
+    def test_depth_limited(self):
+        frame = Burst.visible_frame(make_tree(), depth=2)
+        assert set(frame["id"]) == {"root", "A", "E", "B", "B" + CONST["more_suffix"]}
+        more = frame.set_index("id").loc["B" + CONST["more_suffix"]]
+        assert (more["parent"], more["value"]) == ("B", 15)
+
+    def test_focus(self):
+        frame = Burst.visible_frame(make_tree(), focus="B", depth=2)
+        assert frame["id"].tolist()[:3] == ["root", "A", "B"]
+        assert "E" not in set(frame["id"])
+        assert "D" in set(frame["id"])
+
+    def test_strip_suffixes(self):
+        assert Burst.strip_suffixes("B" + CONST["more_suffix"]) == "B"
+        assert Burst.strip_suffixes("C" + CONST["leaf_suffix"]) == "C"
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.comparison import Comparison, era_days
+from ledgex.cube import Cube
+from ledgex.eras import EraIndex
+from ledgex.params import CONST
+from ledgex.rangesum import RangeSum
+from ledgex.utils import make_delta_sunburst, visible_deltas
+
+
+@pytest.fixture
+def comparison(tree):
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2019-03-01", "2019-05-01", "2020-03-01", "2020-05-01", "2020-06-01"]),
+            "account": ["Food", "Rent", "Food", "Rent", "Income"],
+            "amount": [100, 500, 150, 500, 40],
+        }
+    )
+    return Comparison(RangeSum(Cube(trans, tree)), ("2019-01-01", "2019-12-31"), ("2020-01-01", "2020-12-31"))
+
+
+class TestComparison:
+    """ Subtree totals of two date ranges, aligned by account """
+
+    def test_deltas(self, comparison):
+        deltas = comparison.frame().set_index("account")
+        assert deltas.loc["Expenses", ["a", "b", "delta"]].tolist() == [600, 650, 50]
+        assert deltas.loc["Food", "percent"] == 50
+        assert np.isnan(deltas.loc["Income", "percent"])
+        assert deltas.loc["Food", "parent"] == "Expenses"
+
+    def test_sorted_by_change(self, comparison):
+        assert comparison.frame()["account"].tolist() == ["root", "Expenses", "Food", "Income", "Rent"]
+
+    def test_roots(self, comparison):
+        deltas = comparison.frame(["Expenses"])
+        assert set(deltas["account"]) == {"Expenses", "Food", "Rent"}
+        assert deltas.set_index("account").loc["Expenses", "parent"] == ""
+
+
+class TestDeltaSunburst:
+    """ Only the levels that can be seen are sent """
+
+    def test_depth(self, comparison):
+        shown = visible_deltas(comparison.frame(), depth=1).set_index("account")
+        more = "Expenses" + CONST["more_suffix"]
+        assert set(shown.index) == {"root", "Expenses", "Income", more}
+        # the placeholder is sized by the money moved below Expenses
+        assert shown.loc[more, "own_activity"] == 100 + 500 + 150 + 500
+        assert shown.loc[more, "parent"] == "Expenses"
+        assert shown.loc[more, "delta"] == 50
+
+    def test_focus(self, comparison):
+        deltas = comparison.frame()
+        shown = visible_deltas(deltas, "Expenses", depth=1)
+        assert shown["account"].tolist() == ["root", "Expenses", "Food", "Rent"]
+        figure = make_delta_sunburst(deltas, ("A", "B"), depth=1, focus="Expenses")
+        assert figure.data[0].level == "Expenses"
+        assert list(figure.data[0].ids) == shown["account"].tolist()
+
+
+def test_era_days():
+    eras = EraIndex(pd.DataFrame({"date_start": pd.to_datetime(["2019-01-01", "2020-01-01", "2021-01-01"])}))
+    first, last = (pd.Timestamp(x, unit="D") for x in era_days(eras, 0))
+    assert (first, last) == (pd.Timestamp("2019-01-01"), pd.Timestamp("2019-12-31"))
+    assert pd.Timestamp(era_days(eras, 1)[1], unit="D") == pd.Timestamp("2021-01-01")
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.counterparty import CounterpartyIndex
+from ledgex.cube import Cube
+from ledgex.flows import Flows
+
+
+@pytest.fixture
+def index():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    for parent, child in [
+        ("root", "Assets"),
+        ("Assets", "Checking"),
+        ("Assets", "Cash"),
+        ("root", "Income"),
+        ("Income", "Salary"),
+        ("root", "Expenses"),
+        ("Expenses", "Food"),
+    ]:
+        tree.create_node(child, identifier=child, parent=parent)
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-01"] * 2 + ["2020-02-05"] * 2 + ["2020-02-07"] * 2),
+            "account": ["Checking", "Salary", "Checking", "Food", "Cash", "Checking"],
+            "amount": [1000, 1000, -100, -100, 50, -50],
+            "transaction id": ["a", "a", "b", "b", "c", "c"],
+        }
+    )
+    return CounterpartyIndex(Flows(Cube(trans, tree), trans["transaction id"]))
+
+
+class TestCounterparty:
+    """ Each account's money comes from and goes to its counter-accounts """
+
+    def test_totals(self, index):
+        assert index.totals("Checking").to_dict() == {"Salary": 1000, "Food": -100, "Cash": -50}
+
+    def test_subtree_skips_internal_transfers(self, index):
+        assert index.totals("Assets").to_dict() == {"Salary": 1000, "Food": -100}
+        assert index.totals("Assets", depth=1).to_dict() == {"Income": 1000, "Expenses": -100}
+
+    def test_dates(self, index):
+        assert index.totals("Checking", start="2020-02-01", end="2020-02-06").to_dict() == {"Food": -100}
+
+    def test_by_period(self, index):
+        table = index.by_period("Checking", "month")
+        assert list(table.columns) == ["2020-01", "2020-02"]
+        assert table.loc["Salary"].tolist() == [1000, 0]
+        assert table.loc["Cash"].tolist() == [0, -50]
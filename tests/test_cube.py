@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.cube import Cube, LError
+from ledgex.eras import EraIndex
+
+
+class TestCodes:
+    """ Accounts are numbered in preorder, so subtrees are contiguous """
+
+    def test_subtree_range(self, cube):
+        lo, hi = cube.account_range("Expenses")
+        assert sorted(cube.ids[lo:hi]) == ["Expenses", "Food", "Rent"]
+
+    def test_shallow_range(self, cube):
+        lo, hi = cube.account_range("Expenses", deep=False)
+        assert cube.ids[lo:hi] == ["Expenses"]
+
+    def test_missing_account(self, cube):
+        with pytest.raises(LError):
+            cube.account_range("Nonexistent")
+
+
+class TestSeries:
+    """ Totals by period for an account, with or without descendents """
+
+    def test_month_deep(self, cube):
+        series = cube.series("Expenses", "month")
+        assert series["label"].tolist() == ["2019-12", "2020-01", "2020-02", "2020-03", "2020-04"]
+        assert series["value"].tolist() == [10, 520, 7, 0, 500]
+        assert series["active"].tolist() == [True, True, True, False, True]
+
+    def test_month_shallow(self, cube):
+        series = cube.series("Expenses", "month", deep=False)
+        assert series["value"].tolist() == [0, 0, 7, 0, 0]
+
+    def test_first_last(self, cube):
+        series = cube.series("Food", "year")
+        assert series["first"].tolist() == [
+            np.datetime64("2019-12-30", "D").astype(np.int64),
+            np.datetime64("2020-01-05", "D").astype(np.int64),
+        ]
+
+    def test_decade(self, cube):
+        series = cube.series("root", "decade")
+        assert series["label"].tolist() == ["2010", "2020"]
+        assert series["value"].tolist() == [10, 2027]
+
+    @pytest.mark.parametrize("resolution", ["day", "week", "month", "quarter", "year"])
+    def test_matches_resample(self, cube, trans, resolution):
+        freq = {"day": "D", "week": "W", "month": "M", "quarter": "Q", "year": "A"}[resolution]
+        expected = trans.set_index("date").resample(freq).sum(numeric_only=True)["amount"]
+        assert cube.series("root", resolution)["value"].tolist() == expected.tolist()
+
+    def test_rows(self, cube):
+        assert cube.rows("Expenses")["amount"].sum() == 1037
+        assert len(cube.rows("Income")) == 1
+
+
+class TestChildrenSeries:
+    """ One pass over the cube gives the same totals as one series per child """
+
+    def test_matches_series(self, cube):
+        children = cube.children_series("root", "month")
+        assert list(children.keys()) == ["Expenses", "Income"]
+        for child, series in children.items():
+            expected = cube.series(child, "month")
+            assert series["value"].tolist() == expected["value"].tolist()
+            assert series["first"].tolist() == expected["first"].tolist()
+
+    def test_own_cells_excluded(self, cube):
+        children = cube.children_series("Expenses", "month")
+        assert sum(series["value"].sum() for series in children.values()) == 1030
+
+    def test_leaf(self, cube):
+        assert cube.children_series("Food", "month") == {}
+
+
+class TestEras:
+    """ Eras are one more resolution of the cube """
+
+    def test_era_series(self, trans, tree):
+        eras = pd.DataFrame(
+            {"date_start": pd.to_datetime(["2019-01-01", "2020-01-20", "2020-12-31"])},
+            index=pd.Index(["early", "late", "After"], name="name"),
+        )
+        cube = Cube(trans, tree, EraIndex(eras))
+        series = cube.series("Expenses", "era")
+        assert series["label"].tolist() == ["early", "late"]
+        assert series["value"].tolist() == [30, 1007]
+
+
+class TestWindow:
+    """ Series can be limited to the periods overlapping a date window """
+
+    def test_series_window(self, cube):
+        series = cube.series("Expenses", "month", start="2020-01-15", end="2020-02-10")
+        assert series["label"].tolist() == ["2020-01", "2020-02"]
+        assert series["value"].tolist() == [520, 7]
+
+    def test_opening(self, cube):
+        children, summary = cube.children_summary("Expenses", "month", start="2020-02-01")
+        assert children == ["Food", "Rent"]
+        assert summary["opening"].tolist() == [30, 500]
+        assert summary["value"].shape == (2, 3)
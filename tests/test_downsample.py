@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from ledgex.downsample import bucket_series, decimate_points, lttb
+
+
+class TestLTTB:
+    """ Largest-Triangle-Three-Buckets keeps the shape of a line """
+
+    def test_short_line_unchanged(self):
+        assert lttb(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+    def test_keeps_ends_and_spike(self):
+        y = np.zeros(1000)
+        y[437] = 50
+        kept = lttb(np.arange(1000), y, 20)
+        assert len(kept) == 20
+        assert kept[0] == 0 and kept[-1] == 999
+        assert 437 in kept
+        assert (np.diff(kept) > 0).all()
+
+    def test_matrix_matches_rows(self):
+        rng = np.random.default_rng(0)
+        y = np.cumsum(rng.normal(size=(3, 500)), axis=1)
+        kept = lttb(np.arange(500), y, 50)
+        for row in range(3):
+            assert kept[row].tolist() == lttb(np.arange(500), y[row], 50).tolist()
+
+
+class TestBucketSeries:
+    """ Bars are combined into runs of periods, preserving totals and extremes """
+
+    def series(self, n):
+        start = pd.date_range("2020-01-01", periods=n, freq="D")
+        return pd.DataFrame(
+            {
+                "label": start.strftime("%Y-%m-%d"),
+                "start": start,
+                "end": start,
+                "value": np.arange(n, dtype=float),
+                "first": np.arange(n),
+                "last": np.arange(n),
+                "active": True,
+            }
+        )
+
+    def test_under_budget(self):
+        series = self.series(10)
+        assert bucket_series(series, 10) is series
+
+    def test_buckets(self):
+        buckets = bucket_series(self.series(10), 4)
+        assert buckets["label"].tolist() == [
+            "2020-01-01/2020-01-03",
+            "2020-01-04/2020-01-06",
+            "2020-01-07/2020-01-09",
+            "2020-01-10",
+        ]
+        assert buckets["value"].sum() == 45
+        assert buckets["low"].tolist() == [0, 3, 6, 9]
+        assert buckets["high"].tolist() == [2, 5, 8, 9]
+
+
+class TestDecimatePoints:
+    """ Decimated scatter plots keep outliers and extremes """
+
+    def test_small_unchanged(self):
+        assert decimate_points(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+    def test_budget_and_outliers(self):
+        rng = np.random.default_rng(0)
+        x = rng.integers(0, 1000, 10000)
+        y = rng.normal(0, 10, 10000)
+        y[1234] = 5000
+        y[4321] = -5000
+        kept = decimate_points(x, y, 400)
+        assert len(kept) <= 400
+        assert 1234 in kept and 4321 in kept
+        assert (np.diff(kept) > 0).all()
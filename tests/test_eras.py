@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.eras import EraIndex, LError
+
+
+@pytest.fixture
+def eras():
+    eras = pd.DataFrame(
+        {
+            "name": ["After", "first job", "stipend", "security guard"],
+            "date_start": pd.to_datetime(["2020-09-29", "2015-12-31", "2018-01-01", "2018-09-01"]),
+        }
+    )
+    return eras.set_index("name")
+
+
+def days(*dates):
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+class TestEraIndex:
+    """ Eras are sorted boundaries; the last row only closes the last era """
+
+    def test_labels(self, eras):
+        assert EraIndex(eras).labels == ["first job", "stipend", "security guard"]
+
+    def test_era_of(self, eras):
+        index = EraIndex(eras)
+        assert index.era_of(
+            days("2015-12-30", "2015-12-31", "2017-12-31", "2018-01-01", "2020-09-29", "2020-09-30")
+        ).tolist() == [-1, 0, 0, 1, 2, -1]
+
+    def test_date_range(self, eras):
+        index = EraIndex(eras)
+        era = index.era_of_date("2018-05-05")
+        assert index.labels[era] == "stipend"
+        assert index.date_range(era) == (np.datetime64("2018-01-01"), np.datetime64("2018-09-01"))
+
+    def test_outside(self, eras):
+        with pytest.raises(LError):
+            EraIndex(eras).era_of_date("1999-01-01")
+
+    def test_months(self, eras):
+        assert EraIndex(eras).months[1] == pytest.approx(8, abs=0.05)
+
+    def test_empty(self):
+        index = EraIndex(pd.DataFrame())
+        assert len(index) == 0
+        assert index.era_of(days("2020-01-01")).tolist() == [-1]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.datastore import Datastore
+from ledgex.filterquery import Clause, compile_query, query_mask
+
+
+@pytest.fixture
+def dstore():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    tree.create_node("Food", identifier="Food", parent="root")
+    tree.create_node("Rent", identifier="Rent", parent="root")
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-05", "2020-01-01", "2020-02-01", "2020-03-01", "2020-01-03"]),
+            "account": ["Food", "Rent", "Food", "Rent", "Food"],
+            "description": ["lunch", "January rent", "dinner", None, "Lunch && more"],
+            "amount": [10, 500, 30, 500, 12],
+        }
+    )
+    return Datastore(trans=trans, eras=pd.DataFrame(), account_tree=tree)
+
+
+def matches(dstore, query, positions=range(5)):
+    positions = np.array(positions)
+    return positions[query_mask(dstore, positions, query)].tolist()
+
+
+class TestCompileQuery:
+    """ Filter queries from Dash DataTables are parsed into clauses """
+
+    def test_clauses(self):
+        assert compile_query('{amount} > 100 && {description} icontains "a && b"') == (
+            Clause("amount", "gt", "100"),
+            Clause("description", "contains", "a && b", case=False),
+        )
+
+    def test_blank_and_unknown(self):
+        assert compile_query("{description} is not blank && {amount} ~ 3") == (
+            Clause("description", "blank", negate=True),
+        )
+
+    def test_cached(self):
+        assert compile_query("{amount} = 3") is compile_query("{amount} = 3")
+
+
+class TestQueryMask:
+    """ Filter queries select the same rows as pandas would """
+
+    def test_numbers(self, dstore):
+        assert matches(dstore, "{amount} > 20") == [1, 2, 3]
+        assert matches(dstore, "{amount} = 500", [3, 4]) == [3]
+
+    def test_text(self, dstore):
+        assert matches(dstore, '{description} contains "unch"') == [0, 4]
+        assert matches(dstore, '{description} contains "lunch"') == [0]
+        assert matches(dstore, '{description} icontains "LUNCH"') == [0, 4]
+        assert matches(dstore, '{description} contains "one"') == []
+        assert matches(dstore, "{description} is blank") == [3]
+        assert matches(dstore, "{account} = Rent && {amount} >= 500") == [1, 3]
+
+    def test_dates(self, dstore):
+        assert matches(dstore, '{date} datestartswith "2020-01"') == [0, 1, 4]
+        assert matches(dstore, '{date} datestartswith "2020"') == [0, 1, 2, 3, 4]
+        assert matches(dstore, "{date} >= 2020-01-05") == [0, 2, 3]
+
+    def test_bad_values_match_everything(self, dstore):
+        assert matches(dstore, '{date} > "soon" && {nonexistent} = 3') == [0, 1, 2, 3, 4]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.cube import Cube
+from ledgex.flows import Flows
+
+
+@pytest.fixture
+def flows():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    for parent, child in [
+        ("root", "Assets"),
+        ("Assets", "Checking"),
+        ("Assets", "Cash"),
+        ("root", "Income"),
+        ("Income", "Salary"),
+        ("root", "Expenses"),
+        ("Expenses", "Food"),
+        ("Expenses", "Rent"),
+    ]:
+        tree.create_node(child, identifier=child, parent=parent)
+    # amounts as loaded: Income and Expenses descendents have their signs flipped
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-01"] * 2 + ["2020-01-05"] * 3 + ["2020-02-01"] * 2),
+            "account": ["Checking", "Salary", "Checking", "Food", "Rent", "Cash", "Checking"],
+            "amount": [1000, 1000, -600, -100, -500, 50, -50],
+            "transaction id": ["a", "a", "b", "b", "b", "c", "c"],
+        }
+    )
+    return Flows(Cube(trans, tree), trans["transaction id"])
+
+
+def cells(flows, **kwargs):
+    source, target, value = flows.matrix(**kwargs)
+    return {(flows.cube.ids[s], flows.cube.ids[t]): v for s, t, v in zip(source, target, value)}
+
+
+class TestFlows:
+    """ Each transaction's splits become flows from the accounts paying to the accounts paid """
+
+    def test_pairs(self, flows):
+        assert cells(flows) == {
+            ("Salary", "Checking"): 1000,
+            ("Checking", "Food"): 100,
+            ("Checking", "Rent"): 500,
+            ("Checking", "Cash"): 50,
+        }
+
+    def test_rollup(self, flows):
+        assert cells(flows, depth=1) == {("Income", "Assets"): 1000, ("Assets", "Expenses"): 600}
+
+    def test_dates_and_roots(self, flows):
+        assert cells(flows, start="2020-01-02", end="2020-01-31") == {
+            ("Checking", "Food"): 100,
+            ("Checking", "Rent"): 500,
+        }
+        assert cells(flows, roots=["Assets"]) == {("Checking", "Cash"): 50}
+
+    def test_ancestors(self, flows):
+        ids = flows.cube.ids
+        assert [ids[x] for x in flows.ancestors(1)[[flows.cube.code["Food"], flows.cube.code["Income"]]]] == [
+            "Expenses",
+            "Income",
+        ]
+        assert np.array_equal(flows.ancestors(5), np.arange(len(ids)))
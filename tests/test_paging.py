@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.datastore import Datastore
+from ledgex.paging import client_rows, table_page
+
+
+@pytest.fixture
+def dstore():
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    tree.create_node("Food", identifier="Food", parent="root")
+    tree.create_node("Rent", identifier="Rent", parent="root")
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-05", "2020-01-01", "2020-02-01", "2020-03-01", "2020-01-03"]),
+            "account": ["Food", "Rent", "Food", "Rent", "Food"],
+            "description": ["lunch", "January rent", "dinner", "March rent", "Lunch"],
+            "amount": [10, 500, 30, 500, 12],
+        }
+    )
+    return Datastore(trans=trans, eras=pd.DataFrame(), account_tree=tree)
+
+
+class TestTablePage:
+    """ Only one page of the selected, filtered, sorted rows is returned """
+
+    def test_date_order(self, dstore):
+        records, page, total = table_page(dstore, np.arange(5), 0, 2, None, None, "$")
+        assert [x["date"] for x in records] == ["2020-01-01", "2020-01-03"]
+        assert (page, total) == (0, 5)
+
+    def test_sort_filter_page(self, dstore):
+        sort_by = [{"column_id": "account", "direction": "desc"}, {"column_id": "amount", "direction": "asc"}]
+        records, page, total = table_page(dstore, np.array([0, 2, 3, 4]), 5, 2, sort_by, "{amount} < 400", "$")
+        assert total == 3
+        assert page == 1
+        assert [x["amount"] for x in records] == [30]
+
+
+def test_client_rows(dstore):
+    rows = client_rows(dstore)
+    assert rows["date"] == ["2020-01-01", "2020-01-03", "2020-01-05", "2020-02-01", "2020-03-01"]
+    assert [rows["ids"][code] for code in rows["code"]] == ["Rent", "Food", "Food", "Food", "Rent"]
+    assert rows["amount"] == [500, 12, 10, 30, 500]
+    # each account's subtree is the codes [code, end)
+    assert rows["end"][rows["ids"].index("root")] == len(rows["ids"])
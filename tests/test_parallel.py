@@ -0,0 +1,63 @@
+import numpy as np
+
+from ledgex import parallel
+from ledgex.parallel import CONST, SharedArrays, attach, sum_by_key
+
+
+def test_shared_arrays():
+    arrays = [np.arange(5), np.linspace(0, 1, 3)]
+    with SharedArrays(arrays) as shared:
+        for x, y in zip(arrays, attach(shared.shm, shared.spec)):
+            assert np.array_equal(x, y)
+            del y
+
+
+class TestParallel:
+    """ Aggregates split across the process pool match the in-process ones """
+
+    rng = np.random.default_rng(0)
+    key = rng.integers(0, 50, 1000)
+    weights = rng.normal(0, 10, 1000)
+
+    def test_sum_by_key(self):
+        expected = sum_by_key(self.key, self.weights, min_rows=10 ** 9)
+        result = sum_by_key(self.key, self.weights, min_rows=0, n_workers=3)
+        assert np.array_equal(result[0], expected[0])
+        assert np.allclose(result[1], expected[1])
+        assert np.array_equal(result[2], expected[2])
+        assert result[2].sum() == len(self.key)
+
+    def test_key_ranges(self):
+        ranges = parallel._key_ranges(self.key, 3)
+        assert ranges[0][0] == self.key.min() and ranges[-1][1] == self.key.max() + 1
+        assert all(high == low for (_, high), (low, _) in zip(ranges[:-1], ranges[1:]))
+        sizes = [np.count_nonzero((self.key >= low) & (self.key < high)) for low, high in ranges]
+        assert len(ranges) == 3 and min(sizes) > 250
+        assert len(parallel._key_ranges(np.full(10, 7), 3)) == 1
+
+    def test_pool_per_size(self):
+        pool = parallel._pool(2)
+        assert parallel._pool(2) is pool
+        assert parallel._pool(3) is not pool
+        assert parallel._executor_workers == 3
+
+    def test_crossover(self, monkeypatch):
+        # the pool is used from CONST["parallel_min_rows"] rows, and both paths agree
+        pool, pools = parallel._pool, []
+        monkeypatch.setattr(parallel, "_pool", lambda n_workers: pools.append(n_workers) or pool(n_workers))
+        min_rows = CONST["parallel_min_rows"]
+        key = self.rng.integers(0, 10 ** 6, min_rows)
+        weights = self.rng.normal(0, 10, min_rows)
+        below = sum_by_key(key[1:], weights[1:], n_workers=2)
+        assert pools == []
+        result = sum_by_key(key, weights, n_workers=2)
+        assert pools == [2, 2]
+        expected = sum_by_key(key, weights, n_workers=1)
+        assert np.array_equal(result[0], expected[0]) and np.array_equal(result[2], expected[2])
+        assert np.allclose(result[1], expected[1])
+        assert below[2].sum() == min_rows - 1
+
+    def test_unset_min_rows(self, monkeypatch):
+        monkeypatch.setitem(parallel.CONST, "parallel_min_rows", None)
+        monkeypatch.setattr(parallel, "_pool", None)  # in-process, so never called
+        assert sum_by_key(self.key, self.weights, n_workers=3)[2].sum() == len(self.key)
@@ -0,0 +1,193 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.cube import Cube
+from ledgex.datastore import Datastore
+from ledgex.loading import convert_raw_data
+from ledgex.params import Params
+from ledgex.partitions import LoadError, PartitionedLedger, decode_text, encode_text
+from ledgex.rangesum import RangeSum
+from ledgex.selection import Selection
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+sample_file = os.path.join(tests_dir, "sample_transaction_data.csv")
+minimal_file = os.path.join(tests_dir, "minimal_transaction_data.csv")
+
+
+@pytest.fixture
+def params():
+    result = Params()
+    result.fill_defaults()
+    return result
+
+
+def in_memory(path, params):
+    raw = pd.read_csv(path, thousands=",", low_memory=False)
+    return convert_raw_data(raw, pd.DataFrame(), pd.DataFrame(), params)[:2]
+
+
+def test_splits_across_chunks(tmp_path, params):
+    # every split of the minimal ledger after the first has no date, so
+    # one-row chunks only work if each chunk fills in from the last
+    ledger = PartitionedLedger.ingest(minimal_file, str(tmp_path / "minimal"), params, chunk_rows=1)
+    trans, tree = in_memory(minimal_file, params)
+    assert len(ledger) == len(trans) == 8
+    assert sorted(ledger.meta["parts"]) == ["2017", "2018", "2019", "2020"]
+    expected = Cube(trans, tree).cells("day")
+    cells = ledger.cube(ledger.account_tree()).cells("day")
+    for column in ["code", "period", "amount", "count"]:
+        assert np.array_equal(cells[column], expected[column])
+
+
+def test_cube_and_pages(tmp_path, params):
+    ledger = PartitionedLedger.ingest(sample_file, str(tmp_path / "sample"), params, chunk_rows=97)
+    trans, tree = in_memory(sample_file, params)
+    expected = Cube(trans, tree)
+    cube = ledger.cube(ledger.account_tree())
+    assert len(cube.trans) == 0
+    for resolution in ["month", "year"]:
+        for column in ["code", "period", "amount", "count"]:
+            assert np.array_equal(cube.cells(resolution)[column], expected.cells(resolution)[column])
+
+    dates = (["2016-03-01", "2017-02-01"], ["2018-06-30", "2017-02-28"])
+    rows = (
+        Selection.from_pairs(expected, ["Expenses", "Assets"], *dates).rows().sort_values("date", kind="stable")
+    )
+    selection = Selection.from_pairs(cube, ["Expenses", "Assets"], *dates)
+    for page_current in [0, 7, 1000]:
+        page, page_current, total = ledger.page(selection, RangeSum(cube), page_current, 20)
+        assert total == len(rows)
+        expected_page = rows.iloc[page_current * 20:page_current * 20 + 20]
+        assert list(page["date"]) == list(expected_page["date"])
+        assert list(page["amount"]) == list(expected_page["amount"])
+        assert list(page["description"]) == list(expected_page["description"])
+    # past the end moves back to the last page
+    assert page_current == (len(rows) - 1) // 20
+
+
+def test_page_reads_each_part_once(tmp_path, params):
+    # many rectangles, nested and overlapping, in one vectorized mask
+    ledger = PartitionedLedger.ingest(sample_file, str(tmp_path / "sample"), params, chunk_rows=97)
+    trans, tree = in_memory(sample_file, params)
+    expected = Cube(trans, tree)
+    cube = ledger.cube(ledger.account_tree())
+    days = pd.date_range("2017-01-01", periods=300, freq="2D").strftime("%Y-%m-%d").tolist()
+    accounts = ["Expenses", "Assets"] * 150 + ["Expenses", "Assets"]
+    starts, ends = days + ["2016-06-01", "2017-03-01"], days + ["2017-08-31", "2017-03-31"]
+    rows = Selection.from_pairs(expected, accounts, starts, ends).rows().sort_values("date", kind="stable")
+    loads = []
+    load = ledger.store.load
+    ledger.store.load = lambda *args: loads.append(args) or load(*args)
+    page, page_current, total = ledger.page(Selection.from_pairs(cube, accounts, starts, ends), RangeSum(cube), 5, 20)
+    assert total == len(rows) > 120
+    assert list(page["date"]) == list(rows.iloc[100:120]["date"])
+    assert list(page["description"]) == list(rows.iloc[100:120]["description"])
+    assert len(loads) == len(set(loads))
+
+
+def test_text_rows():
+    values = ["Café", "", "rent", "日本"]
+    text = encode_text(values)
+    assert text["offsets"].dtype == np.int64 and text["blob"].dtype == np.uint8
+    assert list(decode_text(text, np.array([3, 0, 1]))) == ["日本", "Café", ""]
+    assert list(decode_text(encode_text([]), np.array([], dtype=np.int64))) == []
+
+
+def test_filtered_cube(tmp_path, params):
+    ledger = PartitionedLedger.ingest(sample_file, str(tmp_path / "sample"), params)
+    tree = ledger.account_tree()
+    accounts = ["Expenses"] + tree.get_descendent_ids("Expenses")
+    cube = ledger.cube(tree, accounts=accounts)
+    assert cube.series("Income", "year")["value"].sum() == 0
+    assert cube.series("Expenses", "year")["value"].sum() == ledger.cube(tree).series("Expenses", "year")["value"].sum()
+
+
+def test_ingest_needs_empty_directory(tmp_path, params):
+    (tmp_path / "stale").write_text("")
+    with pytest.raises(LoadError):
+        PartitionedLedger.ingest(minimal_file, str(tmp_path), params)
+    with pytest.raises(LoadError):
+        PartitionedLedger.open("../elsewhere")
+
+
+def test_partitioned_datastore(tmp_path, params, monkeypatch):
+    # Datastore opens ledgers by name through the partitions module it imported
+    monkeypatch.setattr("partitions.partitions_dir", str(tmp_path))
+    ledger = PartitionedLedger.ingest(sample_file, str(tmp_path / "sample"), params)
+    data = {"partitions": "sample", "ingested": ledger.meta["ingested"], "atree": ledger.account_tree().to_json()}
+    dstore = Datastore.from_json(json.dumps(data))
+    assert len(dstore) == len(ledger)
+    assert len(dstore.presentation("$")) == 0
+    assert len(dstore.flows()) == 0
+    assert dstore.cube().series("Expenses", "year")["value"].sum() != 0
+
+
+def callback(client, outputs, inputs: list, state: list, changed: str) -> dict:
+    """Post a request for a callback, as the browser would, and return
+    its response.  outputs is a list for a callback with a list of
+    outputs, or else its one output."""
+    if isinstance(outputs, list):
+        output = "...".join(f"{x['id']}.{x['property']}" for x in outputs)
+        output = f"..{output}.."
+    else:
+        output = f"{outputs['id']}.{outputs['property']}"
+    body = {"output": output, "outputs": outputs, "inputs": inputs, "state": state, "changedPropIds": [changed]}
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200, response.data[:500]
+    return response.json["response"]
+
+
+def test_partitioned_explore(tmp_path, params, monkeypatch):
+    from ledgex import index
+
+    monkeypatch.setattr("partitions.partitions_dir", str(tmp_path))
+    ledger = PartitionedLedger.ingest(sample_file, str(tmp_path / "sample"), params)
+    data = {"partitions": "sample", "ingested": ledger.meta["ingested"], "atree": ledger.account_tree().to_json()}
+    stores = [
+        {"id": "data_store", "property": "children", "value": json.dumps(data)},
+        {"id": "param_store", "property": "children", "value": params.to_json()},
+    ]
+    client = index.app.server.test_client()
+
+    table = [{"id": "ex_trans_table", "property": x} for x in ["data", "page_count", "page_current"]]
+    table.append({"id": "ex_trans_table_text", "property": "children"})
+
+    def search(value):
+        inputs = [
+            {"id": "ex_search", "property": "value", "value": value},
+            {"id": "ex_account_store", "property": "data", "value": "Expenses"},
+            {"id": "ex_trans_table", "property": "page_current", "value": 0},
+            {"id": "ex_trans_table", "property": "page_size", "value": 20},
+            {"id": "ex_trans_table", "property": "sort_by", "value": []},
+            {"id": "ex_trans_table", "property": "filter_query", "value": ""},
+        ]
+        return callback(client, table, inputs, stores, "ex_search.value")
+
+    # the table pages from the partitions, as on the Periodic tab
+    response = search("")
+    rows = response["ex_trans_table"]["data"]
+    assert len(rows) == 20 and all(x["account"] for x in rows)
+    assert response["ex_trans_table_text"]["children"].endswith("records in Expenses")
+    assert not response["ex_trans_table_text"]["children"].startswith("0 ")
+    # search needs the text index, which an out-of-core ledger hasn't got
+    response = search("rent")
+    assert response["ex_trans_table"]["data"] == []
+    assert "out-of-core" in response["ex_trans_table_text"]["children"]
+
+    # the dot chart stays a graph, and the note goes in ex_dot_text
+    inputs = [
+        {"id": "ex_dot_chart", "property": "clickData", "value": None},
+        {"id": "ex_account_store", "property": "data", "value": "Expenses"},
+    ]
+    response = callback(
+        client, {"id": "ex_dot_text", "property": "children"}, inputs, stores, "ex_account_store.data"
+    )
+    assert "out-of-core" in response["ex_dot_text"]["children"]
+    inputs = [{"id": "ex_dummy", "property": "children", "value": "getstarted"}, []]
+    outputs = [{"id": "ex_wrapper", "property": "children"}, {"id": "ex_account_store", "property": "data"}]
+    charts = callback(client, outputs, inputs, [[]] + stores, "ex_dummy.children")["ex_wrapper"]["children"]
+    assert charts[-1]["type"] == "Graph" and charts[-1]["props"]["id"] == "ex_dot_chart"
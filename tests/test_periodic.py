@@ -0,0 +1,50 @@
+import json
+import os
+
+import pandas as pd
+
+from ledgex import index
+from ledgex.loading import convert_raw_data
+from ledgex.params import Params
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+sample_file = os.path.join(tests_dir, "sample_transaction_data.csv")
+
+
+def master_figure(client, data_store: str, params: Params, changed: str) -> dict:
+    """ Post a request for the Periodic tab's bar chart, as the browser would """
+    inputs = [
+        {"id": "pe_time_series_resolution", "property": "value", "value": "year"},
+        {"id": "pe_time_series_span", "property": "value", "value": "total"},
+        {"id": "pe_date_range", "property": "start_date", "value": "2016-01-01"},
+        {"id": "pe_date_range", "property": "end_date", "value": "2017-12-31"},
+        {"id": "pe_zoom_store", "property": "data", "value": None},
+    ]
+    state = [
+        {"id": "data_store", "property": "children", "value": data_store},
+        {"id": "param_store", "property": "children", "value": params.to_json()},
+    ]
+    body = {
+        "output": "..pe_master_time_series.figure..",
+        "outputs": [{"id": "pe_master_time_series", "property": "figure"}],
+        "inputs": inputs,
+        "state": state,
+        "changedPropIds": [changed],
+    }
+    response = client.post("/_dash-update-component", json=body)
+    assert response.status_code == 200
+    return response.json["response"]["pe_master_time_series"]["figure"]
+
+
+def test_bars_follow_the_unit():
+    params = Params(pe_roots=["Income", "Expenses"])
+    params.fill_defaults()
+    raw = pd.read_csv(sample_file, thousands=",", low_memory=False)
+    trans, atree, eras = convert_raw_data(raw, pd.DataFrame(), pd.DataFrame(), params)
+    data_store = json.dumps({"trans": trans.to_json(), "atree": atree.to_json(), "eras": eras.to_json()})
+    client = index.app.server.test_client()
+    dollars = master_figure(client, data_store, params, "pe_time_series_resolution.value")
+    params.unit = "€"
+    euros = master_figure(client, data_store, params, "pe_time_series_resolution.value")
+    assert all("$" in x for x in dollars["data"][0]["text"])
+    assert all("€" in x and "$" not in x for x in euros["data"][0]["text"])
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from ledgex.presentation import Presentation, format_amounts
+
+
+def test_format_amounts():
+    amounts = format_amounts([1234.4, -0.3, 1234, 5], "€")
+    assert list(amounts.astype(str)) == ["€1,234", "€0", "€1,234", "€5"]
+    assert len(amounts.categories) == 3
+
+
+class TestPresentation:
+    """ Display strings are formatted once per distinct value, and keep the transaction index """
+
+    def test_columns(self):
+        trans = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2020-01-05", "2020-01-05", "2021-03-01"]),
+                "account": ["Food", "Rent", "Food"],
+                "amount": [10, 2000, 10],
+                "description": ["lunch", "a very long description " * 3, None],
+            },
+            index=[7, 3, 9],
+        )
+        presentation = Presentation(trans, "$", wrap_width=30)
+        assert list(presentation.dates([9, 7])) == ["2021-03-01", "2020-01-05"]
+        assert len(presentation.frame["date"].cat.categories) == 2
+        hovertext = presentation.hovertext(trans.loc[[3, 9]])
+        assert hovertext[3].startswith("Rent<br>2020-01-05<br>$2,000<br>a very long description")
+        assert hovertext[3].count("<br>") == 5
+        assert hovertext[9] == "Food<br>2021-03-01<br>$10<br>"
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from ledgex.cube import Cube
+from ledgex.rangesum import RangeSum
+
+
+@pytest.fixture
+def index(trans, tree):
+    return RangeSum(Cube(trans, tree))
+
+
+def brute_force(trans, accounts, start, end):
+    selected = trans[
+        trans["account"].isin(accounts)
+        & (trans["date"] >= pd.Timestamp(start))
+        & (trans["date"] <= pd.Timestamp(end))
+    ]
+    return selected["amount"].sum()
+
+
+class TestTotals:
+    """ Range totals should match filtering the transactions """
+
+    @pytest.mark.parametrize(
+        "start,end",
+        [("2019-01-01", "2021-01-01"), ("2020-01-05", "2020-01-20"), ("2020-01-06", "2020-04-14")],
+    )
+    def test_subtree(self, index, trans, start, end):
+        expected = brute_force(trans, ["Expenses", "Food", "Rent"], start, end)
+        assert index.total("Expenses", start, end) == expected
+
+    def test_shallow(self, index):
+        assert index.total("Expenses", deep=False) == 7
+
+    def test_open_ended(self, index):
+        assert index.total("root") == 2037
+        assert index.total("Food", end="2019-12-31") == 10
+
+    def test_counts(self, index):
+        assert index.total("Expenses", "2020-01-01", "2020-12-31", counts=True) == 4
+
+    def test_subtree_totals(self, index):
+        totals = index.subtree_totals("2020-01-01", "2020-02-28")
+        by_account = dict(zip(index.cube.ids, totals))
+        assert by_account == {"root": 527, "Expenses": 527, "Food": 20, "Rent": 500, "Income": 0}
+
+    def test_leaf_totals(self, index):
+        totals = index.leaf_totals("Expenses", "2020-04-01", "2020-04-30")
+        assert totals.to_dict() == {"Rent": 500}
+
+
+class TestAppend:
+    """ Appending transactions updates the index in place """
+
+    def test_append(self, index, trans):
+        more = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2020-01-05", "2021-06-01", "2020-03-01"]),
+                "account": ["Food", "Rent", "Nowhere"],
+                "amount": [5, 100, 99],
+            }
+        )
+        index.append(more)
+        assert index.total("Food") == 35
+        assert index.total("Food", "2020-01-05", "2020-01-05", counts=True) == 2
+        assert index.total("Expenses", "2021-01-01") == 100
+        assert index.total("root") == 2142
@@ -0,0 +1,68 @@
+import pytest
+
+from ledgex.rangesum import RangeSum
+from ledgex.selection import Selection
+
+
+@pytest.fixture
+def trans(trans):
+    # Income nets negative, so positize has something to flip
+    trans.loc[trans["account"] == "Income", "amount"] = -1000
+    return trans
+
+
+class TestMerge:
+    """ Intervals of the same account are merged when they overlap or touch """
+
+    def test_adjacent_months(self, cube):
+        selection = Selection.from_pairs(
+            cube,
+            ["Expenses", "Expenses", "Expenses", "Income"],
+            ["2020-02-01", "2020-01-01", "2020-04-01", "2020-04-01"],
+            ["2020-02-29", "2020-01-31", "2020-04-30", "2020-04-30"],
+        )
+        assert selection.to_records() == [
+            ["Expenses", "2020-01-01", "2020-02-29"],
+            ["Expenses", "2020-04-01", "2020-04-30"],
+            ["Income", "2020-04-01", "2020-04-30"],
+        ]
+
+    def test_round_trip(self, cube):
+        selection = Selection.from_pairs(cube, ["Food"], ["2020-01-01"], ["2020-12-31"])
+        assert Selection.from_records(cube, selection.to_records()).to_records() == selection.to_records()
+
+
+class TestSelect:
+    """ Rows, counts and totals match filtering the transactions """
+
+    @pytest.fixture
+    def selection(self, cube):
+        return Selection.from_pairs(
+            cube,
+            ["Expenses", "Expenses", "Income"],
+            ["2019-12-01", "2020-04-01", "2020-04-01"],
+            ["2019-12-31", "2020-04-30", "2020-04-30"],
+        )
+
+    def test_rows(self, selection, trans):
+        assert selection.rows().index.tolist() == [0, 4, 5]
+
+    def test_count(self, selection, cube):
+        assert selection.count(RangeSum(cube)) == 3
+
+    def test_positize(self, selection, cube):
+        totals = selection.leaf_totals(RangeSum(cube), positize=True)
+        assert totals.to_dict() == {"Food": 10, "Rent": 500, "Income": 1000}
+
+    def test_restrict(self, selection):
+        restricted = selection.restrict(["Food", "Nowhere"])
+        assert restricted.to_records() == [
+            ["Food", "2019-12-01", "2019-12-31"],
+            ["Food", "2020-04-01", "2020-04-30"],
+        ]
+        assert restricted.rows().index.tolist() == [0]
+
+    def test_empty(self, cube):
+        selection = Selection.from_records(cube, [])
+        assert len(selection) == 0
+        assert len(selection.rows()) == 0
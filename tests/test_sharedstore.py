@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.atree import ATree
+from ledgex.cube import Cube
+from ledgex.sharedstore import SharedStore, private_dir
+
+
+def test_round_trip(tmp_path):
+    store = SharedStore(str(tmp_path))
+    assert store.load("k", "group") is None
+    store.save("k", "group", {"amount": np.arange(4.0), "text": np.array(["b", None, "a", "b"], dtype=object)}, {"n": 4})
+    arrays, meta = store.load("k", "group")
+    assert meta == {"n": 4}
+    assert isinstance(arrays["amount"], np.memmap)
+    assert [None if pd.isna(x) else x for x in arrays["text"]] == ["b", None, "a", "b"]
+    assert list(arrays["text.codes"]) == [1, -1, 0, 1]
+    # text stays encoded, on the mapped codes, until rows of it are read
+    assert isinstance(arrays["text.codes"], np.memmap)
+    assert np.shares_memory(arrays["text"].codes, arrays["text.codes"])
+    assert list(arrays["text"][[2, 3]]) == ["a", "b"]
+    assert list(arrays["text.values"]) == ["a", "b"]
+    # a second save of the same group is a no-op
+    store.save("k", "group", {"amount": np.zeros(1)})
+    assert len(store.load("k", "group")[0]["amount"]) == 4
+
+
+def test_evicts_least_recently_used(tmp_path):
+    store = SharedStore(str(tmp_path), max_datasets=2)
+    for i, key in enumerate(["a", "b"]):
+        store.save(key, "group", {"x": np.zeros(1)})
+        os.utime(tmp_path / key, (i, i))
+    store.load("a", "group")
+    store.save("c", "group", {"x": np.zeros(1)})
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def test_saved_cube(tmp_path):
+    tree = ATree()
+    tree.create_node("root", identifier="root")
+    tree.create_node("Food", identifier="Food", parent="root")
+    tree.create_node("Rent", identifier="Rent", parent="root")
+    trans = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-05", "2020-01-05", "2020-02-01"]),
+            "account": ["Food", "Food", "Rent"],
+            "amount": [10, 20, 500],
+        }
+    )
+    store = SharedStore(str(tmp_path))
+    store.save("k", "cube", *Cube(trans, tree).to_arrays())
+    cube = Cube(trans, tree, saved=store.load("k", "cube"))
+    assert isinstance(cube.row_code, np.memmap)
+    month = cube.cells("month")
+    assert list(month["amount"]) == [30, 500]
+    assert list(month["count"]) == [2, 1]
+
+
+def test_refuses_a_directory_others_can_use(tmp_path):
+    assert private_dir(str(tmp_path / "new")) == str(tmp_path / "new")
+    assert os.stat(tmp_path / "new").st_mode & 0o777 == 0o700
+    open_dir = tmp_path / "open"
+    open_dir.mkdir()
+    open_dir.chmod(0o777)
+    store = SharedStore(str(open_dir))
+    with pytest.raises(PermissionError):
+        store.load("k", "group")
+    with pytest.raises(PermissionError):
+        store.save("k", "group", {"x": np.zeros(1)})
+    assert os.listdir(open_dir) == []
+    (tmp_path / "link").symlink_to(tmp_path / "new")
+    with pytest.raises(PermissionError):
+        private_dir(str(tmp_path / "link"))
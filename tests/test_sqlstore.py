@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ledgex.cube import Cube
+from ledgex.datastore import Datastore
+from ledgex.loading import convert_raw_data
+from ledgex.params import Params
+from ledgex.rangesum import RangeSum
+from ledgex.selection import Selection
+from ledgex.sqlstore import LoadError, SqlLedger
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+sample_file = os.path.join(tests_dir, "sample_transaction_data.csv")
+
+
+@pytest.fixture
+def params():
+    result = Params()
+    result.fill_defaults()
+    return result
+
+
+@pytest.fixture
+def expected(params):
+    raw = pd.read_csv(sample_file, thousands=",", low_memory=False)
+    trans, tree, _ = convert_raw_data(raw, pd.DataFrame(), pd.DataFrame(), params)
+    return Cube(trans, tree)
+
+
+def test_cube_and_pages(tmp_path, params, expected):
+    ledger = SqlLedger.ingest(sample_file, str(tmp_path / "sample.sqlite"), params, chunk_rows=97)
+    assert len(ledger) == len(expected.trans)
+    cube = ledger.cube(ledger.account_tree())
+    for resolution in ["day", "quarter"]:
+        for column in ["code", "period", "amount", "count"]:
+            assert np.array_equal(cube.cells(resolution)[column], expected.cells(resolution)[column])
+
+    dates = (["2016-03-01", "2017-02-01"], ["2018-06-30", "2017-02-28"])
+    rows = (
+        Selection.from_pairs(expected, ["Expenses", "Assets"], *dates).rows().sort_values("date", kind="stable")
+    )
+    selection = Selection.from_pairs(cube, ["Expenses", "Assets"], *dates)
+    for page_current in [0, 7, 1000]:
+        page, page_current, total = ledger.page(selection, RangeSum(cube), page_current, 20)
+        assert total == len(rows)
+        expected_page = rows.iloc[page_current * 20:page_current * 20 + 20]
+        for column in ["date", "description", "amount", "account"]:
+            assert list(page[column]) == list(expected_page[column])
+    assert page_current == (len(rows) - 1) // 20
+
+
+def test_covering_indexes(tmp_path, params):
+    ledger = SqlLedger.ingest(sample_file, str(tmp_path / "sample.sqlite"), params)
+    plan = ledger.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT account_preorder, day, SUM(amount), COUNT(*) FROM trans"
+        " WHERE account_preorder >= 0 GROUP BY account_preorder, day"
+    ).fetchall()
+    assert "COVERING INDEX trans_account_day" in plan[0][-1]
+    selection = Selection.from_pairs(ledger.cube(ledger.account_tree()), ["Expenses"], ["2017-01-01"], ["2017-12-31"])
+    plan = ledger.connection.execute(f"EXPLAIN QUERY PLAN SELECT COUNT(*) FROM ({ledger._selected(selection)})")
+    assert any("SEARCH t USING COVERING INDEX" in row[-1] for row in plan.fetchall())
+
+
+def test_many_rectangles(tmp_path, params, expected):
+    # more rectangles than SQLite allows bound parameters, some overlapping
+    ledger = SqlLedger.ingest(sample_file, str(tmp_path / "sample.sqlite"), params)
+    cube = ledger.cube(ledger.account_tree())
+    days = pd.date_range("2015-01-01", periods=1500).strftime("%Y-%m-%d").tolist()
+    accounts = ["Expenses", "Assets"] * 750
+    rows = Selection.from_pairs(expected, accounts, days, days).rows().sort_values("date", kind="stable")
+    rows = rows[~rows.index.duplicated()]
+    selection = Selection.from_pairs(cube, accounts + ["Expenses"], days + [days[0]], days + [days[100]])
+    assert len(selection.lo) > 1000
+    page, page_current, total = ledger.page(selection, RangeSum(cube), 3, 20)
+    assert total == len(rows) > 60
+    for column in ["date", "description", "amount", "account"]:
+        assert list(page[column]) == list(rows.iloc[60:80][column])
+
+
+def test_failed_ingest_leaves_nothing(tmp_path, params):
+    (tmp_path / "empty.csv").write_text("Date,Description,Full Account Name,Account Name,Amount Num.\n")
+    with pytest.raises(LoadError):
+        SqlLedger.ingest(str(tmp_path / "empty.csv"), str(tmp_path / "empty.sqlite"), params)
+    assert sorted(os.listdir(tmp_path)) == ["empty.csv"]
+
+
+def test_sqlite_datastore(tmp_path, params, monkeypatch):
+    # Datastore opens ledgers by name through the partitions module sqlstore imported
+    monkeypatch.setattr("partitions.partitions_dir", str(tmp_path))
+    ledger = SqlLedger.ingest(sample_file, str(tmp_path / "sample.sqlite"), params)
+    data = {"partitions": "sample", "ingested": ledger.meta["ingested"], "atree": ledger.account_tree().to_json()}
+    dstore = Datastore.from_json(json.dumps(data))
+    assert type(dstore.ledger()).__name__ == "SqlLedger"
+    assert len(dstore) == len(ledger)
+    assert len(dstore.presentation("$")) == 0
+    assert len(dstore.flows()) == 0
+    assert dstore.cube().series("Expenses", "year")["value"].sum() != 0
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from ledgex.textindex import TextIndex
+
+
+def make_index():
+    descriptions = pd.Series(
+        ["Groceries at Corner Store", "Rent January", "groceries", None, "Rent February", "Parking"]
+    )
+    codes, values = pd.factorize(descriptions, sort=True)
+    return TextIndex(codes, values)
+
+
+class TestTextIndex:
+    """ Word prefixes, substrings and several terms find the same rows as a scan """
+
+    def test_substring(self):
+        index = make_index()
+        assert index.search("rent").tolist() == [1, 4]
+        assert index.search("ocer").tolist() == [0, 2]
+        assert index.search("ar").tolist() == [1, 4, 5]
+
+    def test_prefix(self):
+        index = make_index()
+        assert index.search("groc*").tolist() == [0, 2]
+        assert index.search("ore*").tolist() == []
+
+    def test_and(self):
+        index = make_index()
+        assert index.search("rent FEB").tolist() == [4]
+        assert index.search("rent xyz").tolist() == []
+
+    def test_positions(self):
+        index = make_index()
+        assert index.search("groceries", np.array([2, 3, 4])).tolist() == [2]
+        assert index.search("").tolist() == [0, 1, 2, 4, 5]
+
+    def test_containing(self):
+        index = make_index()
+        values = index.values.iloc[index.containing("Store")]
+        assert values.tolist() == ["groceries at corner store"]
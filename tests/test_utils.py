@@ -1,5 +1,17 @@
 from numpy import datetime64
-from ledgex.utils import to_decade, period_to_date_range, pretty_date
+import pandas as pd
+import pytest
+
+from ledgex.utils import (
+    LError,
+    fit_resolution,
+    make_dot_fig,
+    period_to_date_range,
+    periods_to_date_ranges,
+    pretty_date,
+    to_decade,
+    zoom_window,
+)
 
 
 class TestToDecade:
@@ -26,3 +38,98 @@ class TestPeriodToDateRange:
             datetime64("2000-01-01T00:00:00.000000"),
             datetime64("2009-12-31T00:00:00.000000"),
         )
+
+
+class TestPeriodsToDateRanges:
+    """ converts arrays of period labels to arrays of start and end dates """
+
+    @pytest.mark.parametrize(
+        "resolution,freq,label_format",
+        [
+            ("year", "A", "%Y"),
+            ("quarter", "Q", "%Y-Q%q"),
+            ("month", "M", "%Y-%m"),
+            ("week", "W", "%G-W%V"),
+            ("day", "D", "%Y-%m-%d"),
+        ],
+    )
+    def test_matches_periods(self, resolution, freq, label_format):
+        periods = pd.period_range("2019-11-01", "2021-02-01", freq=freq)
+        labels = periods.strftime(label_format)
+        start, end = periods_to_date_ranges(resolution, labels)
+        assert (start == periods.start_time.to_numpy().astype("datetime64[D]")).all()
+        assert (end == periods.end_time.to_numpy().astype("datetime64[D]")).all()
+
+    def test_weeks_across_year_ends(self):
+        # the week of 1994-12-26 to 1995-01-01 is in ISO year 1994
+        start, end = periods_to_date_ranges("week", ["1994-W52", "1995-W52", "2020-W53", "2021-W01"])
+        assert [str(x) for x in start] == ["1994-12-26", "1995-12-25", "2020-12-28", "2021-01-04"]
+        assert [str(x) for x in end] == ["1995-01-01", "1995-12-31", "2021-01-03", "2021-01-10"]
+        periods = pd.period_range("1995-01-01", "2030-12-31", freq="W")
+        labels = periods.strftime("%G-W%V")
+        assert not labels.duplicated().any()
+        start, end = periods_to_date_ranges("week", labels)
+        assert (start == periods.start_time.to_numpy().astype("datetime64[D]")).all()
+
+    def test_invalid(self):
+        with pytest.raises(LError):
+            periods_to_date_ranges("month", ["Not a month"])
+
+    def test_runs_of_periods(self):
+        start, end = periods_to_date_ranges("month", ["2020-01/2020-03", "2020-05"])
+        assert start.tolist() == [datetime64("2020-01-01").item(), datetime64("2020-05-01").item()]
+        assert end.tolist() == [datetime64("2020-03-31").item(), datetime64("2020-05-31").item()]
+
+
+class TestZoom:
+    """ Automatic time resolution follows the visible dates """
+
+    def test_fit_resolution(self):
+        assert fit_resolution("2020-01-01", "2020-03-31", 1000) == "day"
+        assert fit_resolution("2011-01-01", "2020-12-31", 1000) == "month"
+        assert fit_resolution("2000-01-01", "2020-12-31", 1000) == "quarter"
+        assert fit_resolution("1800-01-01", "2020-12-31", 200) == "decade"
+
+    def test_zoom_window(self):
+        visible_start, visible_end, fetch_start, fetch_end = zoom_window(
+            {"range": ["2020-03-01", "2020-05-01"]}, "2020-01-01", "2020-05-31"
+        )
+        assert (visible_start, visible_end) == (pd.Timestamp("2020-03-01"), pd.Timestamp("2020-05-01"))
+        assert fetch_start == pd.Timestamp("2020-01-30 12:00")
+        assert fetch_end == pd.Timestamp("2020-05-31")
+
+    def test_unzoomed(self):
+        window = zoom_window(None, "2020-01-01", "2020-05-31")
+        assert window[0] == window[2] == pd.Timestamp("2020-01-01")
+        assert window[1] == window[3] == pd.Timestamp("2020-05-31")
+
+
+class TestDotFig:
+    """ Every dot in the Explore scatter is one exact transaction """
+
+    def trans(self, n):
+        return pd.DataFrame(
+            {
+                "date": pd.date_range("2020-01-01", periods=n, freq="H"),
+                "account": "Food",
+                "amount": range(n),
+                "description": [f"item {i}" for i in range(n)],
+            },
+            index=range(100, 100 + n),
+        )
+
+    def test_small(self):
+        trans = self.trans(10)
+        fig = make_dot_fig(trans, pd.Series("gray", index=trans.index), 100, 5)
+        assert [type(trace).__name__ for trace in fig.data] == ["Scattergl"]
+        assert list(fig.data[0].customdata) == list(trans.index)
+
+    def test_decimated(self):
+        trans = self.trans(1000)
+        fig = make_dot_fig(trans, pd.Series("gray", index=trans.index), 100, 5000)
+        heatmap, dots = fig.data
+        assert type(heatmap).__name__ == "Heatmap"
+        assert type(dots).__name__ == "Scatter"
+        assert len(dots.x) <= 100
+        for index, hovertext in zip(dots.customdata, dots.hovertext):
+            assert hovertext.endswith(trans.loc[index, "description"])
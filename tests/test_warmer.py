@@ -0,0 +1,35 @@
+import os
+
+from ledgex import warmer
+from ledgex.params import Params
+
+tests_dir = os.path.dirname(os.path.realpath(__file__))
+trans_file = os.path.join(tests_dir, "sample_transaction_data.csv")
+eras_file = os.path.join(tests_dir, "sample_transaction_eras.csv")
+
+
+def test_pinned_searches(tmp_path):
+    pinned = tmp_path / "pinned.txt"
+    pinned.write_text("# the samples\n\n/pe/?transu=a.csv&pe_roots=Income\ntransu=b.csv\n")
+    assert warmer.pinned_searches(str(pinned)) == ["transu=a.csv&pe_roots=Income", "transu=b.csv"]
+    assert len(warmer.pinned_searches("examples")) == 2
+    assert warmer.pinned_searches("") == []
+
+
+def test_warm_matches_a_visit():
+    search = f"transu={trans_file}&erasu={eras_file}&pe_roots=Income,Expenses"
+    try:
+        warmer.warm(search)
+        # a visit loads the same files and dataset from memory
+        assert set(warmer.pinned_files) == {trans_file, eras_file}
+        _, trans, _ = warmer.load_input_file(url=trans_file)
+        _, eras, _ = warmer.load_input_file(url=eras_file)
+        assert trans is not warmer.pinned_files[trans_file][1]
+        params = Params.from_dict(Params.le_parse_qs(search))
+        params.fill_defaults()
+        data, summary = warmer.encode_dataset(trans.to_json(), None, eras.to_json(), params)
+        assert (data, summary) in warmer.pinned_datasets.values()
+        assert summary.startswith("2503 transactions")
+    finally:
+        warmer.pinned_files.clear()
+        warmer.pinned_datasets.clear()